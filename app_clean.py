@@ -12,32 +12,64 @@ AI시민제안 비서 - Flask 백엔드 서버
 import os
 import re
 import json
+import base64
+import hashlib
+import hmac
 import logging
 import time
+import sys
+import string
 import threading
-from datetime import datetime
-from flask import Flask, request, jsonify, send_file
-from flask_cors import CORS
-import google.generativeai as genai
-import requests
-from bs4 import BeautifulSoup
-from fpdf import FPDF
-
-# ReportLab imports for PDF generation
-try:
-    from reportlab.lib.pagesizes import A4
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, TableStyle
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch
-    from reportlab.pdfbase import pdfmetrics
-    from reportlab.pdfbase.ttfonts import TTFont
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY, TA_RIGHT
-    from reportlab.lib import colors
-    REPORTLAB_AVAILABLE = True
-except ImportError as e:
-    REPORTLAB_AVAILABLE = False
+import uuid
+import sqlite3
+import importlib.util
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import wraps
+
+# 시작 프로파일 (import 및 초기화 단계별 소요 시간/메모리)
+# STARTUP_PROFILE=1 이면 import 완료 시 단계별 비용을 로그로 출력합니다.
+STARTUP_PROFILE = os.getenv('STARTUP_PROFILE') == '1'
+startup_profile = []
+_process_start_time = time.perf_counter()
+
+def current_rss_kb():
+    """현재 프로세스 RSS (KB, 측정 불가 환경에서는 0)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except Exception:
+        try:
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        except Exception:
+            return 0
+
+@contextmanager
+def profile_startup(step):
+    """단계별 소요 시간과 RSS 증가량 기록"""
+    start_time = time.perf_counter()
+    start_rss = current_rss_kb()
+    try:
+        yield
+    finally:
+        startup_profile.append({
+            'step': step,
+            'seconds': round(time.perf_counter() - start_time, 4),
+            'rss_delta_kb': current_rss_kb() - start_rss
+        })
+
+with profile_startup('import flask, flask_cors'):
+    from flask import Flask, Response, request, jsonify, send_file, make_response
+    from flask_cors import CORS
+
+# 무거운 모듈(google.generativeai, ReportLab, BeautifulSoup)은 첫 사용 시 로드합니다.
+genai = None
+REPORTLAB_AVAILABLE = importlib.util.find_spec('reportlab') is not None
+if not REPORTLAB_AVAILABLE:
     # logger는 아직 초기화되지 않았으므로 print 사용
-    print(f"Warning: ReportLab import 실패: {e}")
+    print("Warning: ReportLab이 설치되지 않았습니다. PDF 생성 기능을 사용할 수 없습니다.")
 
 # Flask 앱 초기화
 app = Flask(__name__)
@@ -46,10 +78,48 @@ CORS(app)  # 프런트엔드와의 CORS 문제 해결
 # 시설물 정보 저장소
 facility_database = {}
 
+# 시설물 페이지 본문 해시 (크롤링 간 변경 감지용)
+facility_page_hashes = {}
+
+# 시설물별 장소 맥락 설명 (사전 생성 작업으로 채워지며 스냅샷과 함께 저장)
+facility_contexts = {}
+
+# 시설물 스냅샷 파일 경로 (재시작 후에도 이전 크롤링 해시를 비교하기 위함)
+FACILITY_SNAPSHOT_PATH = os.getenv(
+    'FACILITY_SNAPSHOT_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'facility_snapshot.json')
+)
+
+# 장소 맥락 메모 (AI 분석 결과 캐시) 및 생성된 제안서 캐시
+location_context_cache = {}
+proposal_cache = {}
+PROPOSAL_CACHE_MAX_SIZE = int(os.getenv('PROPOSAL_CACHE_MAX_SIZE', '500'))
+
+# 캐시 의존성: 장소명 -> {'contexts': 장소 맥락 메모 키 집합, 'proposals': 제안서 캐시 키 집합}
+facility_cache_dependencies = {}
+cache_lock = threading.Lock()
+facility_refresh_lock = threading.Lock()
+# 스냅샷 파일 쓰기 직렬화 (새로고침과 장소 맥락 생성 스레드가 같은 임시 파일을 씀)
+facility_snapshot_lock = threading.Lock()
+
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 운영 지표 (카운터, /metrics 에서 조회)
+metrics = {}
+metrics_lock = threading.Lock()
+
+def increment_metric(name, amount=1):
+    """운영 지표 카운터 증가"""
+    with metrics_lock:
+        metrics[name] = metrics.get(name, 0) + amount
+
+def get_metrics_snapshot():
+    """운영 지표 사본 반환"""
+    with metrics_lock:
+        return dict(metrics)
+
 # 환경 변수에서 Gemini API 키 가져오기
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 
@@ -63,14 +133,40 @@ if GEMINI_API_KEY == "your_actual_gemini_api_key_here" or not GEMINI_API_KEY:
     logger.info("테스트 모드로 실행됩니다. AI 텍스트 생성 기능은 제한됩니다.")
     GEMINI_API_KEY = "demo_key_for_testing"
 
-# Gemini API 설정 (실제 키가 있을 때만)
-if GEMINI_API_KEY != "demo_key_for_testing":
+# Gemini 모델 (첫 사용 시 초기화)
+model = None
+gemini_model_initialized = False
+gemini_init_lock = threading.Lock()
+# 모델 확인이 끝날 때까지 다른 첫 요청들을 기다리게 하는 잠금 (get_genai의 잠금과 분리)
+gemini_model_init_lock = threading.Lock()
+
+# 라우팅 후보 모델 (응답 속도/오류율에 따라 단계별로 선택)
+gemini_model_candidates = [
+    name.strip() for name in os.getenv('GEMINI_MODEL_CANDIDATES', '').split(',') if name.strip()
+]
+gemini_model_instances = {}
+
+def get_genai():
+    """google.generativeai 지연 로드 (첫 사용 시 import 및 API 키 설정)"""
+    global genai
+    if genai is None:
+        with gemini_init_lock:
+            if genai is None:
+                with profile_startup('import google.generativeai (첫 사용)'):
+                    import google.generativeai as genai_module
+                    genai_module.configure(api_key=GEMINI_API_KEY)
+                genai = genai_module
+    return genai
+
+def init_gemini_model():
+    """사용 가능한 Gemini 모델 확인 및 전역 모델 설정"""
+    global model, GEMINI_API_KEY, gemini_model_candidates
     try:
-        genai.configure(api_key=GEMINI_API_KEY)
+        genai_module = get_genai()
         
         # 사용 가능한 모델 목록 확인 시도
         try:
-            available_models = genai.list_models()
+            available_models = genai_module.list_models()
             model_list = [m.name for m in available_models if 'generateContent' in m.supported_generation_methods]
             logger.info(f"사용 가능한 모델 목록: {model_list[:5]}")  # 처음 5개만 로그
             
@@ -94,20 +190,20 @@ if GEMINI_API_KEY != "demo_key_for_testing":
             # 모델 목록 조회 실패 시 기본 목록 사용
             model_names = ['gemini-1.5-flash', 'gemini-pro', 'gemini-1.5-pro']
         
-        model = None
-        successful_model = None
-        
         for model_name in model_names:
             try:
                 # 모델 초기화
-                test_model = genai.GenerativeModel(model_name)
+                test_model = genai_module.GenerativeModel(model_name)
                 # 실제 API 호출 테스트
                 try:
-                    test_response = test_model.generate_content("Hello")
+                    call_llm(test_model, "Hello", 'probe')
                     # 응답이 정상적으로 오면 모델 사용 가능
                     model = test_model
-                    successful_model = model_name
+                    gemini_model_instances[model_name] = test_model
                     logger.info(f"Gemini API가 성공적으로 설정되었습니다. 모델: {model_name}")
+                    # 확인된 모델과 아직 시도하지 않은 모델을 라우팅 후보로 사용
+                    if not gemini_model_candidates:
+                        gemini_model_candidates = model_names[model_names.index(model_name):]
                     break
                 except Exception as api_error:
                     error_msg = str(api_error)
@@ -125,13 +221,1157 @@ if GEMINI_API_KEY != "demo_key_for_testing":
         logger.error(f"Gemini API 설정 오류: {e}")
         model = None
         GEMINI_API_KEY = "demo_key_for_testing"
-else:
-    model = None
+
+def get_model():
+    """
+    전역 Gemini 모델 반환 (첫 호출 시 모델 확인)
+
+    Returns:
+        GenerativeModel: 사용 가능한 모델 (테스트 모드 또는 초기화 실패 시 None)
+    """
+    global gemini_model_initialized
+    if not gemini_model_initialized:
+        # 확인이 끝난 뒤에 완료 표시 (동시에 들어온 첫 요청들은 확인이 끝날 때까지 대기)
+        with gemini_model_init_lock:
+            if not gemini_model_initialized:
+                if GEMINI_API_KEY != "demo_key_for_testing":
+                    with profile_startup('Gemini 모델 확인 (첫 사용)'):
+                        init_gemini_model()
+                gemini_model_initialized = True
+    return model
+
+# 스레드별 AI 호출 횟수 (요청 병합 시 절약한 호출 수 계산용)
+llm_call_local = threading.local()
+
+def get_thread_llm_calls():
+    """현재 스레드에서 지금까지 실행한 AI 호출 횟수"""
+    return getattr(llm_call_local, 'count', 0)
+
+# Gemini 할당량 (분당 요청 수 / 분당 토큰 수) 및 대기 한도
+GEMINI_RPM_LIMIT = float(os.getenv('GEMINI_RPM_LIMIT', '15'))
+GEMINI_TPM_LIMIT = float(os.getenv('GEMINI_TPM_LIMIT', '1000000'))
+GEMINI_QUEUE_MAX_WAIT = float(os.getenv('GEMINI_QUEUE_MAX_WAIT', '20'))
+
+# 단계별 예상 출력 토큰 (할당량 예약용, 실제 사용량으로 사후 보정)
+STAGE_OUTPUT_TOKEN_ESTIMATES = {
+    'refine': 400,
+    'refine_batch': 3200,
+    'refine_followup': 200,
+    'context': 80,
+    'enrich': 1500,
+    'draft': 1200,
+    'legacy_draft': 1200
+}
+
+def estimate_tokens(text):
+    """토큰 수 대략 추정 (한글 등 비ASCII 1자 ≈ 1토큰, ASCII 4자 ≈ 1토큰으로 보수적으로 계산)"""
+    if not text:
+        return 0
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return int(ascii_chars / 4 + (len(text) - ascii_chars)) + 1
+
+class QuotaWaitTooLong(Exception):
+    """할당량 대기 시간이 허용 한도를 넘는 경우 (expected_wait: 예상 대기 시간, 초)"""
+
+    def __init__(self, expected_wait):
+        super().__init__(f"Gemini 할당량 초과 - 예상 대기 시간 {expected_wait:.1f}초")
+        self.expected_wait = expected_wait
+
+class RequestCancelled(Exception):
+    """요청한 사용자가 연결을 끊거나 취소하여 남은 작업을 중단함 (stage: 중단한 단계)"""
+
+    def __init__(self, stage):
+        super().__init__(f"요청이 취소되어 작업을 중단합니다 ({stage})")
+        self.stage = stage
+
+class CancellationToken:
+    """
+    요청 1건의 취소 신호
+
+    사용자가 탭을 닫거나 스트리밍 연결이 끊기면 cancel()이 호출되고, 파이프라인은 단계마다
+    raise_if_cancelled()로 확인하여 남은 AI 호출/PDF 생성을 건너뜁니다.
+    대기열에서 기다리는 곳은 on_cancel()로 콜백을 등록해 두면 취소 즉시 깨어납니다.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.reason = None
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason='client_cancelled'):
+        """취소 (이미 취소된 경우 False)"""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        increment_metric(f'requests_cancelled_{reason}')
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"취소 콜백 오류: {e}")
+        return True
+
+    def on_cancel(self, callback):
+        """취소될 때 호출할 함수 등록 (이미 취소됐으면 바로 호출)"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def wait(self, timeout):
+        """timeout 동안 대기 (그 사이 취소되면 True)"""
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self, stage):
+        """취소된 경우 중단한 단계를 집계하고 RequestCancelled 발생"""
+        if self._event.is_set():
+            increment_metric('abandoned_work_total')
+            increment_metric(f'abandoned_work_{stage}')
+            raise RequestCancelled(stage)
+
+# 동기 요청의 취소 토큰 (클라이언트가 보낸 요청 ID -> 토큰, 탭을 닫을 때 sendBeacon으로 취소)
+REQUEST_ID_HEADER = 'X-Request-Id'
+active_request_tokens = {}
+active_request_tokens_lock = threading.Lock()
+
+@contextmanager
+def cancellable_request(request_id):
+    """블록 동안 요청 ID로 취소할 수 있는 토큰 제공 (요청 ID가 없으면 등록하지 않음)"""
+    token = CancellationToken()
+    if request_id:
+        with active_request_tokens_lock:
+            active_request_tokens[request_id] = token
+    try:
+        yield token
+    finally:
+        if request_id:
+            with active_request_tokens_lock:
+                if active_request_tokens.get(request_id) is token:
+                    del active_request_tokens[request_id]
+
+def cancel_request(request_id, reason='client_cancelled'):
+    """진행 중인 동기 요청 취소 (해당 요청이 없으면 False)"""
+    with active_request_tokens_lock:
+        token = active_request_tokens.get(request_id)
+    return token is not None and token.cancel(reason)
+
+def is_quota_error(error):
+    """Gemini 할당량 초과(429) 오류 여부"""
+    message = str(error).lower()
+    return (
+        type(error).__name__ in ('ResourceExhausted', 'TooManyRequests')
+        or '429' in message
+        or 'quota' in message
+        or 'rate limit' in message
+    )
+
+class GeminiQuotaScheduler:
+    """
+    분당 요청 수(RPM)와 분당 토큰 수(TPM) 토큰 버킷 기반 호출 스케줄러
+
+    호출마다 버킷에서 미리 예약하고(잔량이 음수가 될 수 있음), 잔량이 0으로 돌아올 때까지
+    기다린 뒤 호출합니다. 순서대로 예약하므로 대기열이 생겨도 처리량이 할당량 상한에 맞춰
+    일정하게 유지됩니다.
+    """
+
+    def __init__(self, rpm_limit, tpm_limit, max_wait):
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._requests = rpm_limit
+        self._tokens = tpm_limit
+        self._updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._requests = min(self.rpm_limit, self._requests + elapsed * self.rpm_limit / 60.0)
+        self._tokens = min(self.tpm_limit, self._tokens + elapsed * self.tpm_limit / 60.0)
+
+    def _wait_for(self, requests_balance, tokens_balance):
+        """잔량이 0 이상이 될 때까지 걸리는 시간 (초)"""
+        request_wait = max(0.0, -requests_balance) * 60.0 / self.rpm_limit
+        token_wait = max(0.0, -tokens_balance) * 60.0 / self.tpm_limit
+        return max(request_wait, token_wait)
+
+    def expected_wait(self, estimated_tokens=0):
+        """지금 호출을 예약하면 기다려야 하는 시간 (초)"""
+        with self._lock:
+            self._refill()
+            return self._wait_for(self._requests - 1, self._tokens - estimated_tokens)
+
+    def acquire(self, estimated_tokens, max_wait=None, cancel_token=None):
+        """
+        호출 1회와 예상 토큰을 예약하고 차례가 올 때까지 대기
+
+        Returns:
+            float: 실제로 기다린 시간 (초)
+
+        Raises:
+            QuotaWaitTooLong: 예상 대기 시간이 max_wait를 넘는 경우 (예약하지 않음)
+            RequestCancelled: 기다리는 중에 요청이 취소된 경우 (예약은 반환)
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        # 한 번에 TPM 전체를 넘는 요청도 언젠가는 보낼 수 있도록 상한 적용
+        estimated_tokens = min(estimated_tokens, self.tpm_limit)
+        with self._lock:
+            self._refill()
+            wait = self._wait_for(self._requests - 1, self._tokens - estimated_tokens)
+            if wait > max_wait:
+                raise QuotaWaitTooLong(wait)
+            self._requests -= 1
+            self._tokens -= estimated_tokens
+
+        if wait > 0:
+            increment_metric('llm_queued_calls')
+            increment_metric('llm_queue_wait_ms_total', int(wait * 1000))
+            if cancel_token is None:
+                time.sleep(wait)
+            elif cancel_token.wait(wait):
+                # 취소된 요청이 예약한 호출/토큰은 다음 요청이 쓰도록 돌려줌
+                with self._lock:
+                    self._requests += 1
+                    self._tokens += estimated_tokens
+                cancel_token.raise_if_cancelled('llm_quota')
+        return wait
+
+    def settle(self, estimated_tokens, actual_tokens):
+        """예약한 토큰을 실제 사용량으로 보정"""
+        if actual_tokens is None:
+            return
+        with self._lock:
+            self._tokens -= (actual_tokens - estimated_tokens)
+
+    def on_quota_exceeded(self):
+        """서버에서 429를 받으면 버킷을 비워 이후 호출이 다음 분 구간까지 기다리게 함"""
+        with self._lock:
+            self._refill()
+            self._requests = min(self._requests, 0.0)
+            self._tokens = min(self._tokens, 0.0)
+
+    def state(self):
+        """현재 버킷 상태 (/metrics 용)"""
+        with self._lock:
+            self._refill()
+            return {
+                'rpm_limit': self.rpm_limit,
+                'tpm_limit': self.tpm_limit,
+                'requests_available': round(self._requests, 2),
+                'tokens_available': int(self._tokens),
+                'expected_wait_seconds': round(self._wait_for(self._requests - 1, self._tokens), 2)
+            }
+
+gemini_quota_scheduler = GeminiQuotaScheduler(GEMINI_RPM_LIMIT, GEMINI_TPM_LIMIT, GEMINI_QUEUE_MAX_WAIT)
+
+# 우선순위 등급 (시민 요청 > 직원 화면 작업 > 직원 대량 작업)
+# weight: 가중 공정 큐 비중, max_share: 전체 동시 실행 수 중 등급별 최대 비율,
+# aging_seconds: 이 시간 이상 기다린 요청은 비중과 관계없이 먼저 처리 (기아 방지),
+# max_wait: 차례를 기다리는 한도 (None이면 무제한), max_queued: 작업 대기열 등급별 최대 길이
+DEFAULT_PRIORITY_LANES = {
+    'interactive': {'weight': 8, 'max_share': 1.0, 'aging_seconds': None, 'max_wait': GEMINI_QUEUE_MAX_WAIT, 'max_queued': 100},
+    'staff_interactive': {'weight': 3, 'max_share': 0.5, 'aging_seconds': 10, 'max_wait': 60, 'max_queued': 200},
+    'bulk': {'weight': 1, 'max_share': 0.25, 'aging_seconds': 30, 'max_wait': None, 'max_queued': 5000}
+}
+DEFAULT_PRIORITY_CLASS = 'interactive'
+PRIORITY_HEADER = 'X-Priority-Class'
+LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', '8'))
+PDF_CONCURRENCY = int(os.getenv('PDF_CONCURRENCY', str(max(1, (os.cpu_count() or 2) // 2))))
+PRIORITY_WAIT_SAMPLES = 500
+
+def load_priority_lanes():
+    """기본 등급 설정에 PRIORITY_LANES 환경 변수(JSON)를 등급별로 덮어써서 반환"""
+    lanes = {lane: dict(config) for lane, config in DEFAULT_PRIORITY_LANES.items()}
+    override = os.getenv('PRIORITY_LANES')
+    if override:
+        try:
+            for lane, config in json.loads(override).items():
+                if lane in lanes:
+                    lanes[lane].update(config)
+        except (ValueError, AttributeError) as e:
+            logger.warning(f"PRIORITY_LANES 형식 오류, 기본 설정 사용: {e}")
+    return lanes
+
+priority_lanes_config = load_priority_lanes()
+
+# 현재 스레드에서 처리 중인 요청의 우선순위 등급 (요청 시작 시 헤더로 설정, 작업 스레드는 작업별로 설정)
+request_priority_local = threading.local()
+
+def normalize_priority(value):
+    """알 수 없는 등급은 기본 등급(시민 요청)으로 처리"""
+    return value if value in priority_lanes_config else DEFAULT_PRIORITY_CLASS
+
+def get_current_priority():
+    return getattr(request_priority_local, 'value', DEFAULT_PRIORITY_CLASS)
+
+@contextmanager
+def priority_class(lane):
+    """블록 안에서 실행하는 AI 호출/PDF 생성의 우선순위 등급 지정"""
+    previous = get_current_priority()
+    request_priority_local.value = normalize_priority(lane)
+    try:
+        yield
+    finally:
+        request_priority_local.value = previous
+
+class PriorityWaitTooLong(QuotaWaitTooLong):
+    """우선순위 대기열에서 차례를 기다린 시간이 등급별 한도를 넘음"""
+
+class PriorityLanes:
+    """
+    우선순위 등급별 가중 공정 큐 (동시 실행 수 제한)
+
+    빈 자리가 생기면 기다리는 등급 중 가상 시간이 가장 앞선 등급을 고르고, 그 등급의 가상 시간을
+    1/weight만큼 진행시켜 비중대로 자리를 나눕니다. 등급별 동시 실행 상한(max_share)이 있어 대량 작업이
+    자리를 모두 차지하지 못하며, aging_seconds 이상 기다린 요청은 먼저 처리하여 낮은 등급도 굶지 않습니다.
+
+    호출 슬롯(acquire/release, slot)과 작업 대기열(put/get/release) 두 방식으로 사용할 수 있습니다.
+    """
+
+    def __init__(self, name, capacity, lanes):
+        self.name = name
+        self.capacity = capacity
+        self.lanes = lanes
+        self._caps = {lane: max(1, int(capacity * config['max_share'])) for lane, config in lanes.items()}
+        self._cond = threading.Condition()
+        self._waiting = {lane: deque() for lane in lanes}
+        self._running = {lane: 0 for lane in lanes}
+        self._virtual_time = {lane: 0.0 for lane in lanes}
+        self._ready = deque()
+        self._waits = {lane: deque(maxlen=PRIORITY_WAIT_SAMPLES) for lane in lanes}
+
+    def _active_virtual_time(self):
+        active = [self._virtual_time[lane] for lane in self.lanes if self._waiting[lane] or self._running[lane]]
+        return min(active) if active else 0.0
+
+    def _enqueue(self, lane, waiter):
+        # 한동안 비어 있던 등급이 쌓아 둔 몫으로 한꺼번에 자리를 차지하지 않도록 가상 시간을 맞춤
+        if not self._waiting[lane] and not self._running[lane]:
+            self._virtual_time[lane] = max(self._virtual_time[lane], self._active_virtual_time())
+        self._waiting[lane].append(waiter)
+
+    def _select_lane(self, now):
+        if sum(self._running.values()) >= self.capacity:
+            return None
+        candidates = [lane for lane in self.lanes if self._waiting[lane] and self._running[lane] < self._caps[lane]]
+        if not candidates:
+            return None
+        aged = [
+            lane for lane in candidates
+            if self.lanes[lane]['aging_seconds'] is not None
+            and now - self._waiting[lane][0]['enqueued_at'] >= self.lanes[lane]['aging_seconds']
+        ]
+        if aged:
+            increment_metric(f'{self.name}_aged_dispatches')
+            return min(aged, key=lambda lane: self._waiting[lane][0]['enqueued_at'])
+        return min(candidates, key=lambda lane: (self._virtual_time[lane], -self.lanes[lane]['weight']))
+
+    def _dispatch(self):
+        """빈 자리만큼 대기 중인 요청에 차례 부여 (lock 보유 상태에서 호출)"""
+        now = time.monotonic()
+        dispatched = False
+        while True:
+            lane = self._select_lane(now)
+            if lane is None:
+                break
+            waiter = self._waiting[lane].popleft()
+            self._virtual_time[lane] += 1.0 / self.lanes[lane]['weight']
+            self._running[lane] += 1
+            self._waits[lane].append(now - waiter['enqueued_at'])
+            increment_metric(f'{self.name}_dispatched_{lane}')
+            if 'item' in waiter:
+                self._ready.append((waiter['item'], lane))
+            else:
+                waiter['granted'] = True
+            dispatched = True
+        if dispatched:
+            self._cond.notify_all()
+
+    def acquire(self, lane, timeout=None, cancel_token=None):
+        """
+        실행 자리 확보 (차례가 올 때까지 대기)
+
+        Raises:
+            PriorityWaitTooLong: 등급별 대기 한도(max_wait) 안에 차례가 오지 않은 경우
+            RequestCancelled: 기다리는 중에 요청이 취소된 경우
+        """
+        lane = lane if lane in self.lanes else DEFAULT_PRIORITY_CLASS
+        timeout = self.lanes[lane]['max_wait'] if timeout is None else timeout
+        if cancel_token is not None:
+            cancel_token.on_cancel(self._wake)
+
+        def cancelled():
+            return cancel_token is not None and cancel_token.cancelled
+
+        with self._cond:
+            waiter = {'enqueued_at': time.monotonic(), 'granted': False}
+            self._enqueue(lane, waiter)
+            self._dispatch()
+            self._cond.wait_for(lambda: waiter['granted'] or cancelled(), timeout)
+            if not waiter['granted']:
+                self._waiting[lane].remove(waiter)
+                if cancelled():
+                    cancel_token.raise_if_cancelled(self.name)
+                increment_metric(f'{self.name}_rejected_{lane}')
+                raise PriorityWaitTooLong(timeout)
+        return lane
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def release(self, lane):
+        """실행 자리 반납"""
+        with self._cond:
+            self._running[lane] -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, lane, timeout=None, cancel_token=None):
+        lane = self.acquire(lane, timeout, cancel_token)
+        try:
+            yield
+        finally:
+            self.release(lane)
+
+    def put(self, lane, item):
+        """작업 대기열에 추가 (등급별 대기열이 가득 차면 False)"""
+        with self._cond:
+            if len(self._waiting[lane]) >= self.lanes[lane].get('max_queued', float('inf')):
+                return False
+            self._enqueue(lane, {'enqueued_at': time.monotonic(), 'item': item})
+            self._dispatch()
+        return True
+
+    def get(self):
+        """차례가 온 작업 꺼내기 (처리 후 release(등급) 호출)"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._ready)
+            return self._ready.popleft()
+
+    def queued_count(self):
+        with self._cond:
+            return sum(len(waiting) for waiting in self._waiting.values()) + len(self._ready)
+
+    def state(self):
+        """등급별 실행/대기 수와 최근 대기 시간 p95 (/metrics 용)"""
+        with self._cond:
+            lanes = {}
+            for lane, config in self.lanes.items():
+                waits = sorted(self._waits[lane])
+                lanes[lane] = {
+                    'weight': config['weight'],
+                    'cap': self._caps[lane],
+                    'running': self._running[lane],
+                    'waiting': len(self._waiting[lane]),
+                    'wait_p95_ms': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else 0.0
+                }
+            return {'capacity': self.capacity, 'lanes': lanes}
+
+llm_priority_lanes = PriorityLanes('llm_lanes', LLM_CONCURRENCY, priority_lanes_config)
+pdf_priority_lanes = PriorityLanes('pdf_lanes', PDF_CONCURRENCY, priority_lanes_config)
+
+# Gemini 장애 차단기 설정 (연속 실패 횟수 / 차단 유지 시간)
+GEMINI_BREAKER_FAILURE_THRESHOLD = int(os.getenv('GEMINI_BREAKER_FAILURE_THRESHOLD', '5'))
+GEMINI_BREAKER_RECOVERY_SECONDS = float(os.getenv('GEMINI_BREAKER_RECOVERY_SECONDS', '30'))
+
+class CircuitOpenError(Exception):
+    """차단기가 열려 있어 Gemini를 호출하지 않음"""
+
+def is_backend_failure(error):
+    """
+    장애로 볼 오류인지 판단 (시간 초과, 연결 실패, 5xx 등)
+
+    할당량 초과(429)는 스케줄러가 처리하고, 잘못된 요청/권한/모델 없음(400/403/404)은
+    서버 장애가 아니므로 차단기 실패로 세지 않습니다.
+    """
+    if is_quota_error(error):
+        return False
+    message = str(error).lower()
+    client_errors = ('400', '403', '404', 'not found', 'invalid argument', 'permission', 'api key not valid')
+    return not any(token in message for token in client_errors)
+
+class CircuitBreaker:
+    """
+    Gemini 호출 차단기 (closed → open → half_open → closed)
+
+    - closed: 정상 호출, 연속 실패가 임계값에 도달하면 open
+    - open: 호출하지 않고 즉시 CircuitOpenError, 유지 시간이 지나면 half_open
+    - half_open: 시험 호출 1회만 허용, 성공하면 closed / 실패하면 다시 open
+    """
+
+    def __init__(self, failure_threshold, recovery_seconds):
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self._lock = threading.Lock()
+        self._state = 'closed'
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def _current_state(self):
+        if self._state == 'open' and time.monotonic() - self._opened_at >= self.recovery_seconds:
+            self._state = 'half_open'
+            self._trial_in_flight = False
+        return self._state
+
+    def is_open(self):
+        """호출해도 바로 거절될 상태인지 (시험 호출 슬롯은 소비하지 않음)"""
+        with self._lock:
+            state = self._current_state()
+            return state == 'open' or (state == 'half_open' and self._trial_in_flight)
+
+    def allow_request(self):
+        """호출 허용 여부 (half_open 상태에서는 시험 호출 1회만 허용)"""
+        with self._lock:
+            state = self._current_state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != 'closed':
+                logger.info("Gemini 차단기 복구 - closed")
+            self._state = 'closed'
+            self._consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive_failures += 1
+            state = self._current_state()
+            if state == 'half_open' or self._consecutive_failures >= self.failure_threshold:
+                if state != 'open':
+                    logger.warning(f"Gemini 차단기 open - 연속 실패 {self._consecutive_failures}회")
+                    increment_metric('llm_breaker_opened')
+                self._state = 'open'
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def release_trial(self):
+        """시험 호출이 장애와 무관한 이유로 끝난 경우 슬롯 반환"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def state(self):
+        """현재 상태 (/health 용)"""
+        with self._lock:
+            state = self._current_state()
+            retry_in = 0.0
+            if state == 'open':
+                retry_in = max(0.0, self.recovery_seconds - (time.monotonic() - self._opened_at))
+            return {
+                'state': state,
+                'consecutive_failures': self._consecutive_failures,
+                'retry_in_seconds': round(retry_in, 1)
+            }
+
+gemini_circuit_breaker = CircuitBreaker(GEMINI_BREAKER_FAILURE_THRESHOLD, GEMINI_BREAKER_RECOVERY_SECONDS)
+
+# 제안서 생성 요청 1건당 AI 호출 예산 (정제, 장소 분석, 초안 작성 + 여유 1회)
+PROPOSAL_LLM_CALL_BUDGET = int(os.getenv('PROPOSAL_LLM_CALL_BUDGET', '4'))
+
+class LLMBudgetExceeded(Exception):
+    """요청 1건에 허용된 AI 호출 예산을 모두 사용함"""
+
+class ProposalRequestContext:
+    """
+    제안서 생성 요청 1건의 상태
+
+    단계별로 완료된 결과(정제된 입력, 장소 맥락)를 보관하여 오류 처리 경로에서
+    AI를 다시 호출하지 않고 재사용하며, 요청당 AI 호출 횟수를 예산 안으로 제한합니다.
+    """
+
+    def __init__(self, llm_budget=None, priority=None, cancel_token=None):
+        self.llm_budget = PROPOSAL_LLM_CALL_BUDGET if llm_budget is None else llm_budget
+        # 우선순위 등급 (헤지 호출처럼 다른 스레드에서 호출해도 요청의 등급을 유지)
+        self.priority = normalize_priority(priority or get_current_priority())
+        self.llm_calls = 0
+        self.refined_input = None
+        self.location_context = None
+        self.draft_inputs = None
+        # 부하가 높을 때 정제/장소 분석 AI 호출을 생략하고 초안 작성 호출 1회만 사용
+        self.single_pass = False
+        # AI 호출 전 우선순위/할당량 대기열에서 기다린 시간 합계 (초, 적응형 동시 처리 한도 조절에 사용)
+        self.llm_wait_seconds = 0.0
+        # 사용자가 떠나면 남은 단계를 중단하기 위한 취소 토큰 (없으면 취소하지 않음)
+        self.cancel_token = cancel_token
+        # 호출 횟수/대기 시간 갱신 보호 (헤지, 묶음 정제 스레드에서도 같은 요청 상태를 고침)
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self.cancel_token is not None and self.cancel_token.cancelled
+
+    def check_cancelled(self, stage):
+        """요청이 취소됐으면 RequestCancelled 발생 (다음 단계를 시작하기 전에 확인)"""
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled(stage)
+
+    def consume_llm_call(self, stage):
+        """AI 호출 1회 차감 (예산 초과 시 LLMBudgetExceeded)"""
+        with self._lock:
+            exhausted = self.llm_calls >= self.llm_budget
+            if not exhausted:
+                self.llm_calls += 1
+        if exhausted:
+            increment_metric('llm_budget_exhausted')
+            logger.warning(f"요청당 AI 호출 예산({self.llm_budget}회) 초과 - {stage} 호출 생략")
+            raise LLMBudgetExceeded(f"AI 호출 예산 초과 ({stage})")
+
+    def refund_llm_call(self):
+        """차감했지만 실행하지 않은 AI 호출 1회를 되돌림"""
+        with self._lock:
+            self.llm_calls = max(0, self.llm_calls - 1)
+
+    def add_llm_wait(self, seconds):
+        """AI 호출 전 대기열에서 기다린 시간 누적"""
+        with self._lock:
+            self.llm_wait_seconds += seconds
+
+# 단계별 모델 프로필 (모델 후보, 생성 설정, 제한 시간)
+# 정제/장소 분석은 짧은 문장 다듬기이므로 가벼운 모델과 낮은 출력 상한을 사용하고,
+# 초안 작성은 시작 시 확인된 모델(models가 비어 있으면 전체 후보)을 사용합니다.
+REFINE_REQUIRED_FIELDS = ['refined_location', 'refined_target', 'refined_problem_description', 'refined_solution']
+
+# 입력 정제 응답 스키마 (JSON 모드로 필드 누락/형식 오류를 줄임)
+REFINE_RESPONSE_SCHEMA = {
+    'type': 'object',
+    'properties': {field: {'type': 'string'} for field in REFINE_REQUIRED_FIELDS},
+    'required': REFINE_REQUIRED_FIELDS
+}
+REFINE_BATCH_RESPONSE_SCHEMA = {
+    'type': 'array',
+    'items': {
+        'type': 'object',
+        'properties': {'id': {'type': 'string'}, **REFINE_RESPONSE_SCHEMA['properties']},
+        'required': ['id'] + REFINE_REQUIRED_FIELDS
+    }
+}
+
+DEFAULT_STAGE_PROFILES = {
+    'refine': {
+        'models': ['gemini-1.5-flash-8b', 'gemini-1.5-flash'],
+        'generation_config': {
+            'temperature': 0.2,
+            'max_output_tokens': 768,
+            'response_mime_type': 'application/json',
+            'response_schema': REFINE_RESPONSE_SCHEMA
+        },
+        'timeout': 15
+    },
+    'refine_followup': {
+        'models': ['gemini-1.5-flash-8b', 'gemini-1.5-flash'],
+        'generation_config': {'temperature': 0.2, 'max_output_tokens': 384, 'response_mime_type': 'application/json'},
+        'timeout': 10
+    },
+    'context': {
+        'models': ['gemini-1.5-flash-8b', 'gemini-1.5-flash'],
+        'generation_config': {'temperature': 0.2, 'max_output_tokens': 96},
+        'timeout': 10
+    },
+    'refine_batch': {
+        'models': ['gemini-1.5-flash-8b', 'gemini-1.5-flash'],
+        'generation_config': {
+            'temperature': 0.2,
+            'max_output_tokens': 6144,
+            'response_mime_type': 'application/json',
+            'response_schema': REFINE_BATCH_RESPONSE_SCHEMA
+        },
+        'timeout': 30
+    },
+    'enrich': {
+        'models': ['gemini-1.5-flash'],
+        'generation_config': {'temperature': 0.3, 'max_output_tokens': 4096},
+        'timeout': 90
+    },
+    'draft': {
+        'models': [],
+        'generation_config': {'temperature': 0.7, 'max_output_tokens': 2048},
+        'timeout': 60
+    },
+    'draft_section': {
+        'models': [],
+        'generation_config': {'temperature': 0.5, 'max_output_tokens': 512},
+        'timeout': 20
+    },
+    'legacy_draft': {
+        'models': [],
+        'generation_config': {'temperature': 0.7, 'max_output_tokens': 2048},
+        'timeout': 60
+    }
+}
+GEMINI_STAGE_PROFILES_ENABLED = os.getenv('GEMINI_STAGE_PROFILES_ENABLED', '1') == '1'
+
+def load_stage_profiles():
+    """
+    기본 프로필에 GEMINI_STAGE_PROFILES 환경 변수(JSON)를 단계별로 덮어써서 반환
+
+    예: GEMINI_STAGE_PROFILES='{"draft": {"models": ["gemini-1.5-pro"]}, "refine": {"timeout": 20}}'
+    """
+    profiles = {stage: dict(profile) for stage, profile in DEFAULT_STAGE_PROFILES.items()}
+    override = os.getenv('GEMINI_STAGE_PROFILES')
+    if override:
+        try:
+            for stage, profile in json.loads(override).items():
+                merged = profiles.setdefault(stage, {'models': [], 'generation_config': {}, 'timeout': None})
+                if 'generation_config' in profile:
+                    merged['generation_config'] = {**merged.get('generation_config', {}), **profile['generation_config']}
+                for key in ('models', 'timeout'):
+                    if key in profile:
+                        merged[key] = profile[key]
+        except (ValueError, AttributeError) as e:
+            logger.warning(f"GEMINI_STAGE_PROFILES 형식 오류, 기본 프로필 사용: {e}")
+    return profiles
+
+stage_profiles = load_stage_profiles()
+
+def get_stage_profile(stage):
+    """단계 프로필 반환 (프로필을 끈 경우 또는 없는 단계는 None)"""
+    if not GEMINI_STAGE_PROFILES_ENABLED:
+        return None
+    return stage_profiles.get(stage)
+
+def stage_request_options(stage):
+    """generate_content에 넘길 단계별 생성 설정과 제한 시간"""
+    profile = get_stage_profile(stage)
+    if not profile:
+        return {}
+    options = {}
+    if profile.get('generation_config'):
+        options['generation_config'] = profile['generation_config']
+    if profile.get('timeout'):
+        options['request_options'] = {'timeout': profile['timeout']}
+    return options
+
+def record_stage_usage(stage, latency, usage):
+    """단계별 응답 시간과 입력/출력 토큰 누적 (/metrics, benchmark.py stages 용)"""
+    increment_metric(f'llm_latency_ms_{stage}', int(latency * 1000))
+    if usage is not None:
+        increment_metric(f'llm_input_tokens_{stage}', getattr(usage, 'prompt_token_count', 0) or 0)
+        increment_metric(f'llm_output_tokens_{stage}', getattr(usage, 'candidates_token_count', 0) or 0)
+
+def call_llm(ai_model, prompt, stage, ctx=None):
+    """
+    Gemini 호출 공통 진입점 (장애 차단기, 할당량 스케줄링, 호출 횟수 집계)
+
+    할당량이 모자라면 실패시키지 않고 잠시 대기열에서 기다렸다가 호출하며,
+    서버에서 429를 받은 경우에도 대기 한도 안에서 한 번 더 시도합니다.
+    차단기가 열려 있으면 호출하지 않고 즉시 CircuitOpenError를 발생시킵니다.
+
+    Args:
+        ai_model (GenerativeModel): 호출할 모델
+        prompt (str): 프롬프트
+        stage (str): 호출 단계 (refine, context, draft, enrich 등)
+        ctx (ProposalRequestContext): 요청 상태 (있으면 호출 예산에서 차감, 우선순위 등급 사용)
+
+    Returns:
+        GenerateContentResponse: 모델 응답
+
+    Raises:
+        QuotaWaitTooLong: 대기 한도 안에 호출할 수 없는 경우 (예상 대기 시간 포함, 우선순위 대기 초과 포함)
+        CircuitOpenError: 차단기가 열려 있는 경우
+        LLMBudgetExceeded: 요청당 AI 호출 예산을 모두 사용한 경우
+        RequestCancelled: 요청이 취소된 경우 (대기 중이면 자리와 할당량 예약을 반환)
+    """
+    cancel_token = ctx.cancel_token if ctx is not None else None
+    if ctx is not None:
+        ctx.check_cancelled(stage)
+        ctx.consume_llm_call(stage)
+    if not gemini_circuit_breaker.allow_request():
+        increment_metric('llm_breaker_short_circuits')
+        # 호출하지 않았으므로 요청의 호출 예산은 되돌림
+        if ctx is not None:
+            ctx.refund_llm_call()
+        raise CircuitOpenError("Gemini 차단기가 열려 있습니다.")
+
+    estimated_tokens = estimate_tokens(prompt) + STAGE_OUTPUT_TOKEN_ESTIMATES.get(stage, 500)
+    wait_started = time.monotonic()
+    deadline = wait_started + gemini_quota_scheduler.max_wait
+
+    # 우선순위 등급별 자리 확보 (대량 작업이 시민 요청의 할당량/동시 호출 자리를 차지하지 않도록)
+    priority = ctx.priority if ctx is not None else get_current_priority()
+    try:
+        priority = llm_priority_lanes.acquire(priority, cancel_token=cancel_token)
+    except (PriorityWaitTooLong, RequestCancelled):
+        gemini_circuit_breaker.release_trial()
+        if ctx is not None:
+            ctx.refund_llm_call()
+        raise
+
+    try:
+        for attempt in range(3):
+            try:
+                gemini_quota_scheduler.acquire(
+                    estimated_tokens, max_wait=max(0.0, deadline - time.monotonic()), cancel_token=cancel_token
+                )
+            except (QuotaWaitTooLong, RequestCancelled) as e:
+                if isinstance(e, QuotaWaitTooLong):
+                    increment_metric('llm_quota_rejections')
+                gemini_circuit_breaker.release_trial()
+                # 첫 호출 전에 대기에서 실패하면 호출하지 않았으므로 예산을 되돌림
+                if ctx is not None and attempt == 0:
+                    ctx.refund_llm_call()
+                raise
+
+            if ctx is not None and attempt == 0:
+                ctx.add_llm_wait(time.monotonic() - wait_started)
+            llm_call_local.count = get_thread_llm_calls() + 1
+            increment_metric('llm_calls_total')
+            increment_metric(f'llm_calls_{stage}')
+            call_started = time.monotonic()
+            try:
+                response = ai_model.generate_content(prompt, **stage_request_options(stage))
+            except Exception as e:
+                if is_backend_failure(e):
+                    gemini_circuit_breaker.record_failure()
+                else:
+                    gemini_circuit_breaker.release_trial()
+                if not is_quota_error(e):
+                    raise
+                increment_metric('llm_quota_errors')
+                logger.warning(f"Gemini 할당량 초과 응답 ({stage}) - 대기 후 재시도: {e}")
+                gemini_quota_scheduler.on_quota_exceeded()
+                continue
+
+            gemini_circuit_breaker.record_success()
+            usage = getattr(response, 'usage_metadata', None)
+            record_stage_usage(stage, time.monotonic() - call_started, usage)
+            gemini_quota_scheduler.settle(estimated_tokens, getattr(usage, 'total_token_count', None))
+            if cancel_token is not None and cancel_token.cancelled:
+                # 호출 중에 사용자가 떠나 결과를 받을 사람이 없는 호출
+                increment_metric('abandoned_llm_responses')
+            return response
+    finally:
+        llm_priority_lanes.release(priority)
+
+    increment_metric('llm_quota_rejections')
+    gemini_circuit_breaker.release_trial()
+    raise QuotaWaitTooLong(gemini_quota_scheduler.expected_wait(estimated_tokens))
+
+# 모델 라우팅 설정
+GEMINI_ROUTER_EWMA_ALPHA = float(os.getenv('GEMINI_ROUTER_EWMA_ALPHA', '0.2'))
+GEMINI_ROUTER_EXPLORE_EVERY = int(os.getenv('GEMINI_ROUTER_EXPLORE_EVERY', '20'))
+GEMINI_HEDGING_ENABLED = os.getenv('GEMINI_HEDGING_ENABLED', '1') == '1'
+GEMINI_HEDGED_STAGES = {'draft'}
+GEMINI_HEDGE_DEFAULT_AFTER_SECONDS = float(os.getenv('GEMINI_HEDGE_DEFAULT_AFTER_SECONDS', '8'))
+GEMINI_HEDGE_MIN_SAMPLES = 10
+gemini_hedge_executor = None
+gemini_hedge_executor_lock = threading.Lock()
+
+# 공급자 측 컨텍스트 캐시 (고정 지시문을 서버에 캐시, 지원 모델/최소 토큰 조건을 만족할 때만 사용)
+GEMINI_CONTEXT_CACHE_ENABLED = os.getenv('GEMINI_CONTEXT_CACHE_ENABLED', '0') == '1'
+GEMINI_CONTEXT_CACHE_TTL_SECONDS = int(os.getenv('GEMINI_CONTEXT_CACHE_TTL_SECONDS', '3600'))
+gemini_model_expiry = {}
+gemini_context_cache_unsupported = set()
+gemini_model_build_lock = threading.Lock()
+
+def get_stage_system_instruction(stage):
+    """단계별 고정 지시문 템플릿 (없으면 None)"""
+    if stage in ('refine', 'refine_batch', 'refine_followup'):
+        return prompt_registry.get('refine_system')
+    if stage in ('draft', 'draft_section'):
+        return prompt_registry.get('draft_system')
+    return None
+
+def build_stage_model(model_name, system_instruction, instance_key):
+    """
+    단계용 GenerativeModel 생성
+
+    컨텍스트 캐시를 켠 경우 고정 지시문을 서버에 캐시한 모델을 먼저 시도하고,
+    지원하지 않는 모델이거나 지시문이 최소 캐시 크기보다 작으면 system_instruction 모델을 사용합니다.
+    """
+    genai_module = get_genai()
+    if system_instruction is None:
+        return genai_module.GenerativeModel(model_name)
+
+    if GEMINI_CONTEXT_CACHE_ENABLED and instance_key not in gemini_context_cache_unsupported:
+        try:
+            cached_content = genai_module.caching.CachedContent.create(
+                model=f"models/{model_name}",
+                system_instruction=system_instruction,
+                ttl=timedelta(seconds=GEMINI_CONTEXT_CACHE_TTL_SECONDS)
+            )
+            # 만료 직전에 다시 만들도록 여유를 두고 기록
+            gemini_model_expiry[instance_key] = time.monotonic() + GEMINI_CONTEXT_CACHE_TTL_SECONDS * 0.9
+            increment_metric('llm_context_cache_created')
+            logger.info(f"컨텍스트 캐시 생성: {instance_key}")
+            return genai_module.GenerativeModel.from_cached_content(cached_content=cached_content)
+        except Exception as e:
+            gemini_context_cache_unsupported.add(instance_key)
+            logger.info(f"컨텍스트 캐시 사용 불가 ({instance_key}), system_instruction 사용: {e}")
+
+    return genai_module.GenerativeModel(model_name, system_instruction=system_instruction)
+
+def get_generative_model(model_name, stage=None):
+    """
+    모델 이름(과 단계)으로 GenerativeModel 인스턴스 반환 (재사용)
+
+    고정 지시문이 있는 단계는 지시문을 system_instruction으로 가진 모델을 단계/지시문 버전별로
+    미리 만들어 두고, 요청마다 달라지는 본문만 전송합니다.
+    """
+    system_template = get_stage_system_instruction(stage)
+    system_instruction = None if system_template is None else system_template.text
+    instance_key = model_name if system_template is None else f"{model_name}#{stage}#{system_template.version}"
+    instance = gemini_model_instances.get(instance_key)
+    expiry = gemini_model_expiry.get(instance_key)
+    if instance is None or (expiry is not None and time.monotonic() > expiry):
+        with gemini_model_build_lock:
+            instance = gemini_model_instances.get(instance_key)
+            expiry = gemini_model_expiry.get(instance_key)
+            if instance is None or (expiry is not None and time.monotonic() > expiry):
+                gemini_model_expiry.pop(instance_key, None)
+                instance = build_stage_model(model_name, system_instruction, instance_key)
+                # 지시문 버전이 바뀌어 더 이상 쓰지 않는 같은 단계의 이전 모델 정리
+                if system_template is not None:
+                    stale_prefix = f"{model_name}#{stage}#"
+                    for key in [key for key in gemini_model_instances if key.startswith(stale_prefix)]:
+                        gemini_model_instances.pop(key, None)
+                        gemini_model_expiry.pop(key, None)
+                gemini_model_instances[instance_key] = instance
+    return instance
+
+def get_hedge_executor():
+    """헤지 요청용 스레드 풀 (첫 사용 시 생성)"""
+    global gemini_hedge_executor
+    if gemini_hedge_executor is None:
+        with gemini_hedge_executor_lock:
+            if gemini_hedge_executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                gemini_hedge_executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv('GEMINI_HEDGE_MAX_WORKERS', '8')),
+                    thread_name_prefix='gemini-hedge'
+                )
+    return gemini_hedge_executor
+
+class ModelRouter:
+    """
+    모델/단계별 응답 시간과 오류율의 지수이동평균(EWMA)을 추적하여 가장 빠른 정상 모델 선택
+
+    아직 측정이 없는 모델은 일정 호출마다 한 번씩 시도해 보고(탐색),
+    최근 응답 시간 분포의 p95는 헤지 요청 시점을 정하는 데 사용합니다.
+    """
+
+    def __init__(self, alpha, explore_every):
+        self.alpha = alpha
+        self.explore_every = explore_every
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._choices = 0
+        self._unavailable = set()
+
+    def _stat(self, model_name, stage):
+        key = (model_name, stage)
+        if key not in self._stats:
+            self._stats[key] = {'latency': None, 'error_rate': 0.0, 'samples': 0, 'recent': []}
+        return self._stats[key]
+
+    def record(self, model_name, stage, latency, ok):
+        """호출 결과 기록 (실패한 호출도 걸린 시간은 반영)"""
+        with self._lock:
+            stat = self._stat(model_name, stage)
+            stat['samples'] += 1
+            stat['error_rate'] = (1 - self.alpha) * stat['error_rate'] + self.alpha * (0.0 if ok else 1.0)
+            if ok:
+                if stat['latency'] is None:
+                    stat['latency'] = latency
+                else:
+                    stat['latency'] = (1 - self.alpha) * stat['latency'] + self.alpha * latency
+                stat['recent'].append(latency)
+                del stat['recent'][:-50]
+
+    def mark_unavailable(self, model_name):
+        """존재하지 않거나 권한이 없는 모델은 이후 선택에서 제외"""
+        with self._lock:
+            if model_name not in self._unavailable:
+                logger.warning(f"모델 {model_name} 사용 불가 - 라우팅 후보에서 제외")
+                self._unavailable.add(model_name)
+
+    def is_available(self, model_name):
+        with self._lock:
+            return model_name not in self._unavailable
+
+    def _score(self, stat, rank):
+        if stat['latency'] is None:
+            # 측정 전에는 후보 순서를 따름 (앞의 모델일수록 우선)
+            return float('inf') if rank else 0.0
+        return stat['latency'] * (1 + 4 * stat['error_rate'])
+
+    def choose(self, stage, candidates, exclude=()):
+        """단계에 사용할 모델 선택"""
+        with self._lock:
+            available = [name for name in candidates if name not in exclude and name not in self._unavailable]
+            if not available:
+                return None
+            self._choices += 1
+            stats = [(name, self._stat(name, stage)) for name in available]
+            healthy = [(name, stat) for name, stat in stats if stat['error_rate'] < 0.5] or stats
+            unexplored = [name for name, stat in healthy if stat['samples'] == 0]
+            if unexplored and self._choices % self.explore_every == 0:
+                return unexplored[0]
+            ranked = sorted(
+                ((self._score(stat, available.index(name)), name) for name, stat in healthy)
+            )
+            return ranked[0][1]
+
+    def hedge_after(self, model_name, stage):
+        """헤지 요청을 보낼 시점 (해당 모델/단계의 최근 p95, 표본이 적으면 기본값)"""
+        with self._lock:
+            recent = sorted(self._stat(model_name, stage)['recent'])
+        if len(recent) < GEMINI_HEDGE_MIN_SAMPLES:
+            return GEMINI_HEDGE_DEFAULT_AFTER_SECONDS
+        return recent[min(len(recent) - 1, int(len(recent) * 0.95))]
+
+    def state(self):
+        """모델/단계별 통계 (/metrics 용)"""
+        with self._lock:
+            return {
+                f"{model_name}:{stage}": {
+                    'latency_ewma_ms': None if stat['latency'] is None else int(stat['latency'] * 1000),
+                    'error_rate': round(stat['error_rate'], 3),
+                    'samples': stat['samples']
+                }
+                for (model_name, stage), stat in self._stats.items()
+            } | {'unavailable': sorted(self._unavailable)}
+
+gemini_model_router = ModelRouter(GEMINI_ROUTER_EWMA_ALPHA, GEMINI_ROUTER_EXPLORE_EVERY)
+
+def is_model_unavailable_error(e):
+    """모델 이름이 없거나 접근 권한이 없는 오류인지 확인 (다른 모델로 바로 재시도 가능)"""
+    error_text = str(e).lower()
+    return type(e).__name__ in ('NotFound', 'PermissionDenied') or '404' in error_text or 'not found' in error_text
+
+def stage_model_candidates(stage):
+    """단계 프로필의 모델 후보 (없거나 모두 사용 불가면 전체 후보)"""
+    profile = get_stage_profile(stage)
+    if profile and profile.get('models'):
+        candidates = [name for name in profile['models'] if gemini_model_router.is_available(name)]
+        if candidates:
+            return candidates
+    return list(gemini_model_candidates)
+
+def _timed_llm_call(model_name, prompt, stage, ctx):
+    """라우터에 응답 시간/성공 여부를 기록하며 호출"""
+    start_time = time.monotonic()
+    try:
+        response = call_llm(get_generative_model(model_name, stage), prompt, stage, ctx=ctx)
+    except (QuotaWaitTooLong, CircuitOpenError, LLMBudgetExceeded):
+        raise
+    except Exception as e:
+        if is_model_unavailable_error(e):
+            gemini_model_router.mark_unavailable(model_name)
+        else:
+            gemini_model_router.record(model_name, stage, time.monotonic() - start_time, ok=False)
+        raise
+    gemini_model_router.record(model_name, stage, time.monotonic() - start_time, ok=True)
+    return response
+
+def call_llm_routed(prompt, stage, ctx=None, fallback_model=None):
+    """
+    단계 프로필의 모델 후보 중 라우터가 고른 모델로 Gemini 호출 (초안 작성 단계는 헤지 요청 지원)
+
+    프로필에 지정한 모델이 없거나 권한이 없으면 후보에서 빼고 다음 모델로 한 번 더 시도합니다.
+
+    헤지 요청: 첫 요청이 해당 모델의 p95 응답 시간을 넘기면 다른 모델로 같은 요청을 한 번 더
+    보내고 먼저 끝난 응답을 사용합니다. 늦은 쪽은 아직 시작 전이면 취소하고, 이미 전송된 경우
+    결과를 버립니다. 할당량 여유와 요청 예산이 있을 때만 헤지합니다.
+
+    Args:
+        prompt (str): 프롬프트
+        stage (str): 호출 단계
+        ctx (ProposalRequestContext): 요청 상태
+        fallback_model (GenerativeModel): 라우팅 후보가 없을 때 사용할 모델
+    """
+    try:
+        return _call_llm_routed_once(prompt, stage, ctx, fallback_model)
+    except Exception as e:
+        if not is_model_unavailable_error(e):
+            raise
+        logger.warning(f"{stage} 단계 모델 사용 불가, 다른 후보로 재시도: {e}")
+        return _call_llm_routed_once(prompt, stage, ctx, fallback_model)
+
+def _call_llm_routed_once(prompt, stage, ctx, fallback_model):
+    """call_llm_routed의 1회 시도 (헤지 요청 포함)"""
+    candidates = stage_model_candidates(stage)
+    primary = gemini_model_router.choose(stage, candidates)
+    if primary is None:
+        # 후보가 없으면 호출한 쪽에서 확인한 모델 사용 (고정 지시문이 있는 단계는 같은 이름으로 단계용 모델 구성)
+        fallback_name = getattr(fallback_model, 'model_name', '').replace('models/', '')
+        system_template = get_stage_system_instruction(stage)
+        if system_template is not None:
+            if fallback_name:
+                return _timed_llm_call(fallback_name, prompt, stage, ctx)
+            prompt = f"{system_template.text}\n\n{prompt}"
+        return call_llm(fallback_model, prompt, stage, ctx=ctx)
+
+    hedge_allowed = (
+        GEMINI_HEDGING_ENABLED
+        and stage in GEMINI_HEDGED_STAGES
+        and len(candidates) > 1
+    )
+    if not hedge_allowed:
+        return _timed_llm_call(primary, prompt, stage, ctx)
+
+    from concurrent.futures import wait, FIRST_COMPLETED
+    executor = get_hedge_executor()
+    caller_calls = get_thread_llm_calls()
+    futures = {executor.submit(_timed_llm_call, primary, prompt, stage, ctx): primary}
+    try:
+        done, _ = wait(futures, timeout=gemini_model_router.hedge_after(primary, stage))
+        if not done:
+            secondary = gemini_model_router.choose(stage, candidates, exclude={primary})
+            has_budget = ctx is None or ctx.llm_calls < ctx.llm_budget
+            has_quota = gemini_quota_scheduler.expected_wait() == 0
+            if secondary and has_budget and has_quota:
+                increment_metric('llm_hedged_requests')
+                logger.info(f"헤지 요청 전송: {primary} 응답 지연 -> {secondary}")
+                futures[executor.submit(_timed_llm_call, secondary, prompt, stage, ctx)] = secondary
+
+        pending = set(futures)
+        first_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    first_error = first_error or e
+                    continue
+                if futures[future] != primary:
+                    increment_metric('llm_hedge_wins')
+                for other in pending:
+                    if other.cancel():
+                        increment_metric('llm_hedge_cancelled')
+                    else:
+                        increment_metric('llm_hedge_discarded')
+                return response
+        raise first_error
+    finally:
+        # 스레드 풀에서 실행한 호출도 요청한 스레드의 호출 횟수로 집계
+        llm_call_local.count = caller_calls + len(futures)
 
 # 한글 폰트 등록
 def register_korean_fonts():
     """한글 폰트 등록"""
     try:
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+
+
         # 현재 작업 디렉토리와 Flask 앱 루트 디렉토리 확인
         cwd = os.getcwd()
         app_root = os.path.dirname(os.path.abspath(__file__))
@@ -197,61 +1437,611 @@ def register_korean_fonts():
         logger.error(f"상세 오류: {traceback.format_exc()}")
         return False
 
-        # 폰트 등록 실행
-register_korean_fonts()
+# 기본 시설물 페이지 (실제로는 크롤링으로 수집)
+DEFAULT_FACILITY_PAGES = {
+    "태산패밀리파크": "물놀이장, 조각공원, 야외공연장 등을 갖춘 김포시의 대표적인 가족 공원",
+    "무지개 뜨는 언덕": "김포시의 공설봉안당으로 추모와 사색을 위한 실내 시설",
+    "시민회관": "김포시의 문화행사와 시민활동을 위한 공공시설",
+    "생활체육관": "김포시민들의 체육활동과 건강관리를 위한 종합체육시설",
+    "도서관": "김포시민들의 독서와 학습을 위한 공공도서관"
+}
 
-def crawl_gimpo_facilities():
-    """김포도시공사 홈페이지 크롤링 (시뮬레이션)"""
-    logger.info("김포도시공사 홈페이지 크롤링 시작...")
-    
+def fetch_facility_pages():
+    """
+    김포도시공사 홈페이지 시설물 안내 페이지 수집 (시뮬레이션)
+
+    Returns:
+        dict: {시설물명: 페이지 본문}
+    """
+    # 실제 크롤링 로직 (현재는 시뮬레이션)
+    return dict(DEFAULT_FACILITY_PAGES)
+
+def hash_facility_page(page_content):
+    """시설물 페이지 본문 해시 (공백 차이는 변경으로 보지 않음)"""
+    normalized = re.sub(r'\s+', ' ', page_content or '').strip()
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+def parse_facility_page(facility_name, page_content):
+    """시설물 페이지 본문에서 시설 설명 추출"""
+    from bs4 import BeautifulSoup
+    text = BeautifulSoup(page_content or '', 'html.parser').get_text(' ', strip=True)
+    return re.sub(r'\s+', ' ', text).strip()
+
+def load_facility_snapshot():
+    """이전 크롤링 스냅샷 불러오기 (시설물 정보, 페이지 해시, 장소 맥락 설명)"""
+    global facility_database, facility_page_hashes, facility_contexts
     try:
-        # 실제 크롤링 로직 (현재는 시뮬레이션)
-        facilities = {}
-        
-        # 기본 시설물 정보 (실제로는 크롤링으로 수집)
-        default_facilities = {
-            "태산패밀리파크": "물놀이장, 조각공원, 야외공연장 등을 갖춘 김포시의 대표적인 가족 공원",
-            "무지개 뜨는 언덕": "김포시의 공설봉안당으로 추모와 사색을 위한 실내 시설",
-            "시민회관": "김포시의 문화행사와 시민활동을 위한 공공시설",
-            "생활체육관": "김포시민들의 체육활동과 건강관리를 위한 종합체육시설",
-            "도서관": "김포시민들의 독서와 학습을 위한 공공도서관"
+        if not os.path.exists(FACILITY_SNAPSHOT_PATH):
+            return False
+        with open(FACILITY_SNAPSHOT_PATH, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        facility_database = dict(snapshot.get('facilities', {}))
+        facility_page_hashes = dict(snapshot.get('page_hashes', {}))
+        facility_contexts = {
+            name: context for name, context in snapshot.get('contexts', {}).items()
+            if name in facility_database
         }
-        
-        # 기본 시설물 정보 사용
-        facilities.update(default_facilities)
-        
-        logger.info(f"총 {len(facilities)}개 시설물 정보 수집 완료")
-        return facilities
-        
+        # 다른 버전의 프롬프트로 만든 설명은 버리고 다시 생성
+        if facility_contexts and snapshot.get('contexts_prompt_version') != prompt_registry.version('enrich_request'):
+            logger.info("장소 맥락 설명 프롬프트가 바뀌어 저장된 설명을 다시 생성합니다.")
+            facility_contexts = {}
+        build_facility_name_index()
+        logger.info(f"시설물 스냅샷 로드 완료: {len(facility_database)}개 ({snapshot.get('crawled_at')})")
+        return True
     except Exception as e:
-        logger.error(f"시설물 크롤링 중 오류 발생: {str(e)}")
-        return {}
+        logger.warning(f"시설물 스냅샷 로드 실패: {e}")
+        return False
 
-def get_location_context(location_name):
-    """장소 유형 및 특징 파악 (크롤링 데이터 우선 사용)"""
-    try:
-        # 크롤링 데이터에서 먼저 확인
-        if location_name in facility_database:
-            return facility_database[location_name]
-        
-        # AI를 통한 장소 분석 (크롤링 데이터가 없는 경우)
-        if model is None:
+def save_facility_snapshot():
+    """현재 시설물 정보, 페이지 해시, 장소 맥락 설명을 스냅샷으로 저장 (원자적 교체)"""
+    with facility_snapshot_lock:
+        # 다른 스레드가 저장 중에 고치지 못하도록 복사본을 저장
+        snapshot = {
+            'crawled_at': datetime.now().isoformat(),
+            'facilities': dict(facility_database),
+            'page_hashes': dict(facility_page_hashes),
+            'contexts': dict(facility_contexts),
+            'contexts_prompt_version': prompt_registry.version('enrich_request')
+        }
+        try:
+            tmp_path = f"{FACILITY_SNAPSHOT_PATH}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, FACILITY_SNAPSHOT_PATH)
+        except Exception as e:
+            logger.warning(f"시설물 스냅샷 저장 실패: {e}")
+
+def record_cache_dependency(location_name, kind, cache_key):
+    """캐시 항목이 어떤 장소(시설물) 정보에 의존하는지 기록"""
+    with cache_lock:
+        deps = facility_cache_dependencies.setdefault(location_name, {'contexts': set(), 'proposals': set()})
+        deps[kind].add(cache_key)
+
+def invalidate_facility_caches(facility_names):
+    """
+    변경된 시설물에 의존하는 캐시 항목만 무효화
+
+    Returns:
+        dict: 무효화된 장소 맥락 메모 / 제안서 캐시 개수
+    """
+    invalidated = {'location_contexts': 0, 'proposals': 0}
+    with cache_lock:
+        for facility_name in facility_names:
+            deps = facility_cache_dependencies.pop(facility_name, None)
+            if not deps:
+                continue
+            for key in deps['contexts']:
+                if location_context_cache.pop(key, None) is not None:
+                    invalidated['location_contexts'] += 1
+            for key in deps['proposals']:
+                if proposal_cache.pop(key, None) is not None:
+                    invalidated['proposals'] += 1
+    return invalidated
+
+def refresh_facility_database():
+    """
+    시설물 정보 증분 새로고침
+
+    페이지 본문 해시를 이전 크롤링과 비교하여 내용이 바뀐 시설물만 다시 파싱하고,
+    해당 시설물에 의존하는 캐시만 무효화합니다.
+
+    Returns:
+        dict: 변경 내역
+            {
+                'added': list, 'changed': list, 'removed': list,
+                'unchanged': int, 'invalidated': dict
+            }
+    """
+    global facility_database, facility_page_hashes
+    with facility_refresh_lock:
+        logger.info("시설물 정보 증분 새로고침 시작...")
+        pages = fetch_facility_pages()
+
+        new_database = {}
+        new_hashes = {}
+        diff = {'added': [], 'changed': [], 'removed': [], 'unchanged': 0}
+
+        for facility_name, page_content in pages.items():
+            page_hash = hash_facility_page(page_content)
+            new_hashes[facility_name] = page_hash
+            previous_hash = facility_page_hashes.get(facility_name)
+
+            if previous_hash == page_hash and facility_name in facility_database:
+                # 내용이 바뀌지 않은 페이지는 다시 파싱하지 않음
+                new_database[facility_name] = facility_database[facility_name]
+                diff['unchanged'] += 1
+                continue
+
+            new_database[facility_name] = parse_facility_page(facility_name, page_content)
+            if facility_name in facility_database:
+                diff['changed'].append(facility_name)
+            else:
+                diff['added'].append(facility_name)
+
+        diff['removed'] = [name for name in facility_database if name not in pages]
+
+        facility_database = new_database
+        facility_page_hashes = new_hashes
+        for facility_name in diff['changed'] + diff['removed']:
+            # 내용이 바뀐 시설물의 장소 맥락 설명은 다시 생성해야 함
+            facility_contexts.pop(facility_name, None)
+        build_facility_name_index()
+
+        # 추가된 시설물도 무효화 대상 (이전에 AI가 추정한 장소 맥락이 있을 수 있음)
+        diff['invalidated'] = invalidate_facility_caches(diff['added'] + diff['changed'] + diff['removed'])
+
+        if diff['added'] or diff['changed'] or diff['removed']:
+            save_facility_snapshot()
+
+        logger.info(
+            f"시설물 새로고침 완료 - 추가 {len(diff['added'])}, 변경 {len(diff['changed'])}, "
+            f"삭제 {len(diff['removed'])}, 유지 {diff['unchanged']}"
+        )
+
+    # 새로 추가되거나 바뀐 시설물의 장소 맥락 설명은 백그라운드에서 미리 생성
+    if diff['added'] or diff['changed']:
+        start_facility_enrichment(diff['added'] + diff['changed'])
+    return diff
+
+# 시설물 별칭 (시민들이 흔히 부르는 이름)
+FACILITY_ALIASES = {
+    "태산패밀리파크": ["태산공원", "태산가족공원", "패밀리파크"],
+    "무지개 뜨는 언덕": ["무지개언덕", "공설봉안당", "봉안당"],
+    "시민회관": ["김포시민회관", "김포시 시민회관"],
+    "생활체육관": ["체육관", "김포생활체육관"],
+    "도서관": ["시립도서관", "공공도서관"]
+}
+
+# 이름 끝에 붙는 조사 (긴 것부터 제거)
+NAME_PARTICLES = sorted(
+    ["에서", "으로", "에게", "까지", "부터", "은", "는", "이", "가", "을", "를", "의", "에", "로", "와", "과", "도"],
+    key=len, reverse=True
+)
+
+# 지역명 접두어 (붙여 쓴 경우에도 제거 후보로 사용)
+NAME_REGION_PREFIXES = ["김포시", "김포"]
+
+FACILITY_MATCH_THRESHOLD = float(os.getenv('FACILITY_MATCH_THRESHOLD', '0.75'))
+
+CHOSEONG_LIST = ['ㄱ', 'ㄲ', 'ㄴ', 'ㄷ', 'ㄸ', 'ㄹ', 'ㅁ', 'ㅂ', 'ㅃ', 'ㅅ', 'ㅆ', 'ㅇ', 'ㅈ', 'ㅉ', 'ㅊ', 'ㅋ', 'ㅌ', 'ㅍ', 'ㅎ']
+JUNGSEONG_LIST = ['ㅏ', 'ㅐ', 'ㅑ', 'ㅒ', 'ㅓ', 'ㅔ', 'ㅕ', 'ㅖ', 'ㅗ', 'ㅘ', 'ㅙ', 'ㅚ', 'ㅛ', 'ㅜ', 'ㅝ', 'ㅞ', 'ㅟ', 'ㅠ', 'ㅡ', 'ㅢ', 'ㅣ']
+JONGSEONG_LIST = ['', 'ㄱ', 'ㄲ', 'ㄳ', 'ㄴ', 'ㄵ', 'ㄶ', 'ㄷ', 'ㄹ', 'ㄺ', 'ㄻ', 'ㄼ', 'ㄽ', 'ㄾ', 'ㄿ', 'ㅀ', 'ㅁ', 'ㅂ', 'ㅄ', 'ㅅ', 'ㅆ', 'ㅇ', 'ㅈ', 'ㅊ', 'ㅋ', 'ㅌ', 'ㅍ', 'ㅎ']
+
+CHOSEONG_SET = set(CHOSEONG_LIST) | {'ㄳ', 'ㄵ', 'ㄶ', 'ㄺ', 'ㄻ', 'ㄼ', 'ㄽ', 'ㄾ', 'ㄿ', 'ㅀ', 'ㅄ'}
+SUGGEST_MAX_RESULTS = 10
+
+# 시설물 이름 인덱스 (시설물 정보 로드/새로고침 시 미리 계산)
+facility_name_index = {
+    'exact': {},          # 정규화된 이름/별칭 -> (시설물명, 신뢰도)
+    'entries': [],        # (정규화된 이름, 자모 문자열, 시설물명, 기본 신뢰도)
+    'trie': {},           # 자동완성용 접두어 트라이
+    'choseong_trie': {},  # 초성 검색용 트라이
+    'version': ''
+}
+facility_name_resolve_cache = {}
+
+def decompose_hangul(text):
+    """한글 음절을 초성/중성/종성 자모로 분해 (오타 거리 계산용)"""
+    result = []
+    for char in text:
+        code = ord(char) - 0xAC00
+        if 0 <= code < 11172:
+            result.append(CHOSEONG_LIST[code // 588])
+            result.append(JUNGSEONG_LIST[(code % 588) // 28])
+            jong = JONGSEONG_LIST[code % 28]
+            if jong:
+                result.append(jong)
+        else:
+            result.append(char)
+    return ''.join(result)
+
+def normalize_facility_name(name):
+    """공백/기호 제거 및 끝에 붙은 조사 제거"""
+    normalized = re.sub(r'[\s\-_·.,()\[\]"\']+', '', (name or '').lower())
+    for particle in NAME_PARTICLES:
+        if normalized.endswith(particle) and len(normalized) - len(particle) >= 2:
+            return normalized[:-len(particle)]
+    return normalized
+
+def bounded_edit_distance(a, b, max_distance):
+    """
+    최대 거리를 넘으면 조기 종료하는 편집 거리
+
+    Returns:
+        int: 편집 거리 (max_distance 초과 시 max_distance + 1)
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        row_min = current[0]
+        for j, char_b in enumerate(b, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            )
+            row_min = min(row_min, current[j])
+        if row_min > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+def extract_choseong(text):
+    """한글 음절의 초성만 추출 (예: 시민회관 -> ㅅㅁㅎㄱ)"""
+    result = []
+    for char in text:
+        code = ord(char) - 0xAC00
+        if 0 <= code < 11172:
+            result.append(CHOSEONG_LIST[code // 588])
+        elif not char.isspace():
+            result.append(char)
+    return ''.join(result)
+
+def _trie_insert(trie, key, suggestion, rank):
+    """트라이에 키를 넣고 경로상의 모든 노드에 상위 추천 목록을 미리 계산"""
+    node = trie
+    for char in key:
+        node = node.setdefault(char, {})
+        top = node.setdefault('$top', [])
+        if any(existing[1]['facility'] == suggestion['facility'] for existing in top):
+            # 같은 시설물은 더 좋은 순위의 항목 하나만 유지
+            for i, existing in enumerate(top):
+                if existing[1]['facility'] == suggestion['facility'] and rank < existing[0]:
+                    top[i] = (rank, suggestion)
+            top.sort(key=lambda item: item[0])
+            continue
+        top.append((rank, suggestion))
+        top.sort(key=lambda item: item[0])
+        del top[SUGGEST_MAX_RESULTS:]
+
+def _trie_lookup(trie, key):
+    """접두어에 해당하는 미리 계산된 추천 목록 조회"""
+    node = trie
+    for char in key:
+        node = node.get(char)
+        if node is None:
+            return []
+    return [suggestion for _, suggestion in node.get('$top', [])]
+
+def build_facility_name_index():
+    """시설물명과 별칭으로 이름 인덱스 및 자동완성 트라이 구성"""
+    global facility_name_index, facility_name_resolve_cache
+    exact = {}
+    entries = []
+    trie = {}
+    choseong_trie = {}
+    for facility_name in sorted(facility_database):
+        variants = [(facility_name, 1.0)] + [(alias, 0.95) for alias in FACILITY_ALIASES.get(facility_name, [])]
+        for variant, base_confidence in variants:
+            normalized = normalize_facility_name(variant)
+            if not normalized:
+                continue
+            # 같은 정규화 이름이 여러 시설물에 걸치면 원래 이름을 우선
+            if normalized not in exact or exact[normalized][1] < base_confidence:
+                exact[normalized] = (facility_name, base_confidence)
+            entries.append((normalized, decompose_hangul(normalized), facility_name, base_confidence))
+
+            # 자동완성: 이름 전체와 띄어쓰기 단위 뒷부분 모두 접두어로 검색 가능하게 함
+            suggestion = {'facility': facility_name, 'label': variant}
+            words = variant.split()
+            for start in range(len(words)):
+                key = normalize_facility_name(''.join(words[start:]))
+                if not key:
+                    continue
+                # 순위: 원래 이름 > 별칭, 이름 시작 > 중간 단어, 짧은 이름 우선
+                rank = (base_confidence < 1.0, start > 0, len(key))
+                _trie_insert(trie, key, suggestion, rank)
+                _trie_insert(choseong_trie, extract_choseong(key), suggestion, rank)
+
+    version_source = json.dumps([sorted(exact.items()), FACILITY_ALIASES], ensure_ascii=False, sort_keys=True)
+    version = hashlib.sha256(version_source.encode('utf-8')).hexdigest()[:16]
+
+    # 참조 교체로 갱신 (조회 중인 요청은 이전 인덱스를 그대로 사용)
+    facility_name_index = {
+        'exact': exact,
+        'entries': entries,
+        'trie': trie,
+        'choseong_trie': choseong_trie,
+        'version': version
+    }
+    facility_name_resolve_cache = {}
+    logger.info(f"시설물 이름 인덱스 구성 완료: {len(entries)}개 항목")
+
+def suggest_facilities(query, limit=SUGGEST_MAX_RESULTS):
+    """
+    장소 자동완성 (접두어 / 초성 검색, 결과가 없으면 오타 허용 해석으로 보완)
+
+    Returns:
+        list: [{'facility': 시설물명, 'label': 일치한 이름 또는 별칭}, ...]
+    """
+    index = facility_name_index
+    compact = re.sub(r'\s+', '', query or '')
+    if not compact:
+        return []
+
+    if all(char in CHOSEONG_SET for char in compact):
+        suggestions = _trie_lookup(index['choseong_trie'], compact)
+    else:
+        suggestions = _trie_lookup(index['trie'], normalize_facility_name(compact))
+        if not suggestions:
+            # 조사가 붙기 전 형태로도 한 번 더 조회 (예: "시민회관에")
+            suggestions = _trie_lookup(index['trie'], compact.lower())
+
+    if not suggestions and len(compact) >= 2:
+        facility_name, confidence = resolve_facility_name(query)
+        if facility_name is not None and confidence >= FACILITY_MATCH_THRESHOLD:
+            suggestions = [{'facility': facility_name, 'label': facility_name}]
+
+    return suggestions[:limit]
+
+def _spaced_name(name):
+    """띄어쓰기를 남긴 채 기호만 공백으로 바꾼 장소명 (포함 일치의 낱말 경계 확인용)"""
+    return re.sub(r'\s+', ' ', re.sub(r'[\-_·.,()\[\]"\']+', ' ', (name or '').lower())).strip()
+
+def _skip_name_chars(spaced, count):
+    """공백을 제외한 글자 count개 뒤의 위치"""
+    position = 0
+    while count > 0 and position < len(spaced):
+        if spaced[position] != ' ':
+            count -= 1
+        position += 1
+    return position
+
+def _query_name_variants(location_name):
+    """입력 장소명에서 조회할 후보 (지역명 접두어 제거 포함, (정규화 이름, 띄어쓰기 유지 이름) 목록)"""
+    normalized = normalize_facility_name(location_name)
+    spaced = _spaced_name(location_name)
+    variants = [(normalized, spaced)]
+    for prefix in NAME_REGION_PREFIXES:
+        if normalized.startswith(prefix) and len(normalized) > len(prefix) + 1:
+            variants.append((
+                normalize_facility_name(normalized[len(prefix):]),
+                spaced[_skip_name_chars(spaced, len(prefix)):].strip()
+            ))
+    return [(variant, spaced) for variant, spaced in variants if variant]
+
+def _name_covers_prefix(spaced, name):
+    """
+    시설물명이 입력 맨 앞에서 낱말 또는 조사 경계까지 이어지는지
+
+    "도서관 앞", "도서관에서"는 도서관을 가리키지만, "어린이도서관", "학교 체육관"처럼
+    앞에 다른 말이 붙은 이름은 다른 장소이므로 포함 일치로 보지 않습니다.
+    """
+    if not spaced.replace(' ', '').startswith(name):
+        return False
+    rest = spaced[_skip_name_chars(spaced, len(name)):]
+    return not rest or rest[0] == ' ' or rest.split(' ', 1)[0] in NAME_PARTICLES
+
+def resolve_facility_name(location_name):
+    """
+    입력 장소명을 시설물명으로 해석 (정규화 → 정확 일치 → 포함 → 자모 편집 거리)
+
+    Returns:
+        tuple: (시설물명 또는 None, 신뢰도 0.0~1.0)
+    """
+    index = facility_name_index
+    cache = facility_name_resolve_cache
+    if location_name in cache:
+        return cache[location_name]
+
+    best = (None, 0.0)
+    for variant, spaced in _query_name_variants(location_name):
+        # 1) 정규화 후 정확 일치
+        if variant in index['exact']:
+            match = index['exact'][variant]
+            if match[1] > best[1]:
+                best = match
+            continue
+
+        variant_jamo = decompose_hangul(variant)
+        max_distance = min(3, max(1, len(variant_jamo) // 6))
+        for normalized, jamo, facility_name, base_confidence in index['entries']:
+            # 2) 시설물명으로 시작하는 입력 (예: "태산패밀리파크 놀이터")
+            if len(normalized) >= 3 and normalized in variant:
+                if _name_covers_prefix(spaced, normalized):
+                    confidence = base_confidence * (0.75 + 0.2 * len(normalized) / len(variant))
+                else:
+                    # 이름이 입력의 일부일 뿐인 경우 (예: "어린이도서관") 기준 미만으로 낮춤
+                    confidence = min(
+                        base_confidence * 0.6 * len(normalized) / len(variant),
+                        FACILITY_MATCH_THRESHOLD * 0.9
+                    )
+            # 3) 자모 단위 편집 거리 (예: "시민회광", "태산페밀리파크")
+            else:
+                distance = bounded_edit_distance(variant_jamo, jamo, max_distance)
+                if distance > max_distance:
+                    continue
+                confidence = base_confidence * (1.0 - distance / max(len(variant_jamo), len(jamo)))
+            if confidence > best[1]:
+                best = (facility_name, confidence)
+
+    result = (best[0], round(best[1], 3))
+    if len(cache) >= 4096:
+        cache.clear()
+    cache[location_name] = result
+    return result
+
+def get_location_context(location_name, ctx=None):
+    """장소 유형 및 특징 파악 (크롤링 데이터 우선 사용)"""
+    try:
+        # 크롤링 데이터에서 먼저 확인 (띄어쓰기/조사/오타를 허용하는 이름 인덱스 사용)
+        facility_name, confidence = resolve_facility_name(location_name)
+        if facility_name is not None and confidence >= FACILITY_MATCH_THRESHOLD:
+            logger.info(f"장소명 해석: '{location_name}' -> '{facility_name}' (신뢰도 {confidence})")
+        else:
+            facility_name = location_name if location_name in facility_database else None
+
+        # 알려진 시설물은 미리 생성된 설명을 사용 (요청 처리 중 AI 호출 없음)
+        if facility_name in facility_database:
+            context = facility_contexts.get(facility_name)
+            return context or summarize_facility_description(facility_database[facility_name])
+
+        # 이전 AI 분석 결과 재사용 (프롬프트 버전이 바뀌면 새로 분석)
+        context_cache_key = f"{prompt_registry.version('context_request')}:{location_name}"
+        with cache_lock:
+            cached_context = location_context_cache.get(context_cache_key)
+        if cached_context is not None:
+            return cached_context
+
+        # AI를 통한 장소 분석 (크롤링 데이터가 없는 경우, 부하 제한 중에는 생략)
+        model = get_model()
+        if model is None or (ctx is not None and ctx.single_pass):
             return "일반적인 공공시설"
-        
-        prompt = f"""
-        다음 장소의 유형과 특징을 한 문장으로 요약해주세요:
-        - "태산패밀리파크" → "물놀이장, 조각공원, 야외공연장 등을 갖춘 김포시의 대표적인 가족 공원"
-        - "무지개 뜨는 언덕" → "김포시의 공설봉안당으로 추모와 사색을 위한 실내 시설"
-        - "시민회관" → "김포시의 문화행사와 시민활동을 위한 공공시설"
-        """
-        
-        response = model.generate_content(prompt)
-        return response.text.strip()
-        
+
+        prompt = prompt_registry.render('context_request', location_name=location_name)
+
+        response = call_llm_routed(prompt, 'context', ctx=ctx, fallback_model=model)
+        context = response.text.strip()
+
+        with cache_lock:
+            location_context_cache[context_cache_key] = context
+        record_cache_dependency(location_name, 'contexts', context_cache_key)
+        return context
+
+    except RequestCancelled:
+        raise
     except Exception as e:
         logger.error(f"장소 정보 분석 오류: {e}")
         return "일반적인 공공시설"
 
+# 장소 맥락 설명 사전 생성 설정
+ENRICH_BATCH_SIZE = int(os.getenv('ENRICH_BATCH_SIZE', '25'))
+FACILITY_CONTEXT_MIN_LENGTH = 10
+FACILITY_CONTEXT_MAX_LENGTH = 120
+facility_enrichment_lock = threading.Lock()
+
+def summarize_facility_description(description):
+    """시설물 설명의 첫 문장을 장소 맥락으로 사용 (AI 없이 만드는 기본값)"""
+    text = re.sub(r'\s+', ' ', description or '').strip()
+    if not text:
+        return "일반적인 공공시설"
+    first_sentence = re.split(r'(?<=[.!?])\s', text, maxsplit=1)[0]
+    return first_sentence[:FACILITY_CONTEXT_MAX_LENGTH].rstrip(' .')
+
+def validate_facility_context(context):
+    """AI가 만든 장소 맥락 설명 검증 (한 문장, 적정 길이, 마크다운/따옴표 없음)"""
+    if not isinstance(context, str):
+        return None
+    text = context.strip().strip('"\'“”').strip()
+    if not (FACILITY_CONTEXT_MIN_LENGTH <= len(text) <= FACILITY_CONTEXT_MAX_LENGTH):
+        return None
+    if '\n' in text or text.startswith(('#', '-', '*', '{', '[')):
+        return None
+    if len(re.findall(r'[.!?]\s', text + ' ')) > 1:
+        return None
+    return text.rstrip(' .')
+
+def build_enrichment_prompt(batch):
+    """여러 시설물의 장소 맥락 설명을 한 번에 요청하는 프롬프트"""
+    facility_lines = '\n'.join(
+        f'- "{facility_name}": {description}' for facility_name, description in batch
+    )
+    return prompt_registry.render(
+        'enrich_request',
+        facility_lines=facility_lines,
+        max_length=FACILITY_CONTEXT_MAX_LENGTH
+    )
+
+def parse_enrichment_response(response_text):
+    """일괄 생성 응답(JSON) 파싱"""
+    text = response_text.strip()
+    if '```' in text:
+        text = text.split('```')[1]
+        if text.startswith('json'):
+            text = text[4:]
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end == -1:
+        return {}
+    try:
+        parsed = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+def enrich_facility_contexts(facility_names=None, batch_size=None):
+    """
+    시설물 장소 맥락 설명 일괄 생성 (한 번의 AI 호출에 여러 시설물)
+
+    Args:
+        facility_names (list): 생성할 시설물 (None이면 설명이 없는 모든 시설물)
+        batch_size (int): 프롬프트 하나에 넣을 시설물 수
+
+    Returns:
+        dict: {'generated': int, 'fallback': int, 'llm_calls': int}
+    """
+    batch_size = batch_size or ENRICH_BATCH_SIZE
+    with facility_enrichment_lock:
+        if facility_names is None:
+            facility_names = [name for name in facility_database if name not in facility_contexts]
+        targets = [(name, facility_database[name]) for name in facility_names if name in facility_database]
+        stats = {'generated': 0, 'fallback': 0, 'llm_calls': 0}
+        if not targets:
+            return stats
+
+        logger.info(f"장소 맥락 설명 생성 시작: {len(targets)}개 시설물")
+        for i in range(0, len(targets), batch_size):
+            batch = targets[i:i + batch_size]
+            generated = {}
+            model = get_model()
+            if model is not None:
+                try:
+                    response = call_llm_routed(build_enrichment_prompt(batch), 'enrich', fallback_model=model)
+                    stats['llm_calls'] += 1
+                    generated = parse_enrichment_response(response.text)
+                except Exception as e:
+                    logger.warning(f"장소 맥락 설명 일괄 생성 실패: {e}")
+
+            for facility_name, description in batch:
+                context = validate_facility_context(generated.get(facility_name))
+                if context:
+                    stats['generated'] += 1
+                else:
+                    # 검증에 실패한 항목은 홈페이지 설명 첫 문장으로 대체
+                    context = summarize_facility_description(description)
+                    stats['fallback'] += 1
+                facility_contexts[facility_name] = context
+
+        save_facility_snapshot()
+        logger.info(
+            f"장소 맥락 설명 생성 완료 - AI {stats['generated']}개, 기본값 {stats['fallback']}개, "
+            f"AI 호출 {stats['llm_calls']}회"
+        )
+        return stats
+
+def run_facility_enrichment(facility_names=None):
+    """장소 맥락 설명 생성 (대량 작업 등급으로 실행하여 시민 요청의 AI 호출을 방해하지 않음)"""
+    with priority_class('bulk'):
+        return enrich_facility_contexts(facility_names)
+
+def start_facility_enrichment(facility_names=None):
+    """장소 맥락 설명 생성을 백그라운드 스레드에서 실행"""
+    enrichment_thread = threading.Thread(target=run_facility_enrichment, args=(facility_names,))
+    enrichment_thread.daemon = True
+    enrichment_thread.start()
+    return enrichment_thread
+
 def extract_key_elements(problem, solution):
     """사용자 입력에서 핵심 요소 추출"""
     # 장소명 추출 (간단한 패턴 매칭)
@@ -289,49 +2079,816 @@ def extract_key_elements(problem, solution):
         'requested_solution': requested_solution
     }
 
-def generate_appropriate_title(core_location, core_target, solution_idea):
-    """핵심 내용을 파악하여 적절한 제안명 생성"""
+def classify_proposal_category(core_target):
+    """문제 대상 키워드로 제안 분야 분류 (제안명/로컬 초안 템플릿 선택용)"""
     # 안전 관련
     if any(keyword in core_target for keyword in ["방화문", "안전문", "문이 열려", "문이 열린", "문 열림"]):
-        return f"{core_location} 안전시설 점검 및 보강 제안"
+        return 'safety_door'
     elif any(keyword in core_target for keyword in ["안전", "위험", "사고", "부상"]):
-        return f"{core_location} 안전시설 보강 제안"
+        return 'safety'
     
     # 주차 관련
     elif any(keyword in core_target for keyword in ["주차", "주차공간", "주차장"]):
         if any(keyword in core_target for keyword in ["부족", "없음", "많이"]):
-            return f"{core_location} 주차공간 확충 제안"
+            return 'parking_shortage'
         else:
-            return f"{core_location} 주차시설 개선 제안"
+            return 'parking'
     
     # 휴게시설 관련
     elif any(keyword in core_target for keyword in ["벤치", "의자", "앉을 곳", "휴게"]):
         if any(keyword in core_target for keyword in ["낡", "부족", "없음", "많이"]):
-            return f"{core_location} 휴게시설 개선 제안"
+            return 'rest_repair'
         else:
-            return f"{core_location} 휴게시설 설치 제안"
+            return 'rest_install'
     
     # 편의시설 관련
     elif any(keyword in core_target for keyword in ["편의", "화장실", "음수대", "매점"]):
-        return f"{core_location} 편의시설 설치 제안"
+        return 'convenience'
     
     # 조명 관련
     elif any(keyword in core_target for keyword in ["조명", "밝기", "어둡", "불빛"]):
-        return f"{core_location} 조명시설 개선 제안"
+        return 'lighting'
     
     # 접근성 관련
     elif any(keyword in core_target for keyword in ["접근", "이동", "길", "보도"]):
-        return f"{core_location} 접근성 개선 제안"
+        return 'accessibility'
     
     # 청결/환경 관련
     elif any(keyword in core_target for keyword in ["청결", "깨끗", "쓰레기", "환경"]):
-        return f"{core_location} 환경정리 및 청결관리 개선 제안"
+        return 'cleanliness'
     
     # 일반적인 시설 개선
     else:
-        return f"{core_location} 시설 개선 제안"
+        return 'general'
+
+# 분야별 제안서 템플릿 (제안명, 문제 상황, 영향, 개선 조치, 기대 효과)
+# {location}, {target}, {target_i}(이/가), {target_eul}(을/를), {affected} 슬롯 사용
+PROPOSAL_CATEGORY_TEMPLATES = {
+    'safety_door': {
+        'title': "{location} 안전시설 점검 및 보강 제안",
+        'problem': "{location}의 {target_i} 제대로 관리되지 않아 비상 상황에서 이용객의 안전을 위협할 수 있는 상태입니다.",
+        'impact': "화재 등 비상 상황이 발생할 경우 피해가 커질 수 있어 신속한 점검이 필요합니다.",
+        'action': "안전시설 점검 및 보강",
+        'effect': "비상 상황에 대한 대비가 강화되어 {affected}의 안전이 확보되고, 시설에 대한 신뢰도가 높아질 것으로 기대됩니다."
+    },
+    'safety': {
+        'title': "{location} 안전시설 보강 제안",
+        'problem': "{location}의 {target_i} 이용객의 안전을 위협할 수 있는 상태입니다.",
+        'impact': "현재 상태가 유지될 경우 안전사고로 이어질 우려가 있어 보강이 필요합니다.",
+        'action': "안전시설 보강",
+        'effect': "안전사고 위험이 줄어들어 {affected} 누구나 안심하고 시설을 이용할 수 있을 것으로 기대됩니다."
+    },
+    'parking_shortage': {
+        'title': "{location} 주차공간 확충 제안",
+        'problem': "{location}의 {target} 문제로 방문객이 주차 공간을 찾는 데 어려움을 겪고 있습니다.",
+        'impact': "주차 공간을 찾기 위한 대기와 불법 주차로 주변 통행에도 불편이 생기고 있습니다.",
+        'action': "주차공간 확충",
+        'effect': "주차 편의가 높아져 {affected}의 시설 접근성이 개선되고, 주변 교통 혼잡도 완화될 것으로 기대됩니다."
+    },
+    'parking': {
+        'title': "{location} 주차시설 개선 제안",
+        'problem': "{location}의 {target_i} 이용객의 편의를 충분히 고려하지 못한 상태입니다.",
+        'impact': "주차시설 이용 과정에서 불편과 안전 우려가 함께 발생하고 있습니다.",
+        'action': "주차시설 개선",
+        'effect': "주차시설 이용이 편리하고 안전해져 {affected}의 시설 만족도가 높아질 것으로 기대됩니다."
+    },
+    'rest_repair': {
+        'title': "{location} 휴게시설 개선 제안",
+        'problem': "{location}의 {target_i} 노후화되거나 부족하여 이용객이 편히 쉬기 어려운 상태입니다.",
+        'impact': "휴게시설의 상태는 이용객의 안전과 시설의 미관에도 영향을 주고 있어 개선이 필요합니다.",
+        'action': "휴게시설 개선",
+        'effect': "쾌적한 휴식 공간이 마련되어 {affected}의 이용 편의가 높아지고, 시설 이용이 활성화될 것으로 기대됩니다."
+    },
+    'rest_install': {
+        'title': "{location} 휴게시설 설치 제안",
+        'problem': "{location}에는 {target_eul} 이용할 수 있는 휴게 공간이 충분하지 않은 상태입니다.",
+        'impact': "잠시 쉬어 갈 곳이 부족해 어르신과 어린이 등 이용객이 불편을 겪고 있습니다.",
+        'action': "휴게시설 설치",
+        'effect': "휴식 공간이 확보되어 {affected}의 이용 편의가 높아지고, 머물고 싶은 공간으로 활성화될 것으로 기대됩니다."
+    },
+    'convenience': {
+        'title': "{location} 편의시설 설치 제안",
+        'problem': "{location}의 {target_i} 이용객의 수요에 비해 충분하지 않은 상태입니다.",
+        'impact': "기본적인 편의시설이 부족해 시설 이용 시간 동안 불편이 이어지고 있습니다.",
+        'action': "편의시설 설치 및 개선",
+        'effect': "편의시설이 갖춰져 {affected}의 이용 만족도가 높아지고, 시설을 더 오래 편리하게 이용할 수 있을 것으로 기대됩니다."
+    },
+    'lighting': {
+        'title': "{location} 조명시설 개선 제안",
+        'problem': "{location}의 {target_i} 야간에 충분한 밝기를 확보하지 못하고 있는 상태입니다.",
+        'impact': "어두운 환경은 보행 안전을 위협하고 야간 이용객의 불안감을 키우고 있습니다.",
+        'action': "조명시설 개선",
+        'effect': "야간 시야가 확보되어 {affected}의 보행 안전이 높아지고, 야간에도 안심하고 시설을 이용할 수 있을 것으로 기대됩니다."
+    },
+    'accessibility': {
+        'title': "{location} 접근성 개선 제안",
+        'problem': "{location}의 {target_i} 이용객이 이동하기에 불편한 상태입니다.",
+        'impact': "특히 교통약자의 이동에 어려움이 있어 접근성 개선이 필요합니다.",
+        'action': "이동 동선 및 접근성 개선",
+        'effect': "이동이 편리해져 {affected} 누구나 시설에 쉽게 접근할 수 있을 것으로 기대됩니다."
+    },
+    'cleanliness': {
+        'title': "{location} 환경정리 및 청결관리 개선 제안",
+        'problem': "{location}의 {target_i} 청결하게 관리되지 않고 있는 상태입니다.",
+        'impact': "위생 문제와 함께 시설의 미관과 이미지에도 좋지 않은 영향을 주고 있습니다.",
+        'action': "환경정리 및 청결관리 강화",
+        'effect': "쾌적한 환경이 조성되어 {affected}의 이용 만족도가 높아지고, 시설의 이미지도 개선될 것으로 기대됩니다."
+    },
+    'general': {
+        'title': "{location} 시설 개선 제안",
+        'problem': "{location}의 {target_i} 이용객의 불편을 초래하고 있는 상태입니다.",
+        'impact': "시설의 기능과 이용 편의를 위해 개선이 필요한 상황입니다.",
+        'action': "시설 개선",
+        'effect': "시설 이용 환경이 개선되어 {affected}의 편의가 높아지고, 시설 이용이 활성화될 것으로 기대됩니다."
+    }
+}
+
+def with_particle(word, with_final, without_final):
+    """받침 유무에 맞는 조사 붙이기 (예: 벤치 + 이/가 -> 벤치가)"""
+    last_char = word[-1] if word else ''
+    has_final = '가' <= last_char <= '힣' and (ord(last_char) - 0xAC00) % 28 != 0
+    return f"{word}{with_final if has_final else without_final}"
+
+def generate_appropriate_title(core_location, core_target, solution_idea):
+    """핵심 내용을 파악하여 적절한 제안명 생성"""
+    category = classify_proposal_category(core_target)
+    return PROPOSAL_CATEGORY_TEMPLATES[category]['title'].format(location=core_location)
+
+def generate_local_draft(core_location, core_target, problem_type, affected_people, solution_idea):
+    """
+    AI 호출 없이 분야별 템플릿으로 즉시 제안서 초안 생성 (수 밀리초)
+
+    규칙 기반 정제(rule_based_refine)가 충분히 다듬은 문장은 그대로 쓰고,
+    그렇지 않으면 분야별 문장으로 채웁니다. AI 초안이 준비되면 화면에서 교체됩니다.
+    """
+    category = classify_proposal_category(core_target)
+    template = PROPOSAL_CATEGORY_TEMPLATES[category]
+    rule_result, confidence = rule_based_refine(core_location, core_target, problem_type, affected_people, solution_idea)
+    target = rule_result['refined_target']
+    slots = {
+        'location': core_location,
+        'target': target,
+        'target_i': with_particle(target, '이', '가'),
+        'target_eul': with_particle(target, '을', '를'),
+        'affected': affected_people if affected_people else '시민'
+    }
+
+    if confidence >= RULE_NORMALIZER_SKIP_THRESHOLD:
+        problem = f"{rule_result['refined_problem_description']} {template['impact']}"
+    else:
+        problem = f"{template['problem'].format(**slots)} {template['impact']}"
+        if affected_people:
+            problem += f" 특히 {affected_people}에게 불편이 큰 상황입니다."
+
+    solution = f"김포도시공사에서 {core_location}의 {target}에 대한 {with_particle(template['action'], '을', '를')} 추진해 주실 것을 제안합니다."
+    if confidence >= RULE_NORMALIZER_SKIP_THRESHOLD:
+        solution += f" 구체적으로는 {rule_result['refined_solution']}"
+
+    return {
+        'title': template['title'].format(**slots),
+        'problem': problem,
+        'solution': solution,
+        'effect': template['effect'].format(**slots),
+        'category': category
+    }
 
-def refine_user_input(core_location, core_target, problem_type, affected_people, solution_idea):
+# 프롬프트 템플릿 디렉터리 (버전이 붙은 템플릿 파일, 변경 시 재시작 없이 다시 불러옴)
+PROMPTS_DIR = os.getenv('PROMPTS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prompts'))
+PROMPT_RELOAD_INTERVAL = float(os.getenv('PROMPT_RELOAD_INTERVAL', '2'))
+
+class PromptTemplate:
+    """
+    ${slot} 형식의 템플릿을 불러올 때 한 번만 분석해 두고, 요청마다 슬롯만 채워 넣는 템플릿
+
+    문법은 string.Template과 같습니다 ($slot, ${slot}, $$는 $ 문자).
+    """
+
+    def __init__(self, name, version, text):
+        self.name = name
+        self.version = version
+        self.text = text
+        self._literals = []
+        self._slot_names = []
+        position = 0
+        for match in string.Template.pattern.finditer(text):
+            if match.group('invalid') is not None:
+                raise ValueError(f"프롬프트 '{name}'의 {match.start()}번째 문자에 잘못된 슬롯이 있습니다.")
+            self._literals.append(text[position:match.start()])
+            if match.group('escaped') is not None:
+                self._literals[-1] += '$'
+                self._slot_names.append(None)
+            else:
+                self._slot_names.append(match.group('named') or match.group('braced'))
+            position = match.end()
+        self._literals.append(text[position:])
+        self.slots = {slot for slot in self._slot_names if slot}
+
+    def render(self, **slots):
+        """슬롯 채우기 (빠진 슬롯은 KeyError)"""
+        parts = []
+        for literal, slot in zip(self._literals, self._slot_names):
+            parts.append(literal)
+            if slot:
+                parts.append(str(slots[slot]))
+        parts.append(self._literals[-1])
+        return ''.join(parts)
+
+class PromptRegistry:
+    """
+    manifest.json에 등록된 프롬프트 템플릿 묶음
+
+    파일이 바뀌면 다음 조회 시 전체를 새로 불러와 한 번에 교체하며(원자적 교체),
+    불러오기에 실패하면 이전 템플릿을 계속 사용합니다.
+    버전은 manifest의 version과 파일 내용 해시를 합친 값이라 버전을 올리지 않고 고쳐도 바뀝니다.
+    호출하는 코드가 채우지 않는 슬롯이 있는 템플릿은 받아들이지 않고 그 템플릿만 이전 버전을 유지합니다.
+    """
+
+    def __init__(self, directory, reload_interval, expected_slots=None):
+        self.directory = directory
+        self.reload_interval = reload_interval
+        # 템플릿 이름 -> 호출하는 코드가 채우는 슬롯 (등록되지 않은 템플릿은 검사하지 않음)
+        self.expected_slots = expected_slots or {}
+        self._templates = {}
+        self._signature = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def on_change(self, listener):
+        """템플릿이 바뀌었을 때 바뀐 이름 목록으로 호출할 함수 등록"""
+        self._listeners.append(listener)
+
+    def _manifest_path(self):
+        return os.path.join(self.directory, 'manifest.json')
+
+    def _current_signature(self):
+        """manifest와 템플릿 파일들의 수정 시각/크기"""
+        paths = [self._manifest_path()] + [
+            os.path.join(self.directory, name) for name in sorted(os.listdir(self.directory)) if name.endswith('.txt')
+        ]
+        return tuple((path, os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in paths)
+
+    def load(self):
+        """
+        모든 템플릿을 새로 불러와 교체
+
+        Returns:
+            list: 버전이 바뀐 템플릿 이름
+        """
+        with self._lock:
+            signature = self._current_signature()
+            with open(self._manifest_path(), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+
+            templates = {}
+            for name, entry in manifest.items():
+                with open(os.path.join(self.directory, entry['file']), 'r', encoding='utf-8') as f:
+                    text = f.read().rstrip('\n')
+                content_hash = hashlib.sha1(text.encode('utf-8')).hexdigest()[:8]
+                template = PromptTemplate(name, f"v{entry.get('version', 1)}-{content_hash}", text)
+                unknown_slots = template.slots - self.expected_slots.get(name, template.slots)
+                if unknown_slots:
+                    # 슬롯 오타 등은 요청마다 KeyError가 나므로 이전 버전을 계속 사용
+                    previous = self._templates.get(name)
+                    message = f"프롬프트 '{name}'에 채울 수 없는 슬롯이 있습니다: {', '.join(sorted(unknown_slots))}"
+                    if previous is None:
+                        raise ValueError(message)
+                    increment_metric('prompt_slot_mismatches')
+                    logger.error(f"{message} - 이전 버전({previous.version}) 계속 사용")
+                    template = previous
+                templates[name] = template
+
+            changed = [
+                name for name, template in templates.items()
+                if name not in self._templates or self._templates[name].version != template.version
+            ]
+            self._templates = templates
+            self._signature = signature
+            self._checked_at = time.monotonic()
+
+        if changed:
+            logger.info(f"프롬프트 템플릿 로드: {', '.join(f'{name}={templates[name].version}' for name in changed)}")
+            for listener in self._listeners:
+                try:
+                    listener(changed)
+                except Exception as e:
+                    logger.warning(f"프롬프트 변경 처리 오류: {e}")
+        return changed
+
+    def maybe_reload(self):
+        """마지막 확인 후 일정 시간이 지났고 파일이 바뀌었으면 다시 불러오기"""
+        if time.monotonic() - self._checked_at < self.reload_interval:
+            return
+        try:
+            if self._current_signature() == self._signature:
+                self._checked_at = time.monotonic()
+                return
+            self.load()
+        except Exception as e:
+            self._checked_at = time.monotonic()
+            logger.error(f"프롬프트 템플릿 다시 불러오기 실패 - 이전 템플릿 계속 사용: {e}")
+
+    def get(self, name):
+        """템플릿 조회 (필요하면 먼저 다시 불러오기)"""
+        self.maybe_reload()
+        return self._templates[name]
+
+    def render(self, name, **slots):
+        return self.get(name).render(**slots)
+
+    def version(self, *names):
+        """여러 템플릿의 버전을 합친 문자열 (캐시 키용)"""
+        self.maybe_reload()
+        return '|'.join(f"{name}={self._templates[name].version}" for name in names if name in self._templates)
+
+    def versions(self):
+        """전체 템플릿 버전 (/prompts 용)"""
+        self.maybe_reload()
+        return {name: template.version for name, template in self._templates.items()}
+
+# 템플릿별로 호출하는 코드가 채우는 슬롯 (시스템 지시문은 슬롯 없이 그대로 사용)
+PROMPT_TEMPLATE_SLOTS = {
+    'refine_system': set(),
+    'refine_request': {'core_location', 'core_target', 'problem_type', 'affected_people', 'solution_idea'},
+    'refine_batch_request': {'count', 'items'},
+    'refine_batch_item': {'id', 'core_location', 'core_target', 'problem_type', 'affected_people', 'solution_idea'},
+    'refine_followup_request': {
+        'core_location', 'core_target', 'problem_type', 'affected_people', 'solution_idea',
+        'refined_fields', 'missing_fields'
+    },
+    'draft_system': set(),
+    'draft_request': {
+        'use_location', 'use_target', 'use_problem_desc', 'use_solution', 'problem_type', 'affected_people',
+        'location_context', 'perspective'
+    },
+    'draft_section_request': {
+        'use_location', 'use_target', 'use_problem_desc', 'use_solution', 'section_label', 'current_text', 'violations'
+    },
+    'section_regenerate_request': {
+        'use_location', 'use_target', 'use_problem_desc', 'use_solution', 'problem_type', 'affected_people',
+        'location_context', 'other_sections', 'section_label', 'current_text'
+    },
+    'context_request': {'location_name'},
+    'enrich_request': {'facility_lines', 'max_length'}
+}
+
+prompt_registry = PromptRegistry(PROMPTS_DIR, PROMPT_RELOAD_INTERVAL, PROMPT_TEMPLATE_SLOTS)
+
+# 제안서 결과에 영향을 주는 프롬프트 (버전이 바뀌면 제안서 캐시 키가 달라짐)
+PROPOSAL_PROMPT_NAMES = (
+    'refine_system', 'refine_request', 'refine_batch_request', 'refine_batch_item', 'refine_followup_request',
+    'context_request', 'draft_system', 'draft_request', 'draft_section_request'
+)
+
+def handle_prompt_update(changed):
+    """장소 맥락 설명 프롬프트가 바뀌면 미리 생성한 설명을 다시 생성"""
+    if 'enrich_request' in changed and facility_contexts:
+        logger.info("장소 맥락 설명 프롬프트 변경 - 설명을 다시 생성합니다.")
+        facility_contexts.clear()
+        start_facility_enrichment()
+
+prompt_registry.on_change(handle_prompt_update)
+try:
+    prompt_registry.load()
+except Exception as e:
+    logger.error(f"프롬프트 템플릿 로드 실패 ({PROMPTS_DIR}): {e}")
+
+def build_refine_request(core_location, core_target, problem_type, affected_people, solution_idea):
+    """입력 정제 요청 본문 (요청마다 달라지는 사용자 입력만 포함)"""
+    return prompt_registry.render(
+        'refine_request',
+        core_location=core_location,
+        core_target=core_target,
+        problem_type=problem_type if problem_type else '명시되지 않음',
+        affected_people=affected_people if affected_people else '명시되지 않음',
+        solution_idea=solution_idea
+    )
+
+# 입력 정제 묶음 처리 (동시에 들어온 정제 요청을 짧은 시간 모아 한 번의 AI 호출로 처리)
+REFINE_BATCHING_ENABLED = os.getenv('REFINE_BATCHING_ENABLED', '0') == '1'
+REFINE_BATCH_WINDOW_SECONDS = float(os.getenv('REFINE_BATCH_WINDOW_MS', '50')) / 1000
+REFINE_BATCH_MAX_ITEMS = int(os.getenv('REFINE_BATCH_MAX_ITEMS', '8'))
+REFINE_BATCH_WAIT_TIMEOUT = 120
+# 묶음 응답을 기다리는 동안 요청 취소를 확인하는 간격
+REFINE_BATCH_CANCEL_CHECK_SECONDS = 0.25
+
+def strip_json_code_block(response_text):
+    """응답에서 JSON 코드 블록 표시 제거"""
+    if '```json' in response_text:
+        return response_text.split('```json')[1].split('```')[0].strip()
+    if '```' in response_text:
+        return response_text.split('```')[1].split('```')[0].strip()
+    return response_text
+
+class RefineFieldParser:
+    """
+    정제 응답에서 완성된 필드부터 꺼내는 관대한 파서
+
+    JSON 전체가 깨졌거나 출력이 중간에 잘려도 따옴표가 닫힌 필드 값은 살려내며,
+    응답을 조각 단위로 feed()할 수 있어 스트리밍 응답에도 그대로 사용할 수 있습니다.
+    """
+
+    FIELD_PATTERN = re.compile(r'"(' + '|'.join(REFINE_REQUIRED_FIELDS) + r')"\s*:\s*"')
+
+    def __init__(self):
+        self.buffer = ''
+        self.fields = {}
+        self._position = 0
+
+    def feed(self, chunk):
+        """
+        응답 조각 추가
+
+        Returns:
+            dict: 이번 조각으로 새로 완성된 필드
+        """
+        self.buffer += chunk
+        completed = {}
+        while True:
+            match = self.FIELD_PATTERN.search(self.buffer, self._position)
+            if not match:
+                break
+            try:
+                value, end = json.decoder.scanstring(self.buffer, match.end(), False)
+            except ValueError:
+                # 아직 닫히지 않은 문자열 - 다음 조각을 기다림
+                break
+            self._position = end
+            field = match.group(1)
+            if value.strip() and field not in self.fields:
+                self.fields[field] = value.strip()
+                completed[field] = self.fields[field]
+        return completed
+
+def parse_refined_fields(response_text):
+    """
+    정제 응답에서 유효한 필드만 추출 (엄격한 JSON 파싱 실패 시 필드 단위로 복구)
+
+    Returns:
+        dict: 값이 있는 필드만 담은 dict (빠진 필드는 호출한 쪽에서 후속 요청)
+    """
+    text = strip_json_code_block(response_text.strip())
+    try:
+        parsed = json.loads(text)
+        if isinstance(parsed, dict):
+            return {
+                field: parsed[field].strip() for field in REFINE_REQUIRED_FIELDS
+                if isinstance(parsed.get(field), str) and parsed[field].strip()
+            }
+    except json.JSONDecodeError:
+        pass
+
+    increment_metric('refine_parse_failures')
+    parser = RefineFieldParser()
+    parser.feed(text)
+    if parser.fields:
+        increment_metric('refine_salvaged_responses')
+        increment_metric('refine_salvaged_fields', len(parser.fields))
+        logger.info(f"정제 응답 JSON 오류 - 필드 {len(parser.fields)}개 복구: {', '.join(parser.fields)}")
+    return parser.fields
+
+def request_missing_refined_fields(user_input, refined_fields, missing_fields, ctx=None, fallback_model=None):
+    """
+    빠진 정제 필드만 짧은 후속 요청으로 다시 받기
+
+    Returns:
+        dict: 후속 요청으로 얻은 필드 (실패 시 빈 dict)
+    """
+    increment_metric('refine_followups')
+    prompt = prompt_registry.render(
+        'refine_followup_request',
+        core_location=user_input['core_location'],
+        core_target=user_input['core_target'],
+        problem_type=user_input['problem_type'] if user_input['problem_type'] else '명시되지 않음',
+        affected_people=user_input['affected_people'] if user_input['affected_people'] else '명시되지 않음',
+        solution_idea=user_input['solution_idea'],
+        refined_fields=json.dumps(refined_fields, ensure_ascii=False, indent=2) if refined_fields else '(없음)',
+        missing_fields=', '.join(missing_fields)
+    )
+    try:
+        response = call_llm_routed(prompt, 'refine_followup', ctx=ctx, fallback_model=fallback_model)
+        recovered = {
+            field: value for field, value in parse_refined_fields(response.text).items() if field in missing_fields
+        }
+    except QuotaWaitTooLong:
+        raise
+    except Exception as e:
+        logger.warning(f"정제 후속 요청 실패: {e}")
+        return {}
+    increment_metric('refine_followup_recovered_fields', len(recovered))
+    return recovered
+
+def complete_refined_input(refined_fields, core_location, core_target, solution_idea):
+    """
+    정제 결과 완성 (끝내 빠진 필드는 원본 입력으로 채움)
+
+    장소명/문제 대상은 원본으로 채워도 되지만, 문제 상황과 해결책이 빠지면 정제 실패로 처리합니다.
+    """
+    substantive_fields = ('refined_problem_description', 'refined_solution')
+    success = all(field in refined_fields for field in substantive_fields)
+    if not success:
+        increment_metric('refine_incomplete')
+        return {
+            'refined_location': core_location,
+            'refined_target': core_target,
+            'refined_problem_description': f"{core_location}의 {core_target}에 대한 문제가 있습니다.",
+            'refined_solution': solution_idea if solution_idea else "개선이 필요합니다.",
+            'success': False
+        }
+    return {
+        'refined_location': refined_fields.get('refined_location', core_location),
+        'refined_target': refined_fields.get('refined_target', core_target),
+        'refined_problem_description': refined_fields['refined_problem_description'],
+        'refined_solution': refined_fields['refined_solution'],
+        'success': True
+    }
+
+def build_refine_batch_request(items):
+    """여러 정제 요청을 하나로 묶은 요청 본문 (items: id와 사용자 입력을 담은 dict 목록)"""
+    item_blocks = [
+        prompt_registry.render(
+            'refine_batch_item',
+            id=item['id'],
+            core_location=item['core_location'],
+            core_target=item['core_target'],
+            problem_type=item['problem_type'] if item['problem_type'] else '명시되지 않음',
+            affected_people=item['affected_people'] if item['affected_people'] else '명시되지 않음',
+            solution_idea=item['solution_idea']
+        )
+        for item in items
+    ]
+    return prompt_registry.render('refine_batch_request', count=len(items), items='\n\n'.join(item_blocks))
+
+def parse_refine_batch_response(response_text):
+    """묶음 응답(JSON 배열)을 id별 정제 결과로 변환 (형식이 틀린 항목은 제외)"""
+    parsed = json.loads(strip_json_code_block(response_text.strip()))
+    if isinstance(parsed, dict):
+        parsed = parsed.get('items', [])
+    results = {}
+    for entry in parsed if isinstance(parsed, list) else []:
+        if not isinstance(entry, dict) or 'id' not in entry:
+            continue
+        if all(isinstance(entry.get(field), str) and entry[field].strip() for field in REFINE_REQUIRED_FIELDS):
+            results[str(entry['id'])] = {field: entry[field].strip() for field in REFINE_REQUIRED_FIELDS}
+    return results
+
+class RefineMicroBatcher:
+    """
+    입력 정제 요청 묶음 처리기
+
+    첫 요청이 들어오면 window초 동안(또는 max_items개가 찰 때까지) 요청을 모아
+    한 번의 AI 호출로 정제하고, 응답을 요청별로 나눠 돌려줍니다.
+    혼자 들어온 요청과 묶음 응답에서 빠지거나 형식이 틀린 항목은 None을 돌려주며,
+    호출한 쪽에서 개별 정제로 처리합니다.
+    """
+
+    def __init__(self, window, max_items):
+        self.window = window
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._pending = []
+        self._timer = None
+
+    def submit(self, item, ctx=None):
+        """
+        정제 요청을 묶음에 추가하고 결과를 기다림
+
+        Returns:
+            dict: 정제 결과 (success=True), 개별 정제가 필요하면 None
+
+        Raises:
+            QuotaWaitTooLong: 묶음 호출이 할당량 대기 한도를 넘은 경우
+            RequestCancelled: 기다리는 동안 요청이 취소된 경우
+        """
+        entry = {
+            'item': item, 'ctx': ctx, 'event': threading.Event(), 'result': None, 'error': None,
+            # 묶음 호출은 타이머나 다른 요청의 스레드에서 실행되므로 요청의 등급을 함께 보관
+            'priority': ctx.priority if ctx is not None else get_current_priority()
+        }
+        batch = None
+        with self._lock:
+            self._pending.append(entry)
+            if len(self._pending) >= self.max_items:
+                batch = self._take_pending()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if batch:
+            # 묶음을 채운 요청의 스레드에서 바로 호출
+            self._run(batch)
+
+        deadline = time.monotonic() + REFINE_BATCH_WAIT_TIMEOUT
+        while not entry['event'].wait(max(0.0, min(REFINE_BATCH_CANCEL_CHECK_SECONDS, deadline - time.monotonic()))):
+            if ctx is not None:
+                ctx.check_cancelled('refine')
+            if time.monotonic() >= deadline:
+                logger.warning("입력 정제 묶음 응답 대기 시간 초과 - 개별 정제로 처리")
+                return None
+        if entry['error'] is not None:
+            raise entry['error']
+        return entry['result']
+
+    def _take_pending(self):
+        batch, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _flush(self):
+        with self._lock:
+            batch = self._take_pending()
+        if batch:
+            self._run(batch)
+
+    def _run(self, batch):
+        try:
+            if len(batch) == 1:
+                return
+
+            # 묶음에 참여하는 요청마다 AI 호출 예산 1회 차감 (예산이 없는 요청은 개별 처리, 취소된 요청은 제외)
+            members = []
+            for entry in batch:
+                if entry['ctx'] is not None and entry['ctx'].cancelled:
+                    continue
+                try:
+                    if entry['ctx'] is not None:
+                        entry['ctx'].consume_llm_call('refine')
+                    members.append(entry)
+                except LLMBudgetExceeded:
+                    continue
+            if len(members) < 2:
+                # 혼자 남은 요청은 개별 정제에서 다시 차감하므로 되돌림
+                for entry in members:
+                    if entry['ctx'] is not None:
+                        entry['ctx'].refund_llm_call()
+                return
+
+            items = [dict(entry['item'], id=str(index + 1)) for index, entry in enumerate(members)]
+            # 묶음 안에서 가장 높은 등급으로 호출 (대량 작업만 모인 묶음은 bulk 등급 유지)
+            lane = max((entry['priority'] for entry in members), key=lambda name: priority_lanes_config[name]['weight'])
+            try:
+                with priority_class(lane):
+                    response = call_llm_routed(build_refine_batch_request(items), 'refine_batch', fallback_model=get_model())
+                results = parse_refine_batch_response(response.text)
+            except QuotaWaitTooLong as e:
+                for entry in members:
+                    entry['error'] = e
+                return
+            except Exception as e:
+                logger.warning(f"입력 정제 묶음 호출 실패 ({len(members)}건) - 개별 정제로 처리: {e}")
+                increment_metric('refine_batch_failures')
+                return
+
+            increment_metric('refine_batches')
+            increment_metric('refine_batched_items', len(members))
+            increment_metric('llm_calls_saved', len(members) - 1)
+            for item, entry in zip(items, members):
+                result = results.get(item['id'])
+                if result is None:
+                    increment_metric('refine_batch_item_fallbacks')
+                    continue
+                result['success'] = True
+                entry['result'] = result
+        finally:
+            for entry in batch:
+                entry['event'].set()
+
+refine_batcher = RefineMicroBatcher(REFINE_BATCH_WINDOW_SECONDS, REFINE_BATCH_MAX_ITEMS)
+
+# 규칙 기반 구어체 정규화 (AI 정제 전 단계, 규칙만으로 충분하면 AI 호출 생략)
+RULE_NORMALIZER_ENABLED = os.getenv('RULE_NORMALIZER_ENABLED', '1') == '1'
+RULE_NORMALIZER_SKIP_THRESHOLD = float(os.getenv('RULE_NORMALIZER_SKIP_THRESHOLD', '0.85'))
+
+# (패턴, 치환) - 위에서부터 차례로 적용 (자주 쓰는 표현 -> 어미 순)
+COLLOQUIAL_RULES = [(re.compile(pattern), replacement) for pattern, replacement in [
+    (r'삐(?:그|걱|꺽)덕?거리고|삐걱대고', '불안정한 상태이며'),
+    (r'삐(?:그|걱|꺽)덕?거(?:려요|림)', '불안정한 상태입니다'),
+    (r'노후(?:돼|되)서|낡아서', '노후화되어'),
+    (r'낡았(?:어요|음)|낡음', '노후화되었습니다'),
+    (r'낡았고|낡고', '노후화되었고'),
+    (r'보기(?:에)? 안 ?좋고', '미관상 좋지 않고'),
+    (r'보기(?:에)? 안 ?좋(?:아요|음)', '미관상 좋지 않습니다'),
+    (r'위험해 보이고', '안전상 위험할 수 있고'),
+    (r'위험해 보(?:임|여요)', '안전상 위험할 수 있습니다'),
+    (r'고장 ?나서', '고장으로 인해'),
+    (r'고장 ?(?:났어요|남)', '고장 난 상태입니다'),
+    (r'더러(?:워요|움)', '청결 상태가 좋지 않습니다'),
+    (r'어두(?:워요|움)', '어둡습니다'),
+    (r'했으면 좋겠(?:어요|음|다)', '할 것을 제안합니다'),
+    (r'해\s?주시면 좋겠(?:어요|습니다)', '해 주실 것을 제안합니다'),
+    (r'(\S+?)\s*(?<![필중])요함', r'\1할 것을 제안합니다'),
+    (r'(\S+?)\s?주세요', r'\1 주실 것을 제안합니다'),
+    (r'있어요', '있습니다'),
+    (r'없어요', '없습니다'),
+    (r'(?:돼|되)요', '됩니다'),
+    (r'해요', '합니다'),
+    (r'(?:이에요|예요)', '입니다'),
+    (r'([았었])어요', r'\1습니다'),
+    (r'([가-힣])[아어]요', r'\1습니다'),
+    (r'함(?=[.!?,]|\s*$)', '합니다'),
+    (r'됨(?=[.!?,]|\s*$)', '됩니다'),
+    (r'임(?=[.!?,]|\s*$)', '입니다'),
+    (r'([가-힣])음(?=[.!?,]|\s*$)', r'\1습니다'),
+]]
+
+# 규칙 적용 후에도 남아 있으면 AI 정제가 필요한 표현
+RESIDUAL_COLLOQUIAL_PATTERN = re.compile(r'요(?=[.!?~,]|\s*$)|[ㅋㅎㅠㅜ]|~|!{2,}|\?{2,}|(?:너무|진짜|완전|엄청|겁나|좀)\s')
+FORMAL_SENTENCE_PATTERN = re.compile(r'(?:습니다|입니다|됩니다|합니다|바랍니다)[.!]?$')
+TARGET_SUBJECT_PATTERN = re.compile(r'^(.+?)(?:이|가)\s')
+# 서술어로 끝나는 낱말 (주어가 없는 문제 대상에서 앞쪽 명사구만 남길 때 사용)
+PREDICATE_WORD_PATTERN = re.compile(r'(?:니다|[다고며서]|되어|하여|해서|않아|[가-힣]음|[가-힣]함)$')
+SOLUTION_ACTION_PATTERN = re.compile(r'(?:설치|교체|보수|수리|정비|확충|개선|추가|철거|이전|증설|도색|청소|점검|보강|신설)$')
+
+def normalize_colloquial(text):
+    """
+    구어체 표현을 문어체로 변환 (미리 컴파일한 규칙 적용)
+
+    Returns:
+        tuple: (변환된 문장, 적용된 규칙 수)
+    """
+    normalized = re.sub(r'\s+', ' ', (text or '')).strip()
+    applied = 0
+    for pattern, replacement in COLLOQUIAL_RULES:
+        normalized, count = pattern.subn(replacement, normalized)
+        applied += count
+    return normalized, applied
+
+def has_repeated_word(text):
+    """조사를 뗀 같은 낱말이 두 번 이상 나오는지 (예: "조명이 조명이", "화장실의 화장실")"""
+    stems = [normalize_facility_name(word) for word in re.findall(r'[가-힣A-Za-z0-9]+', text or '')]
+    stems = [stem for stem in stems if len(stem) >= 2]
+    return len(stems) != len(set(stems))
+
+def rule_based_refine(core_location, core_target, problem_type, affected_people, solution_idea):
+    """
+    규칙만으로 입력 정제 시도
+
+    문제 대상과 해결책이 규칙 적용 후 모두 완결된 문어체 문장이고 구어체가 남아 있지 않으면
+    신뢰도가 높아 AI 정제를 생략할 수 있습니다.
+
+    Returns:
+        tuple: (정제 결과 dict, 신뢰도 0~1)
+    """
+    target, target_rules = normalize_colloquial(core_target)
+    solution, solution_rules = normalize_colloquial(solution_idea)
+    target = target.rstrip('.')
+    solution = solution.rstrip('.')
+
+    # "신호등 설치"처럼 조치 명사로 끝나는 해결책은 제안 문장으로 완성
+    if SOLUTION_ACTION_PATTERN.search(solution):
+        solution = f"{with_particle(solution, '을', '를')} 제안합니다"
+        solution_rules += 1
+
+    confidence = 1.0
+    for value in (target, solution):
+        if RESIDUAL_COLLOQUIAL_PATTERN.search(value):
+            confidence -= 0.5
+        if not FORMAL_SENTENCE_PATTERN.search(value):
+            confidence -= 0.5
+    if len((solution_idea or '').strip()) < 4:
+        confidence -= 0.3
+
+    # 문제 대상에 장소가 이미 들어 있으면 장소를 다시 붙이지 않음
+    first_sentence = target if core_location and core_location in target else f"{core_location}의 {target}"
+    # 같은 낱말이 반복되면 규칙 치환이 문장을 어색하게 만든 것이므로 AI 정제로 넘김
+    if has_repeated_word(first_sentence) or has_repeated_word(solution):
+        confidence -= 0.5
+
+    # 문제 대상은 문장의 주어 부분만 사용 (예: "벤치가 노후화되었습니다" -> "벤치")
+    subject = TARGET_SUBJECT_PATTERN.match(target)
+    if subject:
+        refined_target = subject.group(1)
+    else:
+        # 주어가 없으면 서술어 앞의 명사구만 사용하고 ("벤치 노후화되었습니다" -> "벤치"), 문장 구조가 불확실하므로 AI 정제로 넘김
+        noun_words = []
+        for word in target.split():
+            if PREDICATE_WORD_PATTERN.search(word):
+                break
+            noun_words.append(word)
+        refined_target = ' '.join(noun_words) or (core_target or '').strip()
+        confidence -= 0.5
+    confidence = max(0.0, confidence)
+
+    description = f"{first_sentence}."
+    if affected_people:
+        description += f" 이로 인해 {affected_people}의 불편이 발생하고 있습니다."
+    if problem_type:
+        description += f" 특히 {problem_type} 측면에서 개선이 필요합니다."
+
+    refined = {
+        'refined_location': core_location,
+        'refined_target': refined_target,
+        'refined_problem_description': description,
+        'refined_solution': f"{solution}.",
+        'success': True,
+        'refined_by': 'rules',
+        'rules_applied': target_rules + solution_rules
+    }
+    return refined, confidence
+
+def refine_user_input(core_location, core_target, problem_type, affected_people, solution_idea, ctx=None):
     """
     사용자 입력을 자연스러운 문장으로 변환 (1단계: 입력 정제)
     
@@ -341,6 +2898,7 @@ def refine_user_input(core_location, core_target, problem_type, affected_people,
         problem_type (str): 문제 유형 (안전, 불편, 미관 등)
         affected_people (str): 주요 불편 대상 (어린이, 어르신 등)
         solution_idea (str): 해결책 아이디어 (예: 새로 바꿔주세요)
+        ctx (ProposalRequestContext): 요청 상태 (AI 호출 예산 차감)
         
     Returns:
         dict: 정제된 사용자 입력
@@ -353,6 +2911,20 @@ def refine_user_input(core_location, core_target, problem_type, affected_people,
             }
     """
     try:
+        single_pass = ctx is not None and ctx.single_pass
+
+        # 규칙만으로 충분히 정제되면 AI 호출 생략 (단일 호출 모드에서는 신뢰도와 관계없이 규칙 결과 사용)
+        if RULE_NORMALIZER_ENABLED:
+            increment_metric('refine_rule_evaluations')
+            rule_result, confidence = rule_based_refine(core_location, core_target, problem_type, affected_people, solution_idea)
+            if single_pass:
+                logger.info("부하 제한으로 AI 정제 생략 - 규칙 기반 정제 사용")
+                return rule_result
+            if confidence >= RULE_NORMALIZER_SKIP_THRESHOLD:
+                increment_metric('refine_rule_skips')
+                logger.info(f"규칙 기반 정제로 충분 (신뢰도 {confidence:.2f}) - AI 정제 생략")
+                return rule_result
+
         # API 키 확인 및 모델 초기화
         api_key = os.getenv('GEMINI_API_KEY') or GEMINI_API_KEY
         
@@ -365,10 +2937,21 @@ def refine_user_input(core_location, core_target, problem_type, affected_people,
                 'refined_solution': solution_idea if solution_idea else "개선이 필요합니다.",
                 'success': False
             }
+
+        if single_pass or gemini_circuit_breaker.is_open():
+            logger.warning("Gemini 차단기가 열려 있거나 부하 제한 중이어서 입력 정제를 건너뜁니다.")
+            return {
+                'refined_location': core_location,
+                'refined_target': core_target,
+                'refined_problem_description': f"{core_location}의 {core_target}에 대한 문제가 있습니다.",
+                'refined_solution': solution_idea if solution_idea else "개선이 필요합니다.",
+                'success': False
+            }
         
         # AI 모델 초기화 (API 키가 있으면 항상 시도)
         try:
             # 전역 model이 있으면 재사용 (이미 테스트 완료된 모델)
+            model = get_model()
             if model is not None:
                 ai_model = model
                 logger.info("전역 Gemini 모델 재사용 (이미 검증됨)")
@@ -378,10 +2961,10 @@ def refine_user_input(core_location, core_target, problem_type, affected_people,
                 ai_model = None
                 for model_name in model_names:
                     try:
-                        test_model = genai.GenerativeModel(model_name)
+                        test_model = get_genai().GenerativeModel(model_name)
                         # 실제 API 호출 테스트
                         try:
-                            test_response = test_model.generate_content("test")
+                            test_response = call_llm(test_model, "test", 'probe', ctx=ctx)
                             ai_model = test_model
                             logger.info(f"입력 정제를 위한 Gemini 모델 초기화 완료: {model_name}")
                             break
@@ -407,110 +2990,52 @@ def refine_user_input(core_location, core_target, problem_type, affected_people,
                 'success': False
             }
         
-        # 입력 정제 프롬프트 구성 (대폭 개선된 버전)
-        refine_prompt = f"""당신은 시민제안서 작성을 돕는 전문 AI 어시스턴트입니다. 시민이 입력한 구어체나 단편적인 내용을 공공기관 제안서에 적합한 자연스럽고 전문적이며 풍부한 내용으로 완전히 변환하는 것이 당신의 임무입니다.
-
-[사용자 원본 입력]
-- 장소: {core_location}
-- 문제 대상: {core_target}
-- 문제 유형: {problem_type if problem_type else '명시되지 않음'}
-- 불편 대상: {affected_people if affected_people else '명시되지 않음'}
-- 해결책: {solution_idea}
-
-[핵심 임무]
-1. **구어체 완전 제거 및 자연스러운 변환**
-   - 모든 구어체("~어요", "~해요", "~요함", "~주세요" 등)를 완전히 제거
-   - 자연스럽고 전문적인 문어체로 변환
-   - 예: "벤치가 낡았어요" → "벤치가 노후화되어"
-   - 예: "삐그덕거리고" → "불안정한 상태이며"
-   - 예: "보기에 안좋고" → "미관상 좋지 않고"
-   - 예: "위험해 보임" → "안전상 위험할 수 있어"
-
-2. **내용을 풍부하고 구체적으로 확장**
-   - 단편적인 표현을 완전한 문장으로 확장
-   - 문제의 원인, 영향, 필요성을 자연스럽게 서술
-   - 구체적이고 설득력 있는 설명 추가
-   - 예: "벤치교체 요함" → "기존 노후 벤치가 이용객의 안전을 위협하고 있어, 새로운 벤치로 교체할 것을 제안합니다"
-
-3. **핵심 정보 절대 보존**
-   - 장소명 "{core_location}"는 반드시 그대로 유지
-   - 문제 대상의 핵심은 유지하되 표현만 정제
-   - 사용자의 의도를 절대 변경하지 않음
-
-4. **자연스럽고 논리적인 문장 구성**
-   - 2-3문장으로 구성하여 읽기 쉽게 작성
-   - 원인-결과 관계를 자연스럽게 연결
-   - 문장 간 논리적 흐름 유지
-
-5. **공공기관 제안서에 적합한 전문적 어조**
-   - 정중하고 공식적인 표현 사용
-   - "~해 주세요" → "~해 주실 것을 제안합니다"
-   - "~요함" → "~할 것을 제안합니다"
-   - 감정적 표현이나 과장된 표현 제거
-
-[구체적 변환 예시]
-입력: "놀이터 근처 벤치가 삐그덕거리고 노후돼서 보기에 안좋고 위험해 보임, 벤치교체 요함"
-출력: "태산패밀리파크 놀이터 근처에 설치된 벤치가 장기간 사용으로 인해 노후화되어 불안정한 상태입니다. 이러한 노후 벤치는 이용객의 안전을 위협할 수 있으며, 공원의 전반적인 미관에도 좋지 않은 영향을 미치고 있습니다. 따라서 기존 노후 벤치를 안전하고 내구성이 우수한 새로운 벤치로 교체할 것을 제안합니다."
-
-[출력 형식]
-다음 JSON 형식으로만 출력하세요. 다른 설명이나 텍스트는 포함하지 마세요:
-{{
-    "refined_location": "정제된 장소명 (원본과 동일)",
-    "refined_target": "정제된 문제 대상 (구어체 완전 제거, 자연스러운 표현으로 변환)",
-    "refined_problem_description": "문제 상황을 자연스럽고 전문적이며 풍부한 내용으로 설명 (2-3문장, 구어체 완전 제거, 원인과 영향 포함)",
-    "refined_solution": "해결책을 자연스럽고 전문적이며 구체적인 문장으로 설명 (1-2문장, 구어체 완전 제거, 구체적 방안 포함)"
-}}
-
-중요 지침:
-- JSON 형식만 출력 (마크다운 코드 블록, 설명, 주석 없음)
-- 모든 구어체를 완전히 제거하고 자연스러운 문어체로 변환
-- 내용을 풍부하고 구체적으로 확장하되, 핵심 정보는 절대 변경하지 않음
-- 자연스럽고 읽기 쉬운 전문 문장으로 작성"""
-        
-        # Gemini API 호출
-        response = ai_model.generate_content(refine_prompt)
-        response_text = response.text.strip()
+        # 동시에 들어온 정제 요청과 묶어서 처리 (혼자이거나 이 항목만 실패하면 아래에서 개별 정제)
+        if REFINE_BATCHING_ENABLED:
+            batched_result = refine_batcher.submit({
+                'core_location': core_location,
+                'core_target': core_target,
+                'problem_type': problem_type,
+                'affected_people': affected_people,
+                'solution_idea': solution_idea
+            }, ctx=ctx)
+            if batched_result is not None:
+                logger.info("사용자 입력 정제 성공 (묶음 처리)")
+                return batched_result
+
+        # 입력 정제 요청 구성 (고정 지시문은 모델의 system_instruction으로 전달)
+        refine_prompt = build_refine_request(core_location, core_target, problem_type, affected_people, solution_idea)
         
-        # JSON 파싱 시도
-        try:
-            # JSON 코드 블록 제거 (있는 경우)
-            if '```json' in response_text:
-                response_text = response_text.split('```json')[1].split('```')[0].strip()
-            elif '```' in response_text:
-                response_text = response_text.split('```')[1].split('```')[0].strip()
-            
-            # JSON 파싱
-            refined_data = json.loads(response_text)
-            
-            # 필수 필드 검증
-            required_fields = ['refined_location', 'refined_target', 'refined_problem_description', 'refined_solution']
-            for field in required_fields:
-                if field not in refined_data or not refined_data[field]:
-                    logger.warning(f"정제된 데이터에 필수 필드 '{field}'가 없거나 비어있습니다. 원본 사용.")
-                    return {
-                        'refined_location': core_location,
-                        'refined_target': core_target,
-                        'refined_problem_description': f"{core_location}의 {core_target}에 대한 문제가 있습니다.",
-                        'refined_solution': solution_idea if solution_idea else "개선이 필요합니다.",
-                        'success': False
-                    }
-            
-            refined_data['success'] = True
-            logger.info("사용자 입력 정제 성공")
-            return refined_data
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON 파싱 오류: {e}")
-            logger.debug(f"응답 텍스트: {response_text[:200]}")
-            # JSON 파싱 실패 시 원본 반환
-            return {
-                'refined_location': core_location,
-                'refined_target': core_target,
-                'refined_problem_description': f"{core_location}의 {core_target}에 대한 문제가 있습니다.",
-                'refined_solution': solution_idea if solution_idea else "개선이 필요합니다.",
-                'success': False
+        # Gemini API 호출 (JSON 모드 + 응답 스키마)
+        response = call_llm_routed(refine_prompt, 'refine', ctx=ctx, fallback_model=ai_model)
+
+        # 유효한 필드만 추출하고, 빠진 필드만 짧은 후속 요청으로 다시 받음
+        refined_fields = parse_refined_fields(response.text)
+        missing_fields = [field for field in REFINE_REQUIRED_FIELDS if field not in refined_fields]
+        if missing_fields:
+            logger.warning(f"정제된 데이터에 필수 필드가 없거나 비어있습니다: {', '.join(missing_fields)} - 해당 필드만 다시 요청")
+            increment_metric('refine_missing_fields', len(missing_fields))
+            user_input = {
+                'core_location': core_location,
+                'core_target': core_target,
+                'problem_type': problem_type,
+                'affected_people': affected_people,
+                'solution_idea': solution_idea
             }
+            refined_fields.update(
+                request_missing_refined_fields(user_input, refined_fields, missing_fields, ctx=ctx, fallback_model=ai_model)
+            )
+
+        refined_data = complete_refined_input(refined_fields, core_location, core_target, solution_idea)
+        if refined_data['success']:
+            logger.info("사용자 입력 정제 성공")
+        else:
+            logger.info("사용자 입력 정제 실패 - 원본 사용")
+        return refined_data
             
+    except (QuotaWaitTooLong, RequestCancelled):
+        # 할당량 대기 한도 초과와 취소는 원본 입력으로 조용히 넘어가지 않고 호출자에게 알림
+        raise
     except Exception as e:
         logger.error(f"사용자 입력 정제 오류: {str(e)}")
         # 에러 발생 시 원본 반환
@@ -522,7 +3047,838 @@ def refine_user_input(core_location, core_target, problem_type, affected_people,
             'success': False
         }
 
-def generate_structured_ai_proposal(core_location, core_target, problem_type, affected_people, solution_idea):
+def make_proposal_cache_key(core_location, core_target, problem_type, affected_people, solution_idea):
+    """
+    정규화된 사용자 입력 해시 (공백/대소문자 차이는 같은 요청으로 취급)
+
+    제안서 생성에 쓰는 프롬프트 버전도 포함하므로 프롬프트를 고치면 이전 결과는 더 이상 사용되지 않습니다.
+    """
+    normalized = [
+        re.sub(r'\s+', ' ', (value or '')).strip().lower()
+        for value in (core_location, core_target, problem_type, affected_people, solution_idea)
+    ]
+    normalized.append(prompt_registry.version(*PROPOSAL_PROMPT_NAMES))
+    payload = json.dumps(normalized, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def get_cached_proposal(cache_key):
+    """제안서 캐시 조회"""
+    with cache_lock:
+        cached = proposal_cache.get(cache_key)
+    if cached is None:
+        return None
+    increment_metric('proposal_cache_hits')
+    return dict(cached)
+
+def store_cached_proposal(cache_key, proposal, location_names):
+    """제안서 캐시 저장 및 장소 의존성 기록"""
+    with cache_lock:
+        if len(proposal_cache) >= PROPOSAL_CACHE_MAX_SIZE:
+            # 가장 오래된 항목부터 제거 (dict 삽입 순서)
+            proposal_cache.pop(next(iter(proposal_cache)))
+        proposal_cache[cache_key] = dict(proposal)
+    for location_name in set(location_names):
+        record_cache_dependency(location_name, 'proposals', cache_key)
+
+# 동일 요청 병합 대기 시간 (초) - 초과하면 대기하던 요청이 직접 생성
+COALESCE_TIMEOUT_SECONDS = float(os.getenv('COALESCE_TIMEOUT_SECONDS', '60'))
+
+class SingleFlightTimeout(Exception):
+    """진행 중인 동일 요청의 결과를 기다리다 시간 초과"""
+
+class SingleFlight:
+    """
+    같은 키로 동시에 들어온 요청을 하나의 실행으로 병합
+
+    먼저 들어온 요청(리더)만 실제로 실행하고, 실행 중에 들어온 같은 키의 요청은
+    리더의 결과(또는 예외)를 그대로 공유합니다.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def in_flight_count(self):
+        with self._lock:
+            return len(self._calls)
+
+    def do(self, key, fn, timeout=None):
+        """
+        Returns:
+            tuple: (결과, 다른 요청의 결과를 공유했는지 여부)
+
+        Raises:
+            SingleFlightTimeout: timeout 안에 리더의 실행이 끝나지 않은 경우
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = {'event': threading.Event(), 'result': None, 'error': None, 'llm_calls': 0}
+                self._calls[key] = call
+
+        if is_leader:
+            llm_calls_before = get_thread_llm_calls()
+            try:
+                call['result'] = fn()
+                return call['result'], False
+            except Exception as e:
+                call['error'] = e
+                raise
+            finally:
+                call['llm_calls'] = get_thread_llm_calls() - llm_calls_before
+                with self._lock:
+                    self._calls.pop(key, None)
+                call['event'].set()
+
+        increment_metric(f'{self.name}_coalesced')
+        if not call['event'].wait(timeout):
+            increment_metric(f'{self.name}_coalesce_timeouts')
+            raise SingleFlightTimeout(f"{self.name}: 진행 중인 동일 요청 대기 시간 초과")
+        # 리더가 실행한 AI 호출만큼 절약
+        increment_metric('llm_calls_saved', call['llm_calls'])
+        if call['error'] is not None:
+            raise call['error']
+        return call['result'], True
+
+proposal_single_flight = SingleFlight('proposal')
+
+def build_draft_request(use_location, use_target, use_problem_desc, use_solution, problem_type, affected_people, location_context):
+    """제안서 초안 요청 본문 (요청마다 달라지는 정제 결과와 맥락 정보만 포함)"""
+    perspective_lines = []
+    if problem_type:
+        perspective_lines.append(f"- 문제 유형 '{problem_type}' 측면에서 야기되는 구체적 문제를 서술하세요.")
+    if affected_people:
+        perspective_lines.append(f"- '{affected_people}'에게 특히 불편함을 주고 있음을 서술하고, 기대 효과에 이들에 대한 구체적 편익을 포함하세요.")
+    perspective = "\n".join(perspective_lines) if perspective_lines else "- 별도로 명시된 문제 유형/불편 대상 없음"
+
+    return prompt_registry.render(
+        'draft_request',
+        use_location=use_location,
+        use_target=use_target,
+        use_problem_desc=use_problem_desc,
+        use_solution=use_solution,
+        problem_type=problem_type if problem_type else '사용자가 명시하지 않음',
+        affected_people=affected_people if affected_people else '사용자가 명시하지 않음',
+        location_context=location_context,
+        perspective=perspective
+    )
+
+def generate_structured_ai_proposal_coalesced(core_location, core_target, problem_type, affected_people, solution_idea, use_cache=True, ctx=None):
+    """
+    동일한 입력으로 동시에 들어온 제안서 생성 요청을 하나로 병합
+
+    더블클릭이나 재시도로 같은 내용이 동시에 들어오면 첫 요청만 AI를 호출하고
+    나머지는 그 결과를 공유합니다. ctx는 실제로 생성한 요청에서만 채워집니다.
+    다시 생성(use_cache=False) 요청은 일반 요청의 결과를 받지 않도록 따로 병합합니다.
+    """
+    cache_key = make_proposal_cache_key(core_location, core_target, problem_type, affected_people, solution_idea)
+    flight_key = cache_key if use_cache else f"{cache_key}:regenerate"
+
+    def generate():
+        return generate_structured_ai_proposal(
+            core_location, core_target, problem_type, affected_people, solution_idea, use_cache=use_cache, ctx=ctx
+        )
+
+    try:
+        proposal, shared = proposal_single_flight.do(flight_key, generate, timeout=COALESCE_TIMEOUT_SECONDS)
+        if shared:
+            logger.info("진행 중인 동일 요청의 결과를 공유합니다.")
+        return dict(proposal)
+    except SingleFlightTimeout as e:
+        logger.warning(f"{e} - 직접 생성합니다.")
+        return generate()
+    except RequestCancelled:
+        # 먼저 시작한 동일 요청만 취소된 경우에는 이 요청이 직접 생성
+        if ctx is not None and ctx.cancelled:
+            raise
+        logger.info("진행 중인 동일 요청이 취소되어 직접 생성합니다.")
+        return generate()
+
+# 적응형 부하 제한 (생성 요청의 대기 시간을 재어 동시 처리 한도를 조절하고, 밀리면 단계적으로 품질을 낮춤)
+# 대기 시간이 목표를 넘으면 단일 호출 생성 -> 로컬 템플릿 초안 -> 503 순서로 낮추어
+# 느린 Gemini 호출 뒤에 요청이 계속 쌓여 /health까지 응답하지 못하는 상황을 막습니다.
+LOAD_SHED_ENABLED = os.getenv('LOAD_SHED_ENABLED', '1') == '1'
+LOAD_SHED_TARGET_DELAY_MS = int(os.getenv('LOAD_SHED_TARGET_DELAY_MS', '1000'))
+GENERATION_CONCURRENCY_INITIAL = int(os.getenv('GENERATION_CONCURRENCY_INITIAL', '8'))
+GENERATION_CONCURRENCY_MIN = 1
+GENERATION_CONCURRENCY_MAX = int(os.getenv('GENERATION_CONCURRENCY_MAX', '32'))
+# 대기 시간이 목표의 몇 배를 넘으면 해당 단계로 낮출지 (낮은 단계부터)
+LOAD_SHED_LEVELS = [('single_pass', 1.0), ('local_draft', 3.0), ('reject', 6.0)]
+# 한도를 줄일 때 곱하는 비율 (AIMD의 곱셈 감소)
+LOAD_SHED_DECREASE_FACTOR = 0.75
+# 최근 대기 시간 측정값의 반감기 (요청이 없으면 시간이 지나며 정상 단계로 돌아옴)
+LOAD_SHED_DECAY_SECONDS = 5.0
+
+class LoadShed(QuotaWaitTooLong):
+    """부하 제한으로 요청을 받지 않음 (503 + Retry-After)"""
+
+    def __init__(self, expected_wait):
+        Exception.__init__(self, f"생성 요청이 밀려 있음 - 예상 대기 시간 {expected_wait:.1f}초")
+        self.expected_wait = expected_wait
+
+class AdaptiveConcurrencyLimiter:
+    """
+    대기 시간 기반 AIMD 동시 처리 한도
+
+    생성 요청은 자리(permit)를 얻을 때까지 도착 순서대로 기다리며, 이 대기 시간과 가장 오래 기다리는
+    요청의 대기 시간으로 현재 부하 단계(normal, single_pass, local_draft, reject)를 정합니다.
+    요청이 끝날 때 AI 호출 전 대기열(우선순위/할당량)에서 기다린 시간이 목표를 넘으면 한도를 곱셈으로 줄이고,
+    목표 안이면서 한도를 모두 쓰고 있었으면 1/한도씩 늘립니다.
+    """
+
+    def __init__(self, name, initial_limit, min_limit, max_limit, target_delay):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_delay = target_delay
+        self.limit = float(max(min_limit, min(max_limit, initial_limit)))
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        # 대기 중인 요청 (토큰 -> 도착 시각, 삽입 순서가 도착 순서)
+        self._waiting = {}
+        self._delay = 0.0
+        self._delay_updated_at = time.monotonic()
+        self._last_decrease_at = 0.0
+
+    def _recent_delay(self, now):
+        """최근 자리 대기 시간 (반감기만큼 지날 때마다 절반으로 줄어듦)"""
+        return self._delay * 0.5 ** ((now - self._delay_updated_at) / LOAD_SHED_DECAY_SECONDS)
+
+    def _current_delay(self, now):
+        oldest = now - next(iter(self._waiting.values())) if self._waiting else 0.0
+        return max(self._recent_delay(now), oldest)
+
+    def current_delay(self):
+        """현재 대기 시간 추정치 (초): 최근 측정값과 가장 오래 기다리는 요청의 대기 시간 중 큰 값"""
+        with self._cond:
+            return self._current_delay(time.monotonic())
+
+    def level(self):
+        """현재 부하 단계"""
+        delay = self.current_delay()
+        current = 'normal'
+        for name, multiplier in LOAD_SHED_LEVELS:
+            if delay > self.target_delay * multiplier:
+                current = name
+        return current
+
+    def retry_after(self):
+        """거절한 요청에 안내할 재시도 대기 시간 (초)"""
+        return max(self.current_delay(), self.target_delay)
+
+    def acquire(self, max_wait, cancel_token=None):
+        """
+        자리를 얻을 때까지 도착 순서대로 대기
+
+        Returns:
+            float: 기다린 시간 (초)
+
+        Raises:
+            LoadShed: max_wait 안에 자리를 얻지 못한 경우
+            RequestCancelled: 기다리는 중에 요청이 취소된 경우
+        """
+        token = object()
+        arrived = time.monotonic()
+        if cancel_token is not None:
+            cancel_token.on_cancel(self._wake)
+        with self._cond:
+            self._waiting[token] = arrived
+            while self._in_flight >= int(self.limit) or next(iter(self._waiting)) is not token:
+                if cancel_token is not None and cancel_token.cancelled:
+                    del self._waiting[token]
+                    self._cond.notify_all()
+                    cancel_token.raise_if_cancelled(f'{self.name}_queue')
+                remaining = arrived + max_wait - time.monotonic()
+                if remaining <= 0:
+                    del self._waiting[token]
+                    self._cond.notify_all()
+                    raise LoadShed(max(self._current_delay(time.monotonic()), self.target_delay))
+                self._cond.wait(remaining)
+            del self._waiting[token]
+            self._in_flight += 1
+            now = time.monotonic()
+            waited = now - arrived
+            # 지수 가중 평균 (감쇠된 이전 값에 이번 대기 시간을 반영)
+            self._delay = 0.8 * self._recent_delay(now) + 0.2 * waited
+            self._delay_updated_at = now
+            self._cond.notify_all()
+        return waited
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def release(self, downstream_wait=0.0, overloaded=False):
+        """
+        자리 반납 및 한도 조절
+
+        Args:
+            downstream_wait (float): 요청이 AI 호출 전 대기열에서 기다린 시간 합계 (초)
+            overloaded (bool): 할당량/우선순위 대기 한도 초과로 실패한 경우
+        """
+        with self._cond:
+            saturated = self._in_flight >= int(self.limit)
+            self._in_flight -= 1
+            now = time.monotonic()
+            if overloaded or downstream_wait > self.target_delay:
+                # 연속으로 끝난 요청들이 한꺼번에 한도를 줄이지 않도록 목표 시간 간격으로 한 번만 감소
+                if now - self._last_decrease_at >= self.target_delay:
+                    self.limit = max(self.min_limit, self.limit * LOAD_SHED_DECREASE_FACTOR)
+                    self._last_decrease_at = now
+                    increment_metric(f'{self.name}_limit_decreases')
+            elif saturated:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def state(self):
+        with self._cond:
+            delay = self._current_delay(time.monotonic())
+            state = {
+                'limit': round(self.limit, 2),
+                'in_flight': self._in_flight,
+                'waiting': len(self._waiting),
+                'queue_delay_ms': round(delay * 1000, 1),
+                'target_delay_ms': round(self.target_delay * 1000, 1)
+            }
+        state['level'] = self.level()
+        return state
+
+generation_limiter = AdaptiveConcurrencyLimiter(
+    'generation', GENERATION_CONCURRENCY_INITIAL, GENERATION_CONCURRENCY_MIN, GENERATION_CONCURRENCY_MAX,
+    LOAD_SHED_TARGET_DELAY_MS / 1000
+)
+
+def generate_proposal_with_load_shedding(inputs, use_cache=True, ctx=None):
+    """
+    부하 단계에 맞춰 제안서 생성 (캐시된 제안서는 단계와 관계없이 바로 반환)
+
+    - normal: 정제 -> 장소 분석 -> 초안 작성 전체 과정
+    - single_pass: 규칙 기반 정제와 기본 장소 정보로 초안 작성 호출 1회만 사용
+    - local_draft: AI 호출 없이 분야별 템플릿 초안
+    - reject: 요청을 받지 않음 (LoadShed)
+
+    Returns:
+        tuple: (제안서, 적용한 부하 단계)
+
+    Raises:
+        LoadShed: 부하가 한계를 넘었거나 자리 대기 한도를 넘은 경우
+        QuotaWaitTooLong: 할당량 대기 한도를 넘은 경우
+    """
+    ctx = ctx or ProposalRequestContext()
+    if not LOAD_SHED_ENABLED:
+        return generate_structured_ai_proposal_coalesced(use_cache=use_cache, ctx=ctx, **inputs), 'normal'
+
+    if use_cache:
+        cache_key = make_proposal_cache_key(**inputs)
+        with cache_lock:
+            cached = cache_key in proposal_cache
+        if cached:
+            return generate_structured_ai_proposal_coalesced(use_cache=True, ctx=ctx, **inputs), 'normal'
+
+    level = generation_limiter.level()
+    increment_metric(f'load_shed_level_{level}')
+    if level == 'reject':
+        raise LoadShed(generation_limiter.retry_after())
+    if level == 'local_draft':
+        logger.warning("생성 대기 시간이 길어 로컬 템플릿 초안으로 대체합니다.")
+        return generate_local_draft(**inputs), level
+
+    # 자리 대기는 거절 단계 기준 시간까지만 (그 이상 기다리면 곧바로 거절)
+    generation_limiter.acquire(
+        max_wait=generation_limiter.target_delay * LOAD_SHED_LEVELS[-1][1], cancel_token=ctx.cancel_token
+    )
+    ctx.single_pass = level == 'single_pass'
+    overloaded = False
+    try:
+        return generate_structured_ai_proposal_coalesced(use_cache=use_cache, ctx=ctx, **inputs), level
+    except QuotaWaitTooLong:
+        overloaded = True
+        raise
+    finally:
+        generation_limiter.release(ctx.llm_wait_seconds, overloaded=overloaded)
+
+def prune_expired_entries(store, lock, ttl_seconds, max_size, timestamp_field='created_at'):
+    """만료된 항목 정리 (보관 개수 상한을 넘으면 오래된 것부터 삭제)"""
+    now = time.time()
+    with lock:
+        expired = [key for key, entry in store.items() if now - entry[timestamp_field] > ttl_seconds]
+        for key in expired:
+            del store[key]
+        while len(store) > max_size:
+            del store[next(iter(store))]
+
+# 비동기 작업 (HTTP 연결을 붙잡지 않고 작업 ID로 결과를 조회, 로컬 SQLite에 보관하여 재시작 후 재개)
+JOB_STORE_PATH = os.getenv(
+    'JOB_STORE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs.sqlite3')
+)
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+JOB_TTL_SECONDS = int(os.getenv('JOB_TTL_SECONDS', '86400'))
+JOB_EVENTS_HEARTBEAT_SECONDS = 15
+JOB_EVENTS_MAX_SECONDS = 300
+# 스트리밍 생성에서 끊긴 연결을 감지하는 주기 (주석을 보내 전송 실패로 감지)
+STREAM_DISCONNECT_CHECK_SECONDS = float(os.getenv('STREAM_DISCONNECT_CHECK_SECONDS', '2'))
+JOB_FINISHED_STATUSES = ('done', 'failed', 'cancelled')
+
+class JobQueueFull(Exception):
+    """작업 대기열이 가득 참"""
+
+class JobStore:
+    """
+    작업 상태 저장소 (SQLite)
+
+    상태는 queued -> running -> done/failed 순으로 바뀌며, 바뀔 때마다 대기 중인 구독자(SSE)를 깨웁니다.
+    """
+
+    COLUMNS = ('id', 'kind', 'status', 'payload', 'result', 'error', 'retry_after', 'attempts', 'created_at', 'updated_at')
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = None
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._versions = {}
+
+    def _connect(self):
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, payload TEXT NOT NULL, '
+                'result TEXT, error TEXT, retry_after INTEGER, attempts INTEGER NOT NULL DEFAULT 0, '
+                'created_at REAL NOT NULL, updated_at REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)')
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def _notify(self, job_id):
+        with self._changed:
+            self._versions[job_id] = self._versions.get(job_id, 0) + 1
+            self._changed.notify_all()
+
+    def _row_to_job(self, row):
+        job = dict(zip(self.COLUMNS, row))
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def create(self, kind, payload):
+        """작업 등록 (queued)"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                'INSERT INTO jobs (id, kind, status, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, kind, 'queued', json.dumps(payload, ensure_ascii=False), now, now)
+            )
+            connection.commit()
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._connect().execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def update(self, job_id, **fields):
+        """상태/결과 갱신 (result는 JSON으로 저장, attempts_increment=True면 시도 횟수 증가)"""
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'], ensure_ascii=False)
+        assignments = [f"{name} = ?" for name in fields if name != 'attempts_increment']
+        values = [value for name, value in fields.items() if name != 'attempts_increment']
+        if fields.get('attempts_increment'):
+            assignments.append('attempts = attempts + 1')
+        assignments.append('updated_at = ?')
+        values.extend([time.time(), job_id])
+        with self._lock:
+            connection = self._connect()
+            connection.execute(f"UPDATE jobs SET {', '.join(assignments)} WHERE id = ?", values)
+            connection.commit()
+        self._notify(job_id)
+
+    def unfinished(self):
+        """끝나지 않은 작업 (재시작 전에 대기 중이거나 실행 중이던 작업, 오래된 순)"""
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def prune(self, ttl_seconds):
+        """보관 기간이 지난 완료 작업 삭제"""
+        with self._lock:
+            connection = self._connect()
+            placeholders = ', '.join('?' for _ in JOB_FINISHED_STATUSES)
+            connection.execute(
+                f'DELETE FROM jobs WHERE status IN ({placeholders}) AND updated_at < ?',
+                (*JOB_FINISHED_STATUSES, time.time() - ttl_seconds)
+            )
+            connection.commit()
+
+    def version(self, job_id):
+        with self._changed:
+            return self._versions.get(job_id, 0)
+
+    def wait_for_change(self, job_id, seen_version, timeout):
+        """작업 상태가 바뀔 때까지 대기 (바뀌었으면 True)"""
+        with self._changed:
+            return self._changed.wait_for(lambda: self._versions.get(job_id, 0) != seen_version, timeout)
+
+class JobWorkerPool:
+    """
+    정해진 수의 작업 스레드와 우선순위 등급별 대기열
+
+    작업 종류별 처리 함수를 등록해 두고, 스레드는 처음 작업이 들어오거나 start()가 호출될 때 시작합니다.
+    시작할 때 저장소에 남아 있는 미완료 작업을 다시 대기열에 넣습니다.
+    대량 작업이 쌓여 있어도 시민 요청 작업이 먼저 처리되도록 등급별 가중 공정 큐(PriorityLanes)를 사용합니다.
+    """
+
+    def __init__(self, store, workers, lanes):
+        self.store = store
+        self.workers = workers
+        self._lanes = PriorityLanes('job_lanes', workers, lanes)
+        self._handlers = {}
+        self._threads = []
+        self._lock = threading.Lock()
+        # 실행 중인 작업의 취소 토큰 (작업 ID -> 토큰)
+        self._cancel_tokens = {}
+
+    def register(self, kind, handler):
+        """작업 종류별 처리 함수 등록 (handler(payload, cancel_token))"""
+        self._handlers[kind] = handler
+
+    def start(self):
+        """작업 스레드 시작 및 미완료 작업 재등록 (이미 시작했으면 무시)"""
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                worker = threading.Thread(target=self._run, name=f'job-worker-{index}')
+                worker.daemon = True
+                worker.start()
+                self._threads.append(worker)
+        self._recover()
+
+    def _recover(self):
+        recovered = 0
+        for job in self.store.unfinished():
+            if job['attempts'] >= JOB_MAX_ATTEMPTS:
+                self.store.update(job['id'], status='failed', error='작업 재시도 한도를 초과했습니다.')
+                continue
+            if self._lanes.put(normalize_priority(job['payload'].get('priority')), job['id']):
+                recovered += 1
+            else:
+                self.store.update(job['id'], status='failed', error='작업 대기열이 가득 차 작업을 재개하지 못했습니다.')
+        if recovered:
+            increment_metric('jobs_recovered', recovered)
+            logger.info(f"재시작 전 미완료 작업 재개: {recovered}건")
+
+    def submit(self, kind, payload, priority=None):
+        """
+        작업 등록 후 우선순위 등급 대기열에 추가 (등급은 payload에 함께 저장되어 재시작 후에도 유지)
+
+        Returns:
+            str: 작업 ID
+
+        Raises:
+            JobQueueFull: 등급별 대기열이 가득 찬 경우 (작업은 failed로 기록)
+        """
+        self.start()
+        self.store.prune(JOB_TTL_SECONDS)
+        lane = normalize_priority(priority or get_current_priority())
+        job_id = self.store.create(kind, {**payload, 'priority': lane})
+        if not self._lanes.put(lane, job_id):
+            increment_metric('jobs_rejected')
+            self.store.update(job_id, status='failed', error='요청이 많아 작업을 접수하지 못했습니다.')
+            raise JobQueueFull(f"'{lane}' 작업 대기열이 가득 찼습니다")
+        increment_metric(f'jobs_submitted_{kind}')
+        return job_id
+
+    def cancel(self, job_id, reason='client_cancelled'):
+        """
+        작업 취소 (대기 중이면 실행하지 않고, 실행 중이면 남은 단계를 중단)
+
+        Returns:
+            str: 취소 후 작업 상태 (작업이 없으면 None, 이미 끝난 작업은 그 상태 그대로)
+        """
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        if job['status'] in JOB_FINISHED_STATUSES:
+            return job['status']
+        with self._lock:
+            token = self._cancel_tokens.get(job_id)
+        if token is not None:
+            token.cancel(reason)
+        else:
+            increment_metric(f'requests_cancelled_{reason}')
+            increment_metric('abandoned_work_total')
+            increment_metric('abandoned_work_job_queue')
+            self.store.update(job_id, status='cancelled', error='요청이 취소되었습니다.')
+        return 'cancelled'
+
+    def queue_size(self):
+        return self._lanes.queued_count()
+
+    def state(self):
+        return self._lanes.state()
+
+    def _run(self):
+        while True:
+            job_id, lane = self._lanes.get()
+            try:
+                with priority_class(lane):
+                    self._execute(job_id, lane)
+            except Exception as e:
+                logger.error(f"작업 실행 오류 ({job_id}): {e}")
+            finally:
+                self._lanes.release(lane)
+
+    def _execute(self, job_id, lane):
+        job = self.store.get(job_id)
+        if job is None or job['status'] in JOB_FINISHED_STATUSES:
+            return
+        token = CancellationToken()
+        with self._lock:
+            self._cancel_tokens[job_id] = token
+        self.store.update(job_id, status='running', attempts_increment=True)
+        try:
+            result = self._handlers[job['kind']](job['payload'], token)
+        except RequestCancelled as e:
+            logger.info(f"작업 취소 ({job_id}): {e}")
+            increment_metric('jobs_cancelled')
+            self.store.update(job_id, status='cancelled', error='요청이 취소되었습니다.')
+            return
+        except QuotaWaitTooLong as e:
+            # 기다리는 사용자가 없는 직원 작업은 실패시키지 않고 대기열 뒤로 다시 넣음
+            if lane != DEFAULT_PRIORITY_CLASS and job['attempts'] + 1 < JOB_MAX_ATTEMPTS:
+                increment_metric('jobs_requeued')
+                self.store.update(job_id, status='queued')
+                if self._lanes.put(lane, job_id):
+                    return
+            increment_metric('jobs_failed')
+            self.store.update(
+                job_id, status='failed', retry_after=max(1, int(e.expected_wait + 0.999)),
+                error='요청이 많아 AI 제안서를 만들지 못했습니다. 잠시 후 다시 시도해주세요.'
+            )
+            return
+        except Exception as e:
+            logger.error(f"작업 처리 오류 ({job['kind']}, {job_id}): {e}")
+            increment_metric('jobs_failed')
+            self.store.update(job_id, status='failed', error='작업 처리 중 오류가 발생했습니다.')
+            return
+        finally:
+            with self._lock:
+                self._cancel_tokens.pop(job_id, None)
+        increment_metric('jobs_completed')
+        self.store.update(job_id, status='done', result=result)
+
+job_store = JobStore(JOB_STORE_PATH)
+job_worker_pool = JobWorkerPool(job_store, JOB_WORKERS, priority_lanes_config)
+
+def run_proposal_job(payload, cancel_token=None):
+    """제안서 생성 작업 (결과: 제안서와 섹션 다시 쓰기용 제안서 ID)"""
+    inputs = payload['inputs']
+    ctx = ProposalRequestContext(cancel_token=cancel_token)
+    proposal, level = generate_proposal_with_load_shedding(inputs, use_cache=payload.get('use_cache', True), ctx=ctx)
+    proposal_id = create_proposal_session(inputs, proposal, ctx.draft_inputs)
+    return {'proposal': proposal, 'proposal_id': proposal_id, 'service_level': level}
+
+job_worker_pool.register('proposal', run_proposal_job)
+
+def run_facility_enrichment_job(payload, cancel_token=None):
+    """장소 맥락 설명 일괄 생성 작업 (결과: 생성 통계)"""
+    stats = enrich_facility_contexts(payload.get('facilities'))
+    return {'stats': stats, 'contexts_count': len(facility_contexts)}
+
+job_worker_pool.register('facility_enrichment', run_facility_enrichment_job)
+
+def start_speculative_proposal(inputs, use_cache=True):
+    """
+    로컬 초안을 즉시 만들고 AI 제안서 생성 작업을 등록 (초안 ID는 작업 ID와 같음)
+
+    Returns:
+        dict: 초안 ID, 상태(pending), 로컬 초안
+
+    Raises:
+        JobQueueFull: 작업 대기열이 가득 찬 경우
+    """
+    draft = generate_local_draft(**inputs)
+    draft_id = job_worker_pool.submit('proposal', {'inputs': inputs, 'use_cache': use_cache, 'draft': draft})
+    increment_metric('speculative_drafts')
+    return {'draft_id': draft_id, 'status': 'pending', 'draft': draft}
+
+def prepare_draft_inputs(core_location, core_target, problem_type, affected_people, solution_idea, ctx):
+    """
+    초안 작성에 쓸 정제된 입력과 장소 맥락 준비 (결과는 ctx에도 보관)
+
+    Returns:
+        dict: build_draft_request 인자 (use_location, use_target, use_problem_desc, use_solution,
+              problem_type, affected_people, location_context)
+    """
+    ctx.check_cancelled('refine')
+    logger.info("1단계: 사용자 입력 정제 시작...")
+    refined_input = refine_user_input(core_location, core_target, problem_type, affected_people, solution_idea, ctx=ctx)
+    ctx.refined_input = refined_input
+    
+    # 정제 성공 여부에 따라 사용할 데이터 결정
+    if refined_input['success']:
+        use_location = refined_input['refined_location']
+        use_target = refined_input['refined_target']
+        use_problem_desc = refined_input['refined_problem_description']
+        use_solution = refined_input['refined_solution']
+        logger.info("사용자 입력 정제 완료 - 정제된 내용 사용")
+    else:
+        # 정제 실패 시 원본 사용
+        use_location = core_location
+        use_target = core_target
+        use_problem_desc = f"{core_location}의 {core_target}에 대한 문제가 있습니다."
+        use_solution = solution_idea if solution_idea else "개선이 필요합니다."
+        logger.info("사용자 입력 정제 실패 - 원본 내용 사용")
+    
+    # 장소 유형 파악
+    ctx.check_cancelled('context')
+    location_context = get_location_context(use_location, ctx=ctx)
+    ctx.location_context = location_context
+    ctx.draft_inputs = {
+        'use_location': use_location,
+        'use_target': use_target,
+        'use_problem_desc': use_problem_desc,
+        'use_solution': use_solution,
+        'problem_type': problem_type,
+        'affected_people': affected_people,
+        'location_context': location_context
+    }
+    return ctx.draft_inputs
+
+# 제안서 세션 (제안서 ID -> 원본 입력, 정제된 입력/장소 맥락, 섹션 본문)
+# 섹션 하나만 다시 쓸 때 정제와 장소 분석을 다시 하지 않고 세션에 보관한 결과를 재사용합니다.
+PROPOSAL_SESSION_TTL_SECONDS = int(os.getenv('PROPOSAL_SESSION_TTL_SECONDS', '3600'))
+PROPOSAL_SESSION_MAX_SIZE = 1000
+proposal_sessions = {}
+proposal_sessions_lock = threading.Lock()
+
+def create_proposal_session(inputs, proposal, draft_inputs=None):
+    """
+    생성된 제안서로 세션 생성
+
+    Args:
+        inputs (dict): 사용자 원본 입력
+        proposal (dict): 제안서 섹션
+        draft_inputs (dict): 초안 작성에 쓴 정제된 입력과 장소 맥락 (캐시 결과 등으로 없으면 재생성 시 준비)
+
+    Returns:
+        str: 제안서 ID
+    """
+    prune_expired_entries(
+        proposal_sessions, proposal_sessions_lock, PROPOSAL_SESSION_TTL_SECONDS, PROPOSAL_SESSION_MAX_SIZE,
+        timestamp_field='updated_at'
+    )
+    proposal_id = uuid.uuid4().hex
+    now = time.time()
+    with proposal_sessions_lock:
+        proposal_sessions[proposal_id] = {
+            'inputs': dict(inputs),
+            'draft_inputs': dict(draft_inputs) if draft_inputs else None,
+            'sections': {section: proposal.get(section, '') for section in PROPOSAL_SECTION_LABELS},
+            'created_at': now,
+            'updated_at': now
+        }
+    return proposal_id
+
+def get_proposal_session(proposal_id):
+    """세션 사본 조회 (없거나 만료되면 None)"""
+    with proposal_sessions_lock:
+        session = proposal_sessions.get(proposal_id)
+        if session is None or time.time() - session['updated_at'] > PROPOSAL_SESSION_TTL_SECONDS:
+            return None
+        return {**session, 'sections': dict(session['sections'])}
+
+def update_proposal_session(proposal_id, sections=None, draft_inputs=None):
+    """세션의 섹션 본문/정제 결과 갱신"""
+    with proposal_sessions_lock:
+        session = proposal_sessions.get(proposal_id)
+        if session is None:
+            return
+        if sections:
+            session['sections'].update(sections)
+        if draft_inputs:
+            session['draft_inputs'] = dict(draft_inputs)
+        session['updated_at'] = time.time()
+
+def regenerate_proposal_section(proposal_id, section, current_sections=None):
+    """
+    제안서 섹션 하나만 다시 작성
+
+    세션에 보관한 정제 결과와 장소 맥락, 나머지 섹션만 담은 짧은 요청을 보내므로
+    전체 제안서를 다시 만드는 것보다 AI 호출과 입력 토큰이 크게 줄어듭니다.
+
+    Args:
+        proposal_id (str): 제안서 ID
+        section (str): title, problem, solution, effect 중 하나
+        current_sections (dict): 화면에서 사용자가 고친 현재 섹션 본문 (있으면 세션에 먼저 반영)
+
+    Returns:
+        dict: 새 섹션 본문이 반영된 제안서 섹션 (세션이 없으면 None)
+    """
+    if current_sections:
+        update_proposal_session(proposal_id, sections={
+            name: text for name, text in current_sections.items()
+            if name in PROPOSAL_SECTION_LABELS and isinstance(text, str)
+        })
+    session = get_proposal_session(proposal_id)
+    if session is None:
+        return None
+
+    increment_metric('section_regenerations')
+    ctx = ProposalRequestContext()
+    draft_inputs = session['draft_inputs']
+    if draft_inputs is None:
+        # 캐시된 제안서로 만든 세션은 처음 한 번만 정제/장소 분석 수행
+        increment_metric('section_regeneration_prepares')
+        draft_inputs = prepare_draft_inputs(ctx=ctx, **session['inputs'])
+        update_proposal_session(proposal_id, draft_inputs=draft_inputs)
+
+    sections = session['sections']
+    prompt = prompt_registry.render(
+        'section_regenerate_request',
+        use_location=draft_inputs['use_location'],
+        use_target=draft_inputs['use_target'],
+        use_problem_desc=draft_inputs['use_problem_desc'],
+        use_solution=draft_inputs['use_solution'],
+        problem_type=draft_inputs['problem_type'] if draft_inputs['problem_type'] else '사용자가 명시하지 않음',
+        affected_people=draft_inputs['affected_people'] if draft_inputs['affected_people'] else '사용자가 명시하지 않음',
+        location_context=draft_inputs['location_context'],
+        other_sections='\n'.join(
+            f"- {label}: {sections[name]}" for name, label in PROPOSAL_SECTION_LABELS.items() if name != section
+        ),
+        section_label=PROPOSAL_SECTION_LABELS[section],
+        current_text=sections[section] or '(없음)'
+    )
+    response = call_llm_routed(prompt, 'draft_section', ctx=ctx, fallback_model=get_model())
+    text = clean_section_response(response.text, section)
+    if not text:
+        raise ValueError(f"'{PROPOSAL_SECTION_LABELS[section]}' 섹션 응답이 비어 있습니다.")
+
+    # 다시 쓴 섹션도 전체 생성과 같은 금지 표현 검사를 거침
+    text = validate_structured_proposal(
+        {section: text}, draft_inputs['use_location'], draft_inputs['use_target'], draft_inputs['use_problem_desc'],
+        draft_inputs['use_solution'], draft_inputs['problem_type'], draft_inputs['affected_people'],
+        ctx=ctx, fallback_model=get_model()
+    )[section]
+    update_proposal_session(proposal_id, sections={section: text})
+    sections[section] = text
+    return sections
+
+def generate_structured_ai_proposal(core_location, core_target, problem_type, affected_people, solution_idea, use_cache=True, ctx=None):
     """
     정형화된 질문 세트 기반 AI 제안서 생성
     
@@ -532,34 +3888,36 @@ def generate_structured_ai_proposal(core_location, core_target, problem_type, af
         problem_type (str): 문제 유형 (안전, 불편, 미관 등)
         affected_people (str): 주요 불편 대상 (어린이, 어르신 등)
         solution_idea (str): 해결책 아이디어
+        use_cache (bool): 캐시된 제안서 재사용 여부 (False면 새로 생성)
+        ctx (ProposalRequestContext): 요청 상태 (없으면 새로 생성)
         
     Returns:
         dict: 제안서 내용
     """
+    ctx = ctx or ProposalRequestContext()
+    cache_key = make_proposal_cache_key(core_location, core_target, problem_type, affected_people, solution_idea)
+    if use_cache:
+        cached_proposal = get_cached_proposal(cache_key)
+        if cached_proposal is not None:
+            logger.info("캐시된 제안서 반환")
+            return cached_proposal
+
     try:
-        # 1단계: 사용자 입력 정제 (자연스러운 문장으로 변환)
-        logger.info("1단계: 사용자 입력 정제 시작...")
-        refined_input = refine_user_input(core_location, core_target, problem_type, affected_people, solution_idea)
-        
-        # 정제 성공 여부에 따라 사용할 데이터 결정
-        if refined_input['success']:
-            use_location = refined_input['refined_location']
-            use_target = refined_input['refined_target']
-            use_problem_desc = refined_input['refined_problem_description']
-            use_solution = refined_input['refined_solution']
-            logger.info("사용자 입력 정제 완료 - 정제된 내용 사용")
-        else:
-            # 정제 실패 시 원본 사용
-            use_location = core_location
-            use_target = core_target
-            use_problem_desc = f"{core_location}의 {core_target}에 대한 문제가 있습니다."
-            use_solution = solution_idea if solution_idea else "개선이 필요합니다."
-            logger.info("사용자 입력 정제 실패 - 원본 내용 사용")
-        
-        # 장소 유형 파악
-        location_context = get_location_context(use_location)
+        # Gemini 장애 중에는 AI 호출을 기다리지 않고 바로 기본 제안서로 대체
+        if gemini_circuit_breaker.is_open():
+            increment_metric('proposal_breaker_fallbacks')
+            raise CircuitOpenError("Gemini 차단기가 열려 있어 기본 제안서로 대체합니다.")
+
+        # 1단계: 사용자 입력 정제 및 장소 유형 파악
+        draft_inputs = prepare_draft_inputs(core_location, core_target, problem_type, affected_people, solution_idea, ctx)
+        refined_input = ctx.refined_input
+        use_location = draft_inputs['use_location']
+        use_target = draft_inputs['use_target']
+        use_problem_desc = draft_inputs['use_problem_desc']
+        use_solution = draft_inputs['use_solution']
         
         # AI 모델 초기화 (전역 model 사용 - 이미 검증됨)
+        model = get_model()
         if model is not None:
             ai_model = model
             logger.info("제안서 생성을 위해 전역 Gemini 모델 재사용 (이미 검증됨)")
@@ -569,10 +3927,10 @@ def generate_structured_ai_proposal(core_location, core_target, problem_type, af
             ai_model = None
             for model_name in model_names:
                 try:
-                    test_model = genai.GenerativeModel(model_name)
+                    test_model = get_genai().GenerativeModel(model_name)
                     # 실제 API 호출 테스트
                     try:
-                        test_response = test_model.generate_content("test")
+                        test_response = call_llm(test_model, "test", 'probe', ctx=ctx)
                         ai_model = test_model
                         logger.info(f"제안서 생성을 위한 Gemini 모델 초기화: {model_name}")
                         break
@@ -589,152 +3947,51 @@ def generate_structured_ai_proposal(core_location, core_target, problem_type, af
             if ai_model is None:
                 raise Exception("사용 가능한 Gemini 모델을 찾을 수 없습니다")
         
-        # 2단계: 정제된 내용 기반 제안서 생성 프롬프트 구성 (개선된 버전)
-        prompt = f"""
-당신은 **김포시 정책기획실장**이자 **시민제안서 검토 전문가**입니다.
-
-[최우선 원칙]
-- 정제된 사용자 의견의 핵심 정보를 절대 변경하거나 일반화하지 마세요
-- 구체적이고 현실적인 내용으로 작성하되, 과장하지 마세요
-- 각 섹션을 자연스럽고 읽기 쉬운 전문 문장으로 작성하세요
-
-[정제된 사용자 핵심 의견]
-- 핵심 제안 장소: {use_location}
-- 핵심 문제 대상: {use_target}
-- 문제 상황 설명: {use_problem_desc}
-- 요청 해결책: {use_solution}
-- 문제 유형: {problem_type if problem_type else '사용자가 명시하지 않음'}
-- 주요 불편 대상: {affected_people if affected_people else '사용자가 명시하지 않음'}
-
-[맥락 정보]
-- 제안 대상 장소: {use_location}
-- 장소 유형 및 특징: {location_context}
-- 수신 기관: 김포도시공사
-
-[작성 지시]
-위의 [정제된 사용자 핵심 의견]을 바탕으로 김포도시공사에 제출하는 시민제안서 초안을 작성해주세요.
-
-## 1. 제안명
-- {use_location}의 {use_target}과 관련된 구체적이고 명확한 제목
-- "~ 개선 제안", "~ 교체 제안", "~ 설치 요청", "~ 확충 제안", "~ 보강 제안" 등의 형태
-- 15-25자 내외로 간결하고 핵심을 담은 제목
-- 예시: "태산패밀리파크 놀이터 주변 휴게시설 교체 제안"
-
-## 2. 현행상의 문제점
-**절대 금지**: "문제가 지속적으로 제기되고 있습니다" 같은 일반적이고 추상적인 표현을 절대 사용하지 마세요.
-
-**작성 원칙**:
-1. 정제된 문제 상황을 바탕으로 하되, 더 구체적이고 풍부하게 확장
-2. 문제의 원인, 현상, 영향, 필요성을 자연스럽게 서술
-3. 장소와 대상의 구체적 정보를 반드시 포함
-4. 읽는 사람이 문제 상황을 명확히 이해할 수 있도록 작성
-
-**정제된 문제 상황 (참고)**:
-{use_problem_desc}
-
-{f"**문제 유형 '{problem_type}' 관점에서**: " if problem_type else ""}
-{f"이 문제는 '{problem_type}' 측면에서 다음과 같은 구체적 문제를 야기하고 있습니다. " if problem_type else ""}
-
-{f"**불편 대상 '{affected_people}' 관점에서**: " if affected_people else ""}
-{f"'{affected_people}'에게 특히 불편함을 주고 있으며, " if affected_people else ""}
-
-**작성 예시 (참고용)**:
-- 좋은 예: "{use_location} 놀이터 근처에 설치된 벤치가 장기간 사용으로 인해 노후화되어 불안정한 상태입니다. 이러한 노후 벤치는 이용객, 특히 어린이와 어르신의 안전을 위협할 수 있으며, 공원을 방문하는 시민들의 우려를 불러일으키고 있습니다. 또한 시설의 노후로 인해 미관상 좋지 않아 공원의 전반적인 이미지에도 부정적인 영향을 미치고 있습니다."
-- 나쁜 예: "{use_location}의 벤치 개선에 대한 문제가 지속적으로 제기되고 있습니다." (절대 사용 금지)
-
-**요구사항**:
-- 3-4문장으로 구체적이고 풍부하게 작성
-- 문제의 원인(노후화, 부족 등)을 명시
-- 문제의 영향(안전, 편의, 미관 등)을 구체적으로 서술
-- 장소({use_location})와 대상({use_target})의 구체적 정보를 포함
-- 일반적이거나 추상적인 표현 완전 금지
-
-## 3. 개선 안
-**절대 금지**: 정제된 해결책의 내용을 그대로 복사-붙여넣기하지 마세요. 반드시 자연스럽게 재구성하고 풍부하게 확장하세요.
-
-**정제된 해결책 (참고용)**:
-{use_solution}
-
-**작성 원칙**:
-1. 정제된 해결책의 핵심 의도를 파악하여 자연스럽게 재구성
-2. 구체적이고 실행 가능한 방안으로 확장
-3. 김포도시공사의 업무 범위와 역할을 고려
-4. 현실적이고 실현 가능한 내용으로 작성
-
-**작성 형식**:
-"김포도시공사에서 [구체적이고 상세한 개선 방안]을 추진해 주실 것을 제안합니다."
-
-**작성 예시 (참고용)**:
-- 좋은 예: "김포도시공사에서 {use_location} 놀이터 근처의 노후 벤치를 안전하고 내구성이 우수한 새로운 벤치로 교체해 주실 것을 제안합니다. 이를 통해 이용객의 안전을 확보하고, 공원의 전반적인 환경을 개선할 수 있을 것으로 기대합니다."
-- 나쁜 예: "김포도시공사에서 {use_solution}을 추진해 주실 것을 제안합니다." (정제된 내용을 그대로 복사 - 절대 금지)
-
-**요구사항**:
-- 정제된 해결책의 핵심을 유지하되, 자연스럽고 풍부하게 재구성
-- 구체적이고 실행 가능한 방안으로 확장
-- 김포도시공사의 업무 범위를 고려한 현실적 방안
-- 1-2문장으로 간결하면서도 구체적으로 작성
-
-## 4. 기대 효과
-{use_location}의 {use_target} 개선을 통한 구체적인 기대 효과를 다음 관점에서 서술:
-1. 직접적 편익: 이용객의 안전과 편의 증진
-{f"2. 불편 대상 '{affected_people}'에 대한 구체적 편익" if affected_people else "2. 시설 이용객에 대한 구체적 편익"}
-3. 시설 활성화: 개선을 통한 이용률 향상
-4. 사회적 가치: 공공시설의 품질 향상
-
-**요구사항**:
-- 구체적이고 현실적인 효과 제시
-- 과장된 표현 지양
-- 2-3문장으로 간결하게 작성
-
-[금지사항 - 절대 준수]
-- "{use_location}"와 "{use_target}"을 일반화하거나 생략하는 것 금지
-- "문제가 지속적으로 제기되고 있습니다" 같은 일반적 표현 사용 금지
-- 정제된 내용을 그대로 복사-붙여넣기하는 것 금지
-- 과장되고 추상적인 내용 작성 금지
-- 구체적인 수치, 예산, 일정 등을 임의로 작성하는 것 금지
-- "~하겠습니다" 형태의 1인칭 표현 사용 금지
-
-위 지침을 철저히 준수하여 전문적이고 자연스러운 제안서를 작성해주세요.
-"""
+        # 2단계: 정제된 내용 기반 제안서 생성 요청 구성 (고정 지시문은 모델의 system_instruction으로 전달)
+        prompt = build_draft_request(**draft_inputs)
+        ctx.check_cancelled('draft')
         logger.info("2단계: 제안서 생성 시작...")
-        response = ai_model.generate_content(prompt)
+        response = call_llm_routed(prompt, 'draft', ctx=ctx, fallback_model=ai_model)
         response_text = response.text.strip()
         
         # 응답 파싱 (정제된 내용 사용)
         proposal = parse_structured_proposal(response_text, use_location, use_target, use_solution)
+        ctx.check_cancelled('validate')
+        proposal = validate_structured_proposal(
+            proposal, use_location, use_target, use_problem_desc, use_solution,
+            problem_type, affected_people, ctx=ctx, fallback_model=ai_model
+        )
+
+        # 정제까지 성공한 결과만 캐시 (사용한 장소 정보가 바뀌면 무효화됨, 부하 제한으로 단계를 생략한 결과는 제외)
+        if refined_input['success'] and not ctx.single_pass:
+            dependencies = [core_location, use_location]
+            for location_name in (core_location, use_location):
+                facility_name, confidence = resolve_facility_name(location_name)
+                if facility_name is not None and confidence >= FACILITY_MATCH_THRESHOLD:
+                    dependencies.append(facility_name)
+            store_cached_proposal(cache_key, proposal, dependencies)
         
         return proposal
         
+    except (QuotaWaitTooLong, RequestCancelled):
+        # 할당량 초과 시 금지 문구가 들어간 기본 제안서로 대체하지 않고 예상 대기 시간을 알림 (취소도 그대로 전달)
+        raise
     except Exception as e:
         logger.error(f"정형화된 AI 제안서 생성 오류: {str(e)}")
         
-        # 에러 발생 시 정제 시도 (아직 시도하지 않은 경우)
-        try:
-            logger.info("에러 발생 - 입력 정제 재시도...")
-            refined_input = refine_user_input(core_location, core_target, problem_type, affected_people, solution_idea)
-            if refined_input['success']:
-                use_location = refined_input['refined_location']
-                use_target = refined_input['refined_target']
-                use_solution = refined_input['refined_solution']
-            else:
-                use_location = core_location
-                use_target = core_target
-                use_solution = solution_idea if solution_idea else "개선이 필요합니다."
-        except:
-            # 정제도 실패한 경우 원본 사용
+        # 이미 끝난 정제 결과가 있으면 재사용 (오류 처리 중에는 AI를 다시 호출하지 않음)
+        refined_input = ctx.refined_input
+        if refined_input and refined_input['success']:
+            use_location = refined_input['refined_location']
+            use_target = refined_input['refined_target']
+            use_solution = refined_input['refined_solution']
+        else:
             use_location = core_location
             use_target = core_target
             use_solution = solution_idea if solution_idea else "개선이 필요합니다."
         
-        # 폴백: 기본 제안서 생성
-        title = generate_appropriate_title(use_location, use_target, use_solution)
-            
-        return {
-            'title': title,
-            'problem': f"{use_location}의 {use_target}에 대한 문제가 지속적으로 제기되고 있습니다.",
-            'solution': f"김포도시공사에서 {use_solution}을 추진해 주실 것을 제안합니다.",
-            'effect': f"{use_location}의 {use_target} 개선을 통해 시민 편의 증진과 시설 이용률 향상을 기대할 수 있습니다."
-        }
+        # 폴백: 분야별 템플릿으로 기본 제안서 생성
+        return generate_local_draft(use_location, use_target, problem_type, affected_people, use_solution)
 
 def parse_structured_proposal(response_text, core_location, core_target, solution_idea):
     """정형화된 제안서 응답 파싱"""
@@ -789,16 +4046,229 @@ def parse_structured_proposal(response_text, core_location, core_target, solutio
         return sections
         
     except Exception as e:
-        logger.error(f"정형화된 제안서 파싱 오류: {str(e)}")
-        # 제안명 생성 로직 개선 - 핵심 내용 파악하여 적절한 제안명 생성
-        title = generate_appropriate_title(core_location, core_target, solution_idea)
-            
-        return {
-            'title': title,
-            'problem': f"{core_location}의 {core_target}에 대한 문제가 지속적으로 제기되고 있습니다.",
-            'solution': f"김포도시공사에서 {solution_idea}을 추진해 주실 것을 제안합니다.",
-            'effect': f"{core_location}의 {core_target} 개선을 통해 시민 편의 증진과 시설 이용률 향상을 기대할 수 있습니다."
-        }
+        logger.error(f"정형화된 제안서 파싱 오류: {str(e)}")
+        # 제안명 생성 로직 개선 - 핵심 내용 파악하여 적절한 제안명 생성
+        title = generate_appropriate_title(core_location, core_target, solution_idea)
+            
+        return {
+            'title': title,
+            'problem': f"{core_location}의 {core_target}에 대한 문제가 지속적으로 제기되고 있습니다.",
+            'solution': f"김포도시공사에서 {solution_idea}을 추진해 주실 것을 제안합니다.",
+            'effect': f"{core_location}의 {core_target} 개선을 통해 시민 편의 증진과 시설 이용률 향상을 기대할 수 있습니다."
+        }
+
+# 제안서 사후 검증 (초안 지시문의 금지사항을 실제 출력에서 확인하고, 가능하면 AI 호출 없이 고침)
+PROPOSAL_VALIDATION_ENABLED = os.getenv('PROPOSAL_VALIDATION_ENABLED', '1') == '1'
+PROPOSAL_SECTION_LABELS = {
+    'title': '제안명',
+    'problem': '현행상의 문제점',
+    'solution': '개선 안',
+    'effect': '기대 효과'
+}
+PROPOSAL_RULE_DESCRIPTIONS = {
+    'generic_phrase': '"문제가 지속적으로 제기되고 있습니다" 같은 일반적이고 추상적인 표현을 쓰지 마세요.',
+    'first_person': '"~하겠습니다" 형태의 1인칭 표현을 쓰지 마세요.',
+    'copied_solution': '정제된 해결책 문장을 그대로 옮기지 말고 자연스럽게 재구성하세요.',
+    'invented_number': '사용자가 말하지 않은 수치, 예산, 일정을 임의로 쓰지 마세요.'
+}
+
+SENTENCE_SPLIT_PATTERN = re.compile(r'(?<=[.!?])\s+')
+GENERIC_PHRASE_PATTERN = re.compile(r'(?:문제|민원|의견|요구)(?:가|이)\s*(?:지속적으로|꾸준히|계속(?:해서)?)\s*제기되고\s*있습니다')
+FIRST_PERSON_PATTERN = re.compile(r'(?:하|드리)겠습니다')
+# (패턴, 치환, 적용 섹션 - None이면 모든 섹션)
+FIRST_PERSON_REWRITES = [(re.compile(pattern), replacement, sections) for pattern, replacement, sections in [
+    (r'제안(?:하|드리)겠습니다', '제안합니다', None),
+    (r'기대하겠습니다', '기대됩니다', None),
+    (r'드리겠습니다', '드립니다', None),
+    (r'(\S+?)하겠습니다', r'\1해 주실 것을 제안합니다', ('solution',)),
+    (r'(\S+?)하겠습니다', r'\1할 것으로 기대됩니다', ('title', 'problem', 'effect')),
+]]
+NUMBER_CLAIM_PATTERN = re.compile(
+    r'(\d[\d,.]*)\s*(?:억|천만|백만|만|천)?\s*(?:원|%|퍼센트|명|개소|개|대|곳|km|킬로미터|m|미터|년|개월|주|일|시간|분|회|건|배|석|면)'
+    r'|[수몇일이삼사오육칠팔구십백천]+\s*(?:억|천만|백만|만)\s*원'
+)
+SOURCE_NUMBER_PATTERN = re.compile(r'\d[\d,.]*')
+COPY_CHECK_MIN_LENGTH = 12
+# 해결책 복사 여부 비교 시 제외하는 제안서 상투 문구
+COPY_BOILERPLATE_PATTERN = re.compile(r'김포도시공사에서|(?:해\s*)?주실\s*것을\s*제안합니다|할\s*것을\s*제안합니다|을\s*추진')
+
+def normalize_number(text):
+    """수치 비교용 정규화 (1,000 -> 1000)"""
+    return text.replace(',', '').rstrip('.')
+
+def compact_text(text):
+    """복사 여부 비교용 정규화 (공백/문장부호 제거)"""
+    return re.sub(r'[\s.,!?"\'()]', '', text or '')
+
+def find_invented_numbers(text, source_numbers):
+    """입력에 없던 수치/예산 표현 목록"""
+    invented = []
+    for match in NUMBER_CLAIM_PATTERN.finditer(text):
+        digits = match.group(1)
+        if digits is None or normalize_number(digits) not in source_numbers:
+            invented.append(match.group(0))
+    return invented
+
+def find_section_violations(section, text, source_numbers, solution_key):
+    """섹션 본문에서 어긴 규칙 이름 목록"""
+    violations = []
+    if GENERIC_PHRASE_PATTERN.search(text):
+        violations.append('generic_phrase')
+    if FIRST_PERSON_PATTERN.search(text):
+        violations.append('first_person')
+    if section == 'solution' and solution_key and solution_key in compact_text(text):
+        violations.append('copied_solution')
+    if find_invented_numbers(text, source_numbers):
+        violations.append('invented_number')
+    return violations
+
+def repair_section_locally(section, text, violations, source_numbers):
+    """
+    로컬 규칙으로 섹션 수정 시도
+
+    1인칭 표현은 어미를 바꾸고, 일반적 표현이나 임의 수치가 든 문장은 다른 문장이 남는 경우에만 뺍니다.
+
+    Returns:
+        str: 수정된 본문 (로컬로 고칠 수 없으면 None)
+    """
+    if 'copied_solution' in violations:
+        return None
+
+    if 'first_person' in violations:
+        for pattern, replacement, sections in FIRST_PERSON_REWRITES:
+            if sections is None or section in sections:
+                text = pattern.sub(replacement, text)
+
+    if 'generic_phrase' in violations or 'invented_number' in violations:
+        if section == 'title':
+            return None
+        sentences = [
+            sentence for sentence in SENTENCE_SPLIT_PATTERN.split(text.strip())
+            if not GENERIC_PHRASE_PATTERN.search(sentence) and not find_invented_numbers(sentence, source_numbers)
+        ]
+        if not sentences:
+            return None
+        text = ' '.join(sentences)
+
+    return text
+
+def clean_section_response(text, section):
+    """섹션 재요청 응답에서 머리말을 빼고 본문만 남기기"""
+    label = PROPOSAL_SECTION_LABELS[section]
+    lines = []
+    for line in text.split('\n'):
+        line = line.strip().strip('*').strip()
+        if not line or line.startswith('#') or (label in line and len(line) <= len(label) + 6):
+            continue
+        lines.append(line)
+    return ' '.join(lines)
+
+def request_proposal_section(section, current_text, violations, inputs, ctx=None, fallback_model=None):
+    """
+    어긴 섹션 하나만 짧은 요청으로 다시 받기
+
+    Returns:
+        str: 새 본문 (실패 시 None)
+    """
+    increment_metric('proposal_section_rerequests')
+    prompt = prompt_registry.render(
+        'draft_section_request',
+        use_location=inputs['use_location'],
+        use_target=inputs['use_target'],
+        use_problem_desc=inputs['use_problem_desc'],
+        use_solution=inputs['use_solution'],
+        section_label=PROPOSAL_SECTION_LABELS[section],
+        current_text=current_text,
+        violations='\n'.join(f"- {PROPOSAL_RULE_DESCRIPTIONS[rule]}" for rule in violations)
+    )
+    try:
+        response = call_llm_routed(prompt, 'draft_section', ctx=ctx, fallback_model=fallback_model)
+        text = clean_section_response(response.text, section)
+    except RequestCancelled:
+        raise
+    except Exception as e:
+        # 제안서 본문은 이미 생성됐으므로 할당량 대기를 포함한 모든 오류는 로컬 대체로 처리
+        logger.warning(f"제안서 섹션 재요청 실패 ({section}): {e}")
+        return None
+    return text or None
+
+def validate_structured_proposal(proposal, use_location, use_target, use_problem_desc, use_solution,
+                                 problem_type, affected_people, ctx=None, fallback_model=None):
+    """
+    생성된 제안서의 금지 표현 검사 및 수정
+
+    섹션마다 규칙을 검사해 로컬 수정 -> 해당 섹션만 재요청 -> 분야별 템플릿 문장 순으로 고칩니다.
+    규칙별 적발 수는 proposal_rule_hits_<규칙> 지표로 기록됩니다.
+
+    Returns:
+        dict: 검증을 통과한 제안서
+    """
+    if not PROPOSAL_VALIDATION_ENABLED:
+        return proposal
+
+    increment_metric('proposal_validations')
+    inputs = {
+        'use_location': use_location,
+        'use_target': use_target,
+        'use_problem_desc': use_problem_desc,
+        'use_solution': use_solution
+    }
+    source_numbers = {
+        normalize_number(number)
+        for value in (use_location, use_target, use_problem_desc, use_solution, problem_type, affected_people)
+        for number in SOURCE_NUMBER_PATTERN.findall(value or '')
+    }
+    solution_key = compact_text(COPY_BOILERPLATE_PATTERN.sub('', use_solution or ''))
+    if len(solution_key) < COPY_CHECK_MIN_LENGTH:
+        solution_key = None
+
+    validated = dict(proposal)
+    local_draft = None
+    for section in PROPOSAL_SECTION_LABELS:
+        text = validated.get(section, '')
+        violations = find_section_violations(section, text, source_numbers, solution_key)
+        if not violations:
+            continue
+        for rule in violations:
+            increment_metric(f'proposal_rule_hits_{rule}')
+
+        repaired = repair_section_locally(section, text, violations, source_numbers)
+        if repaired is not None and not find_section_violations(section, repaired, source_numbers, solution_key):
+            increment_metric('proposal_local_repairs')
+            validated[section] = repaired
+            continue
+
+        if section == 'title':
+            validated[section] = generate_appropriate_title(use_location, use_target, use_solution)
+            increment_metric('proposal_local_repairs')
+            continue
+
+        # 부하 제한 중(단일 호출 모드)에는 섹션을 다시 요청하지 않고 템플릿 문장으로 대체
+        regenerated = None
+        if ctx is None or not ctx.single_pass:
+            regenerated = request_proposal_section(section, text, violations, inputs, ctx=ctx, fallback_model=fallback_model)
+        if regenerated is not None:
+            remaining = find_section_violations(section, regenerated, source_numbers, solution_key)
+            if remaining:
+                regenerated = repair_section_locally(section, regenerated, remaining, source_numbers)
+                if regenerated is not None and find_section_violations(section, regenerated, source_numbers, solution_key):
+                    regenerated = None
+        if regenerated is not None:
+            increment_metric('proposal_section_regenerated')
+            validated[section] = regenerated
+            continue
+
+        # 재요청으로도 고치지 못하면 분야별 템플릿 문장으로 대체 (해결책 문장이 그대로 들어가지 않도록 첫 문장만 사용)
+        if local_draft is None:
+            local_draft = generate_local_draft(use_location, use_target, problem_type, affected_people, use_solution)
+        fallback = local_draft[section]
+        if section == 'solution':
+            fallback = SENTENCE_SPLIT_PATTERN.split(fallback)[0]
+        increment_metric('proposal_section_fallbacks')
+        validated[section] = fallback
+        logger.warning(f"제안서 '{PROPOSAL_SECTION_LABELS[section]}' 섹션을 템플릿 문장으로 대체: {', '.join(violations)}")
+
+    return validated
 
 def generate_ai_proposal(problem, solution):
     """AI를 사용한 제안서 생성"""
@@ -808,6 +4278,7 @@ def generate_ai_proposal(problem, solution):
         location_context = get_location_context(location_elements['location'])
         
         # 2단계: AI 모델 초기화 (전역 model 사용 - 이미 검증됨)
+        model = get_model()
         if model is not None:
             ai_model = model
             logger.info("제안서 생성을 위해 전역 Gemini 모델 재사용 (이미 검증됨)")
@@ -817,10 +4288,10 @@ def generate_ai_proposal(problem, solution):
             ai_model = None
             for model_name in model_names:
                 try:
-                    test_model = genai.GenerativeModel(model_name)
+                    test_model = get_genai().GenerativeModel(model_name)
                     # 실제 API 호출 테스트
                     try:
-                        test_response = test_model.generate_content("test")
+                        test_response = call_llm(test_model, "test", 'probe')
                         ai_model = test_model
                         logger.info(f"제안서 생성을 위한 Gemini 모델 초기화: {model_name}")
                         break
@@ -891,7 +4362,7 @@ def generate_ai_proposal(problem, solution):
 위 지침에 따라 제안서를 작성해주세요.
 """
         
-        response = model.generate_content(prompt)
+        response = call_llm_routed(prompt, 'legacy_draft', fallback_model=ai_model)
         response_text = response.text.strip()
         
         # 응답 파싱
@@ -899,6 +4370,8 @@ def generate_ai_proposal(problem, solution):
         
         return proposal
         
+    except QuotaWaitTooLong:
+        raise
     except Exception as e:
         logger.error(f"AI 제안서 생성 오류: {str(e)}")
         return {
@@ -969,12 +4442,54 @@ def parse_ai_response(response_text, location_elements):
             'effect': f"{location_elements['location']}의 {location_elements['problem_target']} 개선을 통해 시민 편의 증진과 시설 이용률 향상을 기대할 수 있습니다."
         }
 
-def create_pdf_file(title, problem, solution, effect, proposer_name):
-    """PDF 파일 생성 - 전문적이고 세련된 시민제안서 양식"""
+reportlab_loaded = False
+
+def preload_reportlab():
+    """ReportLab 모듈 로드 및 한글 폰트 등록 (첫 PDF 생성 시 또는 워커 fork 전 1회)"""
+    global reportlab_loaded
+    if reportlab_loaded or not REPORTLAB_AVAILABLE:
+        return
+    with profile_startup('import reportlab (첫 사용)'):
+        # 모듈 로드만 하는 용도 (이름은 create_pdf_file에서 import)
+        for module_name in ('reportlab.platypus', 'reportlab.lib.styles', 'reportlab.pdfbase.ttfonts'):
+            importlib.import_module(module_name)
+    with profile_startup('한글 폰트 등록 (첫 사용)'):
+        register_korean_fonts()
+    reportlab_loaded = True
+
+def preload_heavy_modules():
+    """
+    무거운 모듈을 미리 로드 (PRELOAD_HEAVY_MODULES=1)
+
+    gunicorn --preload 처럼 마스터 프로세스에서 앱을 import한 뒤 워커를 fork하는 경우,
+    마스터에서 한 번만 로드하여 워커들이 메모리를 공유하도록 합니다.
+    google.generativeai는 gRPC 채널이 fork 이후에 안전하지 않으므로 워커에서 첫 사용 시 로드합니다.
+    """
+    preload_reportlab()
+    importlib.import_module('bs4')
+
+def create_pdf_file(title, problem, solution, effect, proposer_name, cancel_token=None):
+    """
+    PDF 파일 생성 - 전문적이고 세련된 시민제안서 양식
+
+    cancel_token이 취소되면 다음 페이지를 그리기 전에 중단합니다 (RequestCancelled).
+    """
     try:
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled('pdf')
+
         # ReportLab 사용 가능 여부 확인
         if not REPORTLAB_AVAILABLE:
             raise Exception("ReportLab이 설치되지 않았습니다. pip install reportlab을 실행하세요.")
+
+        # ReportLab은 첫 PDF 생성 시 로드 (이후 호출은 모듈 캐시 사용)
+        preload_reportlab()
+        from reportlab.lib.pagesizes import A4
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, TableStyle
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY, TA_RIGHT
+        from reportlab.lib import colors
         
         # 한글 폰트 등록 확인
         korean_font_registered = False
@@ -1160,8 +4675,6 @@ def create_pdf_file(title, problem, solution, effect, proposer_name):
             ['제안분야', '시설물 개선', '처리기한', '접수 후 30일 이내']
         ]
         
-        # Table, TableStyle, colors는 이미 상단에서 import됨
-        
         info_table = Table(info_table_data, colWidths=[70, 130, 70, 130])
         info_table.setStyle(TableStyle([
             ('BACKGROUND', (0, 0), (-1, -1), colors.white),
@@ -1330,16 +4843,515 @@ def create_pdf_file(title, problem, solution, effect, proposer_name):
         
         story.append(consent_signature_table)
         
-        # PDF 생성
-        doc.build(story)
+        # PDF 생성 (페이지마다 취소 여부 확인)
+        def check_cancelled(canvas, document):
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled('pdf')
+
+        doc.build(story, onFirstPage=check_cancelled, onLaterPages=check_cancelled)
         
         logger.info(f"PDF 파일 생성 완료: {filepath}")
         return filepath
         
+    except RequestCancelled:
+        logger.info("PDF 생성 취소 - 요청한 사용자가 떠났습니다.")
+        raise
     except Exception as e:
         logger.error(f"PDF 생성 오류: {str(e)}")
         raise e
 
+def quota_exceeded_response(error):
+    """할당량 대기 한도 초과 응답 (429 + Retry-After)"""
+    retry_after = max(1, int(error.expected_wait + 0.999))
+    response = jsonify({
+        'error': f'요청이 많아 잠시 후 다시 시도해주세요. (예상 대기 시간 약 {retry_after}초)',
+        'retry_after': retry_after
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def load_shed_response(error):
+    """부하 제한 응답 (503 + Retry-After)"""
+    increment_metric('load_shed_rejections')
+    logger.warning(str(error))
+    response = quota_exceeded_response(error)
+    response.status_code = 503
+    return response
+
+def request_cancelled_response(error):
+    """취소된 요청 응답 (499, 받을 사용자가 없으므로 본문은 최소한으로)"""
+    logger.info(str(error))
+    return jsonify({'error': '요청이 취소되었습니다.'}), 499
+
+# 클라이언트별 요청 한도 (토큰 버킷, IP와 세션마다 따로 적용하고 생성/PDF 비용을 다르게 차감)
+# 한 스크립트가 제안서 생성으로 Gemini 할당량을 모두 쓰거나 PDF 생성으로 CPU를 독차지하지 못하게 합니다.
+# RATE_LIMIT_REDIS_URL을 설정하면 여러 워커/인스턴스가 Redis의 버킷을 함께 사용합니다.
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', '1') == '1'
+RATE_LIMIT_REDIS_URL = os.getenv('RATE_LIMIT_REDIS_URL', '')
+RATE_LIMIT_KEY_PREFIX = os.getenv('RATE_LIMIT_KEY_PREFIX', 'ratelimit:')
+# 범위별 버킷 크기(비용 단위)와 분당 충전량 (IP는 공공기관/통신사 NAT를 고려해 세션보다 넉넉하게)
+RATE_LIMIT_SCOPES = {
+    'session': {
+        'capacity': float(os.getenv('RATE_LIMIT_SESSION_CAPACITY', '30')),
+        'refill_per_minute': float(os.getenv('RATE_LIMIT_SESSION_REFILL_PER_MINUTE', '10'))
+    },
+    'ip': {
+        'capacity': float(os.getenv('RATE_LIMIT_IP_CAPACITY', '120')),
+        'refill_per_minute': float(os.getenv('RATE_LIMIT_IP_REFILL_PER_MINUTE', '40'))
+    }
+}
+# 요청 종류별 비용 (제안서 생성은 AI 호출 여러 번, 섹션 다시 쓰기는 1번, PDF 생성은 CPU)
+RATE_LIMIT_COSTS = {
+    'generate': float(os.getenv('RATE_LIMIT_GENERATE_COST', '5')),
+    'regenerate': float(os.getenv('RATE_LIMIT_REGENERATE_COST', '2')),
+    'render': float(os.getenv('RATE_LIMIT_RENDER_COST', '3'))
+}
+RATE_LIMIT_MAX_KEYS = 10000
+SESSION_ID_HEADER = 'X-Session-Id'
+# 앞단 프록시 수 (Render 등 프록시 뒤에서는 X-Forwarded-For의 뒤에서 n번째 주소를 클라이언트 IP로 사용)
+TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', '0'))
+
+class RateLimitExceeded(QuotaWaitTooLong):
+    """클라이언트별 요청 한도 초과 (429 + Retry-After, scope: 한도를 넘은 범위)"""
+
+    def __init__(self, expected_wait, scope):
+        Exception.__init__(self, f"요청 한도 초과 ({scope}) - {expected_wait:.1f}초 후 재시도 가능")
+        self.expected_wait = expected_wait
+        self.scope = scope
+
+class InMemoryRateLimitBackend:
+    """프로세스 안에서만 공유하는 토큰 버킷 (기본값, 워커마다 따로 계산됨)"""
+
+    name = 'memory'
+
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def consume(self, key, cost, capacity, refill_per_second):
+        """
+        버킷에서 cost만큼 차감
+
+        Returns:
+            tuple: (허용 여부, 재시도까지 남은 시간(초), 남은 양)
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now, capacity, refill_per_second)
+        retry_after = 0.0 if allowed else (cost - tokens) / refill_per_second
+        return allowed, retry_after, tokens
+
+    def _prune(self, now, capacity, refill_per_second):
+        """가득 찬 상태로 돌아온(한동안 요청이 없던) 버킷 정리, 그래도 많으면 오래된 것부터 삭제"""
+        full_after = capacity / refill_per_second
+        for key in [key for key, (_, updated_at) in self._buckets.items() if now - updated_at > full_after]:
+            del self._buckets[key]
+        while len(self._buckets) > self.max_keys:
+            del self._buckets[next(iter(self._buckets))]
+
+    def state(self):
+        with self._lock:
+            return {'backend': self.name, 'tracked_keys': len(self._buckets)}
+
+class RedisRateLimitBackend:
+    """
+    Redis 토큰 버킷 (여러 워커/인스턴스가 같은 한도를 공유)
+
+    충전과 차감을 Lua 스크립트 하나로 원자적으로 처리하고, 시계는 Redis 서버 시간(TIME)을 사용하여
+    인스턴스 간 시간 차이의 영향을 받지 않습니다. 버킷은 가득 찰 시간이 지나면 만료됩니다.
+    """
+
+    name = 'redis'
+
+    CONSUME_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * refill)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / refill
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / refill) + 1)
+return {allowed, tostring(retry_after), tostring(tokens)}
+"""
+
+    def __init__(self, client, key_prefix=RATE_LIMIT_KEY_PREFIX):
+        self.client = client
+        self.key_prefix = key_prefix
+        self._consume = client.register_script(self.CONSUME_SCRIPT)
+
+    def consume(self, key, cost, capacity, refill_per_second):
+        allowed, retry_after, tokens = self._consume(
+            keys=[self.key_prefix + key], args=[capacity, refill_per_second, cost]
+        )
+        return bool(int(allowed)), float(retry_after), float(tokens)
+
+    def state(self):
+        return {'backend': self.name}
+
+def create_redis_client(redis_url, purpose):
+    """Redis 클라이언트 생성 (redis 패키지는 이때만 import, 연결할 수 없으면 None)"""
+    try:
+        import redis
+        client = redis.Redis.from_url(redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        client.ping()
+        logger.info(f"{purpose}에 Redis를 사용합니다.")
+        return client
+    except Exception as e:
+        logger.warning(f"{purpose}에 Redis를 사용할 수 없어 메모리를 사용합니다: {e}")
+        return None
+
+def create_rate_limit_backend(redis_url=RATE_LIMIT_REDIS_URL):
+    """Redis 주소가 있으면 Redis 백엔드, 없거나 연결할 수 없으면 메모리 백엔드"""
+    client = create_redis_client(redis_url, '요청 한도 버킷') if redis_url else None
+    return RedisRateLimitBackend(client) if client is not None else InMemoryRateLimitBackend()
+
+class ClientRateLimiter:
+    """
+    범위(세션, IP)별 토큰 버킷 검사
+
+    좁은 범위(세션)부터 차감하므로 세션 한도에 걸린 요청은 IP 버킷을 쓰지 않습니다.
+    공유 백엔드(Redis)에 장애가 나면 요청을 막지 않고 이 프로세스의 메모리 버킷으로 대신 계산합니다.
+    """
+
+    def __init__(self, backend, scopes, costs):
+        self.backend = backend
+        self.scopes = scopes
+        self.costs = costs
+        self._fallback = backend if isinstance(backend, InMemoryRateLimitBackend) else InMemoryRateLimitBackend()
+
+    def _consume(self, key, cost, config):
+        refill_per_second = config['refill_per_minute'] / 60.0
+        try:
+            return self.backend.consume(key, cost, config['capacity'], refill_per_second)
+        except Exception as e:
+            increment_metric('rate_limit_backend_errors')
+            logger.warning(f"요청 한도 백엔드 오류 - 메모리 버킷으로 대신 계산합니다: {e}")
+            return self._fallback.consume(key, cost, config['capacity'], refill_per_second)
+
+    def max_units(self, action, identities):
+        """한 번에 차감할 수 있는 최대 건수 (적용되는 범위 중 가장 작은 버킷 크기 기준)"""
+        capacities = [config['capacity'] for scope, config in self.scopes.items() if identities.get(scope)]
+        if not capacities:
+            return None
+        return int(min(capacities) // self.costs[action])
+
+    def check(self, action, identities, units=1):
+        """
+        요청 종류(action)의 비용을 범위별 버킷에서 차감
+
+        Args:
+            action (str): RATE_LIMIT_COSTS의 요청 종류 (generate, regenerate, render)
+            identities (dict): 범위 -> 클라이언트 식별자 (값이 없는 범위는 건너뜀)
+            units (int): 한 요청에 담긴 건수 (대량 작업은 항목 수만큼 차감)
+
+        Raises:
+            RateLimitExceeded: 한 범위라도 한도를 넘은 경우
+        """
+        cost = self.costs[action] * units
+        for scope, config in self.scopes.items():
+            identity = identities.get(scope)
+            if not identity:
+                continue
+            allowed, retry_after, _ = self._consume(f'{scope}:{identity}', cost, config)
+            if not allowed:
+                increment_metric(f'rate_limit_rejected_{action}_{scope}')
+                raise RateLimitExceeded(retry_after, scope)
+        increment_metric(f'rate_limit_allowed_{action}')
+
+    def state(self):
+        return {
+            **self.backend.state(),
+            'scopes': self.scopes,
+            'costs': self.costs
+        }
+
+client_rate_limiter = ClientRateLimiter(create_rate_limit_backend(), RATE_LIMIT_SCOPES, RATE_LIMIT_COSTS)
+
+def get_client_ip():
+    """클라이언트 IP (신뢰하는 프록시 수만큼 X-Forwarded-For를 거슬러 올라감)"""
+    if TRUSTED_PROXY_COUNT > 0:
+        forwarded = [part.strip() for part in request.headers.get('X-Forwarded-For', '').split(',') if part.strip()]
+        if len(forwarded) >= TRUSTED_PROXY_COUNT:
+            return forwarded[-TRUSTED_PROXY_COUNT]
+    return request.remote_addr or 'unknown'
+
+def get_client_identities():
+    """요청 한도를 적용할 범위별 식별자 (세션은 화면이 보내는 X-Session-Id, 없으면 IP만 적용)"""
+    session_id = request.headers.get(SESSION_ID_HEADER, '').strip()[:64]
+    return {'session': session_id or None, 'ip': get_client_ip()}
+
+def rate_limited_response(error):
+    """요청 한도 초과 응답 (429 + Retry-After)"""
+    logger.warning(f"{error} - {get_client_ip()}")
+    retry_after = max(1, int(error.expected_wait + 0.999))
+    response = jsonify({
+        'error': f'요청이 너무 잦습니다. {retry_after}초 후에 다시 시도해주세요.',
+        'retry_after': retry_after
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def rate_limited(action):
+    """엔드포인트에 클라이언트별 요청 한도 적용 (요청 종류별 비용 차감)"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if RATE_LIMIT_ENABLED:
+                try:
+                    client_rate_limiter.check(action, get_client_identities())
+                except RateLimitExceeded as e:
+                    return rate_limited_response(e)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# 직원 전용 엔드포인트 인증 (설정하지 않으면 직원 전용 엔드포인트를 사용할 수 없음)
+STAFF_API_TOKEN = os.getenv('STAFF_API_TOKEN', '')
+STAFF_TOKEN_HEADER = 'X-Staff-Token'
+
+def staff_only(view):
+    """X-Staff-Token 헤더가 STAFF_API_TOKEN과 일치하는 요청만 허용"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not STAFF_API_TOKEN:
+            return jsonify({'error': '직원 인증이 설정되지 않아 사용할 수 없습니다.'}), 403
+        token = request.headers.get(STAFF_TOKEN_HEADER, '')
+        if not hmac.compare_digest(token.encode('utf-8'), STAFF_API_TOKEN.encode('utf-8')):
+            increment_metric('staff_auth_rejected')
+            logger.warning(f"직원 인증 실패 - {get_client_ip()}")
+            return jsonify({'error': '직원 인증이 필요합니다.'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+# 멱등 키 (모바일에서 같은 요청을 다시 보내도 파이프라인/PDF 생성을 한 번만 실행)
+# Idempotency-Key 헤더가 있는 요청은 처리 중 표시를 남기고, 끝나면 응답(상태, 헤더, 본문)을 보관하여
+# 같은 키로 다시 들어온 요청에 그대로(바이트 단위로 동일하게) 돌려줍니다.
+IDEMPOTENCY_ENABLED = os.getenv('IDEMPOTENCY_ENABLED', '1') == '1'
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', '3600'))
+# 처리 중 표시 유지 시간 (처리하던 워커가 죽어도 이 시간이 지나면 같은 키로 다시 실행 가능)
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv('IDEMPOTENCY_LOCK_SECONDS', '120'))
+# 같은 키의 요청이 처리 중일 때 결과를 기다리는 최대 시간
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv('IDEMPOTENCY_WAIT_SECONDS', '30'))
+IDEMPOTENCY_POLL_INTERVAL = 0.1
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv('IDEMPOTENCY_MAX_ENTRIES', '1000'))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+IDEMPOTENCY_REDIS_URL = os.getenv('IDEMPOTENCY_REDIS_URL', RATE_LIMIT_REDIS_URL)
+# 다시 돌려줄 응답 헤더 (Content-Length 등은 본문으로 다시 계산됨)
+IDEMPOTENCY_REPLAY_HEADERS = ('Content-Type', 'Content-Disposition', 'Location', 'Retry-After', 'Cache-Control')
+
+class InMemoryIdempotencyStore:
+    """프로세스 안에서만 공유하는 멱등 키 저장소 (기본값)"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries=IDEMPOTENCY_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def begin(self, key, fingerprint, lock_seconds):
+        """
+        처리 중 표시 남기기
+
+        Returns:
+            dict: 이미 있는 항목 (없어서 새로 표시했으면 None)
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['expires_at'] > now:
+                return dict(entry)
+            for expired in [k for k, e in self._entries.items() if e['expires_at'] <= now]:
+                del self._entries[expired]
+            while len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = {'state': 'in_progress', 'fingerprint': fingerprint, 'expires_at': now + lock_seconds}
+        return None
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['expires_at'] <= time.time():
+                return None
+            return dict(entry)
+
+    def complete(self, key, entry, ttl_seconds):
+        with self._lock:
+            self._entries[key] = {**entry, 'state': 'done', 'expires_at': time.time() + ttl_seconds}
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def state(self):
+        with self._lock:
+            return {'backend': self.name, 'entries': len(self._entries)}
+
+class RedisIdempotencyStore:
+    """Redis 멱등 키 저장소 (여러 워커/인스턴스가 같은 키를 공유, SET NX로 처리 중 표시)"""
+
+    name = 'redis'
+
+    def __init__(self, client, key_prefix='idempotency:'):
+        self.client = client
+        self.key_prefix = key_prefix
+
+    def begin(self, key, fingerprint, lock_seconds):
+        marker = json.dumps({'state': 'in_progress', 'fingerprint': fingerprint})
+        for _ in range(2):
+            if self.client.set(self.key_prefix + key, marker, nx=True, ex=lock_seconds):
+                return None
+            entry = self.get(key)
+            if entry is not None:
+                return entry
+        return None
+
+    def get(self, key):
+        raw = self.client.get(self.key_prefix + key)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        if 'body' in entry:
+            entry['body'] = base64.b64decode(entry['body'])
+        return entry
+
+    def complete(self, key, entry, ttl_seconds):
+        stored = {**entry, 'state': 'done', 'body': base64.b64encode(entry['body']).decode('ascii')}
+        self.client.set(self.key_prefix + key, json.dumps(stored), ex=ttl_seconds)
+
+    def discard(self, key):
+        self.client.delete(self.key_prefix + key)
+
+    def state(self):
+        return {'backend': self.name}
+
+def create_idempotency_store(redis_url=IDEMPOTENCY_REDIS_URL):
+    """Redis 주소가 있으면 Redis 저장소, 없거나 연결할 수 없으면 메모리 저장소"""
+    client = create_redis_client(redis_url, '멱등 키 저장소') if redis_url else None
+    return RedisIdempotencyStore(client) if client is not None else InMemoryIdempotencyStore()
+
+idempotency_store = create_idempotency_store()
+
+def idempotency_fingerprint():
+    """같은 키로 다른 요청을 보냈는지 확인하기 위한 요청 지문 (메서드, 경로, 본문)"""
+    digest = hashlib.sha256(f"{request.method} {request.path}\n".encode('utf-8'))
+    digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+def replay_idempotent_response(store_key, entry, fingerprint):
+    """보관한 응답 재전송 (처리 중이면 끝날 때까지 기다림)"""
+    if entry['fingerprint'] != fingerprint:
+        increment_metric('idempotency_key_mismatches')
+        return jsonify({'error': '같은 Idempotency-Key로 다른 요청을 보낼 수 없습니다.'}), 422
+
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    while entry is not None and entry['state'] == 'in_progress' and time.monotonic() < deadline:
+        time.sleep(IDEMPOTENCY_POLL_INTERVAL)
+        entry = idempotency_store.get(store_key)
+    if entry is None:
+        # 먼저 온 요청이 보관할 수 없는 결과(서버 오류 등)로 끝났으면 다시 시도하도록 안내
+        response = jsonify({'error': '이전 요청이 완료되지 않았습니다. 다시 시도해주세요.', 'retry_after': 1})
+        response.status_code = 409
+        response.headers['Retry-After'] = '1'
+        return response
+    if entry['state'] == 'in_progress':
+        increment_metric('idempotency_in_progress_conflicts')
+        response = jsonify({'error': '같은 요청을 처리하고 있습니다. 잠시 후 다시 시도해주세요.', 'retry_after': 1})
+        response.status_code = 409
+        response.headers['Retry-After'] = '1'
+        return response
+
+    increment_metric('idempotency_replays')
+    response = Response(entry['body'], status=entry['status'])
+    for name, value in entry['headers']:
+        response.headers[name] = value
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def idempotent(view):
+    """
+    Idempotency-Key 헤더가 있으면 응답을 보관하고 같은 키의 재요청에 그대로 돌려줌
+
+    서버 오류(5xx), 요청 한도/할당량 초과(429), 취소(499)는 보관하지 않아 재요청 시 다시 실행합니다.
+    저장소에 장애가 나면 멱등 처리 없이 요청을 그대로 실행합니다.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER, '').strip()
+        if not IDEMPOTENCY_ENABLED or not key:
+            return view(*args, **kwargs)
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return jsonify({'error': f'{IDEMPOTENCY_HEADER}는 {IDEMPOTENCY_KEY_MAX_LENGTH}자 이하여야 합니다.'}), 400
+
+        # 키는 세션 안에서만 유효 (모바일은 재전송 사이에 IP가 바뀔 수 있어 IP는 사용하지 않음)
+        session_id = request.headers.get(SESSION_ID_HEADER, '').strip()[:64]
+        store_key = f"{session_id}:{request.path}:{key}"
+        fingerprint = idempotency_fingerprint()
+        try:
+            entry = idempotency_store.begin(store_key, fingerprint, IDEMPOTENCY_LOCK_SECONDS)
+        except Exception as e:
+            increment_metric('idempotency_store_errors')
+            logger.warning(f"멱등 키 저장소 오류 - 멱등 처리 없이 실행합니다: {e}")
+            return view(*args, **kwargs)
+        if entry is not None:
+            return replay_idempotent_response(store_key, entry, fingerprint)
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            idempotency_store.discard(store_key)
+            raise
+        try:
+            if response.status_code >= 500 or response.status_code in (429, 499):
+                idempotency_store.discard(store_key)
+                return response
+            # 파일 응답(send_file)도 본문을 읽어 보관 (보관한 본문으로 응답)
+            response.direct_passthrough = False
+            idempotency_store.complete(store_key, {
+                'fingerprint': fingerprint,
+                'status': response.status_code,
+                'headers': [[name, response.headers[name]] for name in IDEMPOTENCY_REPLAY_HEADERS if name in response.headers],
+                'body': response.get_data()
+            }, IDEMPOTENCY_TTL_SECONDS)
+            increment_metric('idempotency_stored_responses')
+        except Exception as e:
+            increment_metric('idempotency_store_errors')
+            logger.warning(f"멱등 키 응답 보관 실패: {e}")
+        return response
+    return wrapper
+
+@app.before_request
+def assign_request_priority():
+    """요청의 우선순위 등급 설정 (X-Priority-Class 헤더, 없으면 시민 요청으로 처리)"""
+    request_priority_local.value = normalize_priority(request.headers.get(PRIORITY_HEADER))
+
+@app.teardown_request
+def reset_request_priority(error=None):
+    request_priority_local.value = DEFAULT_PRIORITY_CLASS
+
 # API 엔드포인트들
 @app.route('/')
 def index():
@@ -1359,7 +5371,52 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'facilities_count': len(facility_database)
+        'facilities_count': len(facility_database),
+        'llm_circuit_breaker': gemini_circuit_breaker.state(),
+        'load_level': generation_limiter.level()
+    })
+
+def get_refine_parse_rates():
+    """입력 정제 응답의 파싱 실패율/복구율/후속 요청 비율"""
+    counters = get_metrics_snapshot()
+    refine_calls = counters.get('llm_calls_refine', 0)
+    rule_evaluations = counters.get('refine_rule_evaluations', 0)
+    # 규칙 기반 정제만으로 AI 호출을 생략한 요청 비율
+    rule_skip_rate = round(counters.get('refine_rule_skips', 0) / rule_evaluations, 4) if rule_evaluations else None
+    if not refine_calls:
+        return {'refine_calls': 0, 'rule_skip_rate': rule_skip_rate}
+    parse_failures = counters.get('refine_parse_failures', 0)
+    return {
+        'refine_calls': refine_calls,
+        'parse_failure_rate': round(parse_failures / refine_calls, 4),
+        'salvage_rate': round(counters.get('refine_salvaged_responses', 0) / parse_failures, 4) if parse_failures else None,
+        'followup_rate': round(counters.get('refine_followups', 0) / refine_calls, 4),
+        'incomplete_rate': round(counters.get('refine_incomplete', 0) / refine_calls, 4),
+        'rule_skip_rate': rule_skip_rate
+    }
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """운영 지표 조회"""
+    return jsonify({
+        'timestamp': datetime.now().isoformat(),
+        'counters': get_metrics_snapshot(),
+        'in_flight': {
+            'proposal': proposal_single_flight.in_flight_count(),
+            'cancellable_requests': len(active_request_tokens)
+        },
+        'gemini_quota': gemini_quota_scheduler.state(),
+        'model_router': gemini_model_router.state(),
+        'job_queue': job_worker_pool.queue_size(),
+        'generation_limiter': generation_limiter.state(),
+        'rate_limit': client_rate_limiter.state(),
+        'idempotency': idempotency_store.state(),
+        'priority_lanes': {
+            'llm': llm_priority_lanes.state(),
+            'pdf': pdf_priority_lanes.state(),
+            'jobs': job_worker_pool.state()
+        },
+        'refine_parse': get_refine_parse_rates()
     })
 
 @app.route('/facilities', methods=['GET'])
@@ -1367,17 +5424,94 @@ def get_facilities():
     """시설물 정보 조회"""
     return jsonify(facility_database)
 
+@app.route('/facilities/suggest', methods=['GET'])
+def suggest_facility_names():
+    """장소 자동완성 (접두어 및 초성 검색)"""
+    query = request.args.get('q', '').strip()
+    try:
+        limit = max(1, min(int(request.args.get('limit', SUGGEST_MAX_RESULTS)), SUGGEST_MAX_RESULTS))
+    except ValueError:
+        limit = SUGGEST_MAX_RESULTS
+
+    response = jsonify({
+        'query': query,
+        'suggestions': suggest_facilities(query, limit)
+    })
+    # 같은 인덱스 버전에서는 결과가 바뀌지 않으므로 브라우저/프록시 캐시 허용
+    response.headers['Cache-Control'] = 'public, max-age=300'
+    response.set_etag(f"{facility_name_index['version']}-{hashlib.sha1(query.encode('utf-8')).hexdigest()[:12]}-{limit}")
+    return response.make_conditional(request)
+
+@app.route('/facilities/resolve', methods=['GET'])
+def resolve_facility():
+    """입력 장소명을 시설물명으로 해석"""
+    name = request.args.get('name', '').strip()
+    if not name:
+        return jsonify({'error': 'name 파라미터는 필수입니다.'}), 400
+    facility_name, confidence = resolve_facility_name(name)
+    return jsonify({
+        'query': name,
+        'facility': facility_name,
+        'confidence': confidence,
+        'matched': facility_name is not None and confidence >= FACILITY_MATCH_THRESHOLD
+    })
+
 @app.route('/facilities/refresh', methods=['POST'])
 def refresh_facilities():
-    """시설물 정보 새로고침"""
-    global facility_database
-    facility_database = crawl_gimpo_facilities()
+    """시설물 정보 새로고침 (변경된 시설물만 다시 파싱)"""
+    diff = refresh_facility_database()
     return jsonify({
         'message': '시설물 정보가 새로고침되었습니다.',
-        'count': len(facility_database)
+        'count': len(facility_database),
+        'diff': diff
+    })
+
+@app.route('/facilities/enrich', methods=['POST'])
+@staff_only
+def enrich_facilities():
+    """
+    시설물 장소 맥락 설명 일괄 생성 작업 등록 (전체 재생성은 {"all": true})
+
+    AI 호출이 많으므로 요청 스레드에서 실행하지 않고 bulk 등급 작업으로 등록합니다.
+    """
+    data = request.get_json(silent=True) or {}
+    facility_names = list(facility_database) if data.get('all') else data.get('facilities')
+    if facility_names is not None and not isinstance(facility_names, list):
+        return jsonify({'error': 'facilities 필드는 시설물명 목록이어야 합니다.'}), 400
+    try:
+        job_id = job_worker_pool.submit('facility_enrichment', {'facilities': facility_names}, priority='bulk')
+    except JobQueueFull as e:
+        return job_queue_full_response(e)
+
+    response = jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/jobs/{job_id}'
     })
+    response.status_code = 202
+    response.headers['Location'] = f'/jobs/{job_id}'
+    return response
+
+@app.route('/prompts', methods=['GET'])
+def get_prompt_versions():
+    """현재 사용 중인 프롬프트 템플릿 버전"""
+    return jsonify({'prompts': prompt_registry.versions()})
+
+@app.route('/prompts/reload', methods=['POST'])
+@staff_only
+def reload_prompts():
+    """프롬프트 템플릿 즉시 다시 불러오기 (실패 시 이전 템플릿 유지)"""
+    try:
+        changed = prompt_registry.load()
+    except Exception as e:
+        logger.error(f"프롬프트 템플릿 다시 불러오기 실패: {e}")
+        return jsonify({'error': f'프롬프트를 불러올 수 없습니다: {str(e)}'}), 500
+    return jsonify({'changed': changed, 'prompts': prompt_registry.versions()})
 
 @app.route('/generate-proposal', methods=['POST'])
+@idempotent
+@rate_limited('generate')
 def generate_proposal():
     """AI를 사용한 제안서 생성"""
     try:
@@ -1390,6 +5524,11 @@ def generate_proposal():
         
         logger.info(f"제안서 생성 요청 - 문제: {problem[:50]}...")
         
+        # 대체할 로컬 템플릿이 없으므로 거절 단계에서만 요청을 받지 않음
+        if LOAD_SHED_ENABLED and generation_limiter.level() == 'reject':
+            increment_metric('load_shed_level_reject')
+            raise LoadShed(generation_limiter.retry_after())
+        
         # AI 제안서 생성
         proposal = generate_ai_proposal(problem, solution)
         
@@ -1398,11 +5537,17 @@ def generate_proposal():
             'proposal': proposal
         })
         
+    except LoadShed as e:
+        return load_shed_response(e)
+    except QuotaWaitTooLong as e:
+        return quota_exceeded_response(e)
     except Exception as e:
         logger.error(f"제안서 생성 오류: {str(e)}")
         return jsonify({'error': '제안서 생성 중 오류가 발생했습니다.'}), 500
 
 @app.route('/generate-structured-proposal', methods=['POST'])
+@idempotent
+@rate_limited('generate')
 def generate_structured_proposal():
     """정형화된 질문 세트 기반 제안서 생성"""
     try:
@@ -1420,25 +5565,334 @@ def generate_structured_proposal():
         
         logger.info(f"정형화된 제안서 생성 요청 - 장소: {data['core_location']}, 대상: {data['core_target']}")
         
-        # AI 제안서 생성
-        proposal = generate_structured_ai_proposal(
-            core_location=data['core_location'],
-            core_target=data['core_target'],
-            problem_type=problem_type,
-            affected_people=affected_people,
-            solution_idea=data['solution_idea']
-        )
+        inputs = {
+            'core_location': data['core_location'],
+            'core_target': data['core_target'],
+            'problem_type': problem_type,
+            'affected_people': affected_people,
+            'solution_idea': data['solution_idea']
+        }
+        
+        # AI 제안서 생성 (동시에 들어온 동일 요청은 병합, 부하가 높으면 단계적으로 낮춘 방식 사용)
+        # X-Request-Id를 보낸 경우 POST /requests/<id>/cancel로 남은 단계를 중단할 수 있음
+        with cancellable_request(request.headers.get(REQUEST_ID_HEADER)) as cancel_token:
+            ctx = ProposalRequestContext(cancel_token=cancel_token)
+            proposal, level = generate_proposal_with_load_shedding(
+                inputs, use_cache=not data.get('regenerate', False), ctx=ctx
+            )
+        
+        # 섹션별 다시 쓰기에 사용할 세션 보관
+        proposal_id = create_proposal_session(inputs, proposal, ctx.draft_inputs)
         
         return jsonify({
             'success': True,
-            'proposal': proposal
+            'proposal_id': proposal_id,
+            'proposal': proposal,
+            'service_level': level
         })
         
+    except RequestCancelled as e:
+        return request_cancelled_response(e)
+    except LoadShed as e:
+        return load_shed_response(e)
+    except QuotaWaitTooLong as e:
+        return quota_exceeded_response(e)
     except Exception as e:
         logger.error(f"정형화된 제안서 생성 오류: {str(e)}")
         return jsonify({'error': '제안서 생성 중 오류가 발생했습니다.'}), 500
 
+@app.route('/proposal-drafts', methods=['POST'])
+@idempotent
+@rate_limited('generate')
+def create_proposal_draft():
+    """로컬 초안을 즉시 반환하고 AI 제안서는 백그라운드에서 생성 (GET /proposal-drafts/<id>로 확인)"""
+    try:
+        data = request.get_json()
+        
+        # 필수 필드 검증
+        required_fields = ['core_location', 'core_target', 'solution_idea']
+        for field in required_fields:
+            if field not in data or not data[field].strip():
+                return jsonify({'error': f'{field} 필드는 필수입니다.'}), 400
+        
+        inputs = {
+            'core_location': data['core_location'],
+            'core_target': data['core_target'],
+            'problem_type': data.get('problem_type', ''),
+            'affected_people': data.get('affected_people', ''),
+            'solution_idea': data['solution_idea']
+        }
+        result = start_speculative_proposal(inputs, use_cache=not data.get('regenerate', False))
+        return jsonify({'success': True, **result}), 202
+        
+    except JobQueueFull as e:
+        return job_queue_full_response(e)
+    except Exception as e:
+        logger.error(f"제안서 초안 생성 오류: {str(e)}")
+        return jsonify({'error': '제안서 생성 중 오류가 발생했습니다.'}), 500
+
+@app.route('/proposal-drafts/<draft_id>', methods=['GET'])
+def get_proposal_draft(draft_id):
+    """초안 상태 조회 (ready이면 AI 제안서 포함)"""
+    job = job_store.get(draft_id)
+    if job is None or job['kind'] != 'proposal' or 'draft' not in job['payload']:
+        return jsonify({'error': '초안을 찾을 수 없습니다.'}), 404
+    response = {'success': True, 'draft_id': draft_id}
+    if job['status'] == 'done':
+        response['status'] = 'ready'
+        response.update(job['result'])
+    elif job['status'] == 'failed':
+        response['status'] = 'failed'
+        response['error'] = job['error']
+        if job['retry_after']:
+            response['retry_after'] = job['retry_after']
+    elif job['status'] == 'cancelled':
+        response['status'] = 'cancelled'
+    else:
+        response['status'] = 'pending'
+        response['draft'] = job['payload']['draft']
+    return jsonify(response)
+
+def job_to_response(job):
+    """작업 상태 응답 본문"""
+    response = {
+        'success': True,
+        'job_id': job['id'],
+        'status': job['status'],
+        'created_at': datetime.fromtimestamp(job['created_at']).isoformat()
+    }
+    if job['status'] == 'done':
+        response['result'] = job['result']
+    elif job['status'] in ('failed', 'cancelled'):
+        response['error'] = job['error']
+        if job['retry_after']:
+            response['retry_after'] = job['retry_after']
+    return response
+
+def job_queue_full_response(error):
+    """작업 대기열 포화 응답 (503 + Retry-After)"""
+    logger.warning(str(error))
+    response = jsonify({'error': '요청이 많아 잠시 후 다시 시도해주세요.', 'retry_after': 30})
+    response.status_code = 503
+    response.headers['Retry-After'] = '30'
+    return response
+
+@app.route('/jobs', methods=['POST'])
+@idempotent
+@rate_limited('generate')
+def create_job():
+    """제안서 생성 작업 등록 (작업 ID를 즉시 반환, GET /jobs/<id> 또는 /jobs/<id>/events로 결과 확인)"""
+    try:
+        data = request.get_json()
+        
+        # 필수 필드 검증
+        required_fields = ['core_location', 'core_target', 'solution_idea']
+        for field in required_fields:
+            if field not in data or not data[field].strip():
+                return jsonify({'error': f'{field} 필드는 필수입니다.'}), 400
+        
+        inputs = {
+            'core_location': data['core_location'],
+            'core_target': data['core_target'],
+            'problem_type': data.get('problem_type', ''),
+            'affected_people': data.get('affected_people', ''),
+            'solution_idea': data['solution_idea']
+        }
+        job_id = job_worker_pool.submit('proposal', {'inputs': inputs, 'use_cache': not data.get('regenerate', False)})
+        
+        response = jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': f'/jobs/{job_id}',
+            'events_url': f'/jobs/{job_id}/events'
+        })
+        response.status_code = 202
+        response.headers['Location'] = f'/jobs/{job_id}'
+        return response
+        
+    except JobQueueFull as e:
+        return job_queue_full_response(e)
+    except Exception as e:
+        logger.error(f"작업 등록 오류: {str(e)}")
+        return jsonify({'error': '작업 등록 중 오류가 발생했습니다.'}), 500
+
+@app.route('/jobs/batch', methods=['POST'])
+@staff_only
+@idempotent
+def create_batch_jobs():
+    """직원 대량 작업 등록 (bulk 등급으로 처리되어 시민 요청보다 뒤에 실행)"""
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'items 필드는 비어 있지 않은 목록이어야 합니다.'}), 400
+    
+    # 항목 수만큼 생성 비용을 차감 (버킷 크기를 넘는 목록은 충전을 기다려도 처리할 수 없으므로 바로 거절)
+    if RATE_LIMIT_ENABLED:
+        identities = get_client_identities()
+        max_items = client_rate_limiter.max_units('generate', identities)
+        if max_items is not None and len(items) > max_items:
+            return jsonify({
+                'error': f'한 번에 등록할 수 있는 작업은 최대 {max_items}건입니다.',
+                'max_items': max_items
+            }), 400
+        try:
+            client_rate_limiter.check('generate', identities, units=len(items))
+        except RateLimitExceeded as e:
+            return rate_limited_response(e)
+    
+    required_fields = ['core_location', 'core_target', 'solution_idea']
+    job_ids = []
+    errors = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or any(not str(item.get(field, '')).strip() for field in required_fields):
+            errors.append({'index': index, 'error': f"{', '.join(required_fields)} 필드는 필수입니다."})
+            continue
+        inputs = {
+            'core_location': item['core_location'],
+            'core_target': item['core_target'],
+            'problem_type': item.get('problem_type', ''),
+            'affected_people': item.get('affected_people', ''),
+            'solution_idea': item['solution_idea']
+        }
+        try:
+            job_ids.append(job_worker_pool.submit(
+                'proposal', {'inputs': inputs, 'use_cache': not data.get('regenerate', False)}, priority='bulk'
+            ))
+        except JobQueueFull:
+            errors.append({'index': index, 'error': '작업 대기열이 가득 찼습니다.'})
+    
+    return jsonify({'success': bool(job_ids), 'job_ids': job_ids, 'errors': errors}), 202 if job_ids else 503
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """작업 상태 조회 (done이면 결과 포함)"""
+    job_worker_pool.start()
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': '작업을 찾을 수 없습니다.'}), 404
+    return jsonify(job_to_response(job))
+
+def job_event_stream(job_id, heartbeat_seconds=JOB_EVENTS_HEARTBEAT_SECONDS, cancel_on_disconnect=False):
+    """
+    작업 상태 변경 Server-Sent Events 스트림 응답 (작업이 끝나면 스트림 종료)
+
+    cancel_on_disconnect이면 클라이언트 연결이 끊길 때(주석/이벤트 전송 실패로 GeneratorExit) 작업을 취소합니다.
+    """
+    def generate_events():
+        deadline = time.time() + JOB_EVENTS_MAX_SECONDS
+        last_status = None
+        try:
+            while True:
+                version = job_store.version(job_id)
+                job = job_store.get(job_id)
+                if job['status'] != last_status:
+                    last_status = job['status']
+                    yield f"event: status\ndata: {json.dumps(job_to_response(job), ensure_ascii=False)}\n\n"
+                if job['status'] in JOB_FINISHED_STATUSES or time.time() >= deadline:
+                    return
+                if not job_store.wait_for_change(job_id, version, heartbeat_seconds):
+                    # 프록시 유휴 시간 초과로 연결이 끊기지 않도록 주기적으로 주석 전송 (끊긴 연결도 이때 감지)
+                    yield ": keep-alive\n\n"
+        except GeneratorExit:
+            if cancel_on_disconnect:
+                increment_metric('stream_disconnects')
+                job_worker_pool.cancel(job_id, reason='client_disconnected')
+            raise
+
+    return Response(generate_events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    """작업 상태 변경 알림 (Server-Sent Events, 작업이 끝나면 스트림 종료)"""
+    job_worker_pool.start()
+    if job_store.get(job_id) is None:
+        return jsonify({'error': '작업을 찾을 수 없습니다.'}), 404
+    return job_event_stream(job_id)
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """작업 취소 (탭을 닫을 때 sendBeacon으로 호출, 이미 끝난 작업은 상태만 반환)"""
+    status = job_worker_pool.cancel(job_id)
+    if status is None:
+        return jsonify({'error': '작업을 찾을 수 없습니다.'}), 404
+    return jsonify({'success': True, 'job_id': job_id, 'status': status})
+
+@app.route('/requests/<request_id>/cancel', methods=['POST'])
+def cancel_active_request(request_id):
+    """X-Request-Id로 시작한 동기 요청(제안서 생성, PDF 생성) 취소"""
+    return jsonify({'success': True, 'request_id': request_id, 'cancelled': cancel_request(request_id)})
+
+@app.route('/generate-structured-proposal/stream', methods=['POST'])
+@rate_limited('generate')
+def generate_structured_proposal_stream():
+    """
+    제안서 생성 스트리밍 (요청 본문은 /generate-structured-proposal과 동일)
+
+    작업을 등록하고 상태 변경을 Server-Sent Events로 보냅니다. 연결이 끊기면 작업을 취소하여
+    남은 AI 호출을 하지 않습니다.
+    """
+    try:
+        data = request.get_json()
+        
+        # 필수 필드 검증
+        required_fields = ['core_location', 'core_target', 'solution_idea']
+        for field in required_fields:
+            if field not in data or not data[field].strip():
+                return jsonify({'error': f'{field} 필드는 필수입니다.'}), 400
+        
+        inputs = {
+            'core_location': data['core_location'],
+            'core_target': data['core_target'],
+            'problem_type': data.get('problem_type', ''),
+            'affected_people': data.get('affected_people', ''),
+            'solution_idea': data['solution_idea']
+        }
+        job_id = job_worker_pool.submit('proposal', {'inputs': inputs, 'use_cache': not data.get('regenerate', False)})
+        return job_event_stream(job_id, heartbeat_seconds=STREAM_DISCONNECT_CHECK_SECONDS, cancel_on_disconnect=True)
+        
+    except JobQueueFull as e:
+        return job_queue_full_response(e)
+    except Exception as e:
+        logger.error(f"제안서 생성 스트리밍 오류: {str(e)}")
+        return jsonify({'error': '제안서 생성 중 오류가 발생했습니다.'}), 500
+
+@app.route('/proposals/<proposal_id>/sections/<section_name>/regenerate', methods=['POST'])
+@idempotent
+@rate_limited('regenerate')
+def regenerate_section(proposal_id, section_name):
+    """제안서 섹션 하나만 다시 작성 (요청 본문의 sections로 화면에서 고친 내용을 함께 전달 가능)"""
+    if section_name not in PROPOSAL_SECTION_LABELS:
+        return jsonify({'error': f"섹션은 {', '.join(PROPOSAL_SECTION_LABELS)} 중 하나여야 합니다."}), 400
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        current_sections = data.get('sections') if isinstance(data.get('sections'), dict) else None
+        
+        sections = regenerate_proposal_section(proposal_id, section_name, current_sections)
+        if sections is None:
+            return jsonify({'error': '제안서를 찾을 수 없습니다. 제안서를 다시 생성해주세요.'}), 404
+        
+        return jsonify({
+            'success': True,
+            'proposal_id': proposal_id,
+            'section': section_name,
+            'text': sections[section_name],
+            'proposal': sections
+        })
+        
+    except QuotaWaitTooLong as e:
+        return quota_exceeded_response(e)
+    except Exception as e:
+        logger.error(f"제안서 섹션 다시 쓰기 오류: {str(e)}")
+        return jsonify({'error': '섹션을 다시 작성하는 중 오류가 발생했습니다.'}), 500
+
 @app.route('/download-pdf', methods=['POST'])
+@idempotent
+@rate_limited('render')
 def download_pdf():
     """PDF 파일 다운로드"""
     try:
@@ -1454,8 +5908,10 @@ def download_pdf():
         
         logger.info(f"PDF 다운로드 요청 받음 - 제안자: {proposer_name}")
         
-        # PDF 파일 생성
-        filepath = create_pdf_file(title, problem, solution, effect, proposer_name)
+        # PDF 파일 생성 (CPU를 많이 쓰므로 우선순위 등급별로 동시 생성 수 제한, 사용자가 떠나면 중단)
+        with cancellable_request(request.headers.get(REQUEST_ID_HEADER)) as cancel_token:
+            with pdf_priority_lanes.slot(get_current_priority(), cancel_token=cancel_token):
+                filepath = create_pdf_file(title, problem, solution, effect, proposer_name, cancel_token=cancel_token)
         
         # 파일 전송 후 백그라운드에서 삭제하는 함수
         def remove_file_after_delay(filepath, delay=5):
@@ -1476,15 +5932,59 @@ def download_pdf():
         # 파일 전송
         return send_file(filepath, as_attachment=True, download_name=os.path.basename(filepath))
         
+    except PriorityWaitTooLong as e:
+        return quota_exceeded_response(e)
+    except RequestCancelled as e:
+        return request_cancelled_response(e)
     except Exception as e:
         logger.error(f"PDF 다운로드 오류: {str(e)}")
         import traceback
         logger.error(f"상세 오류: {traceback.format_exc()}")
         return jsonify({'error': f'PDF 생성 중 오류가 발생했습니다: {str(e)}'}), 500
 
+def report_startup_profile():
+    """시작 프로파일 출력 (단계별 소요 시간과 RSS 증가량)"""
+    logger.info("===== 시작 프로파일 =====")
+    for entry in startup_profile:
+        logger.info(f"{entry['step']:<45} {entry['seconds'] * 1000:8.1f} ms  {entry['rss_delta_kb'] / 1024:+7.1f} MB")
+    logger.info(
+        f"{'합계 (프로세스 시작 이후)':<45} "
+        f"{(time.perf_counter() - _process_start_time) * 1000:8.1f} ms  RSS {current_rss_kb() / 1024:.1f} MB"
+    )
+
+if os.getenv('PRELOAD_HEAVY_MODULES') == '1':
+    preload_heavy_modules()
+
+if STARTUP_PROFILE:
+    report_startup_profile()
+
 if __name__ == '__main__':
-    # 시설물 정보 초기화
-    facility_database = crawl_gimpo_facilities()
+    # 첫 사용 시 로드되는 모듈/초기화 비용까지 측정하고 종료 (예: python app_clean.py --profile-startup)
+    if '--profile-startup' in sys.argv:
+        with profile_startup('시설물 정보 로드'):
+            load_facility_snapshot()
+            refresh_facility_database()
+        preload_heavy_modules()
+        get_genai()
+        get_model()
+        report_startup_profile()
+        sys.exit(0)
+
+    # 시설물 정보 초기화 (이전 스냅샷 기준으로 변경된 시설물만 다시 파싱)
+    load_facility_snapshot()
+    refresh_facility_database()
+
+    # 장소 맥락 설명 사전 생성만 실행하고 종료 (예: python app_clean.py --enrich)
+    if '--enrich' in sys.argv:
+        enrich_facility_contexts(list(facility_database) if '--all' in sys.argv else None)
+        sys.exit(0)
+
+    # 설명이 없는 시설물은 백그라운드에서 미리 생성
+    start_facility_enrichment()
+    
+    # 재시작 전에 끝나지 않은 작업 재개 (디버그 리로더 사용 시 요청을 처리하는 자식 프로세스에서만)
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        job_worker_pool.start()
     
     # 서버 시작
     if GEMINI_API_KEY != "demo_key_for_testing":
@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+"""
+AI시민제안 비서 - 성능 측정 스크립트
+
+사용법:
+    python benchmark.py startup [--runs 5] [--output bench_output.txt]
+    python benchmark.py stages [--runs 3] [--output bench_output.txt]
+    python benchmark.py tokens [--output bench_output.txt]
+    python benchmark.py normalizer [--input inputs.jsonl] [--output bench_output.txt]
+    python benchmark.py lanes [--bulk-items 1000] [--output bench_output.txt]
+
+측정 항목:
+1. startup: app_clean.py import 시간과 워커 RSS (지연 로드 전/후 비교)
+2. stages: 단계별(정제/장소 분석/초안 작성) 응답 시간과 토큰 수
+   (단계별 모델 프로필 사용 vs 모든 단계에 같은 모델 사용, 실제 GEMINI_API_KEY 필요)
+3. tokens: 요청 1건당 입력 토큰 추정치 (고정 지시문 분리 전/후, API 호출 없음)
+4. normalizer: 규칙 기반 정제 처리 시간과 AI 정제를 생략하는 입력 비율
+   (--input: 실제 입력을 한 줄에 하나씩 담은 JSONL, 필드는 /generate-structured-proposal 요청과 동일)
+5. lanes: 대량 작업이 도는 동안 시민 요청의 대기 포함 응답 시간 p50/p95
+   (대량 작업 없음 / 단일 대기열 / 우선순위 등급, 호출은 고정 시간 sleep으로 모의)
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 자식 프로세스에서 실행할 코드 (매 측정마다 새 인터프리터로 실행)
+STARTUP_CHILD_CODE = """
+import json, time
+start = time.perf_counter()
+import app_clean
+import_seconds = time.perf_counter() - start
+import_rss_kb = app_clean.current_rss_kb()
+
+# 무거운 모듈을 모두 사용한 뒤의 RSS (예전처럼 import 시점에 모두 로드했을 때와 같은 상태)
+start = time.perf_counter()
+app_clean.preload_heavy_modules()
+app_clean.get_genai()
+first_use_seconds = time.perf_counter() - start
+
+print(json.dumps({
+    'import_seconds': import_seconds,
+    'import_rss_kb': import_rss_kb,
+    'first_use_seconds': first_use_seconds,
+    'full_rss_kb': app_clean.current_rss_kb(),
+    'profile': app_clean.startup_profile
+}))
+"""
+
+# 단계별 측정용 자식 프로세스 코드 (캐시를 끄고 같은 입력으로 제안서 생성)
+STAGES_CHILD_CODE = """
+import json, sys
+import app_clean
+samples = json.loads(sys.argv[1])
+runs = int(sys.argv[2])
+app_clean.load_facility_snapshot()
+for _ in range(runs):
+    for sample in samples:
+        app_clean.generate_structured_ai_proposal(*sample, use_cache=False)
+print(json.dumps(app_clean.get_metrics_snapshot()))
+"""
+
+# 측정용 입력 (장소, 대상, 문제 유형, 불편을 겪는 사람, 해결 아이디어)
+STAGE_SAMPLES = [
+    ["사우동 도서관 앞", "횡단보도", "안전", "어린이들", "신호등 설치해주세요"],
+    ["장기동 호수공원", "산책로 조명", "시설 고장", "저녁에 운동하는 주민", "가로등 고쳐주세요"],
+    ["김포한강신도시 버스정류장", "버스 배차", "교통 불편", "출퇴근하는 직장인", "출근시간 배차 늘려주세요"]
+]
+
+BENCH_STAGES = ['refine', 'context', 'draft']
+
+# 규칙 기반 정제 측정용 구어체 입력 (--input이 없을 때 사용)
+NORMALIZER_SAMPLES = STAGE_SAMPLES + [
+    ["태산패밀리파크", "놀이터 근처 벤치가 삐그덕거리고 노후돼서 보기에 안좋고 위험해 보임", "안전", "어린이", "벤치교체 요함"],
+    ["태산패밀리파크", "벤치가 낡았어요", "", "", "새로 바꿔주세요"],
+    ["시민회관", "주차장이 좁음", "불편", "", "주차장 확충"],
+    ["장기동", "산책로가 너무 어두워요 ㅠㅠ", "", "", "가로등 좀 더 달아주세요~"],
+    ["김포아트홀", "화장실 더러움", "", "", "청소 자주 했으면 좋겠어요"]
+]
+
+
+def run_child(code, extra_env=None, args=()):
+    """새 파이썬 프로세스에서 측정 코드 실행 후 마지막 줄(JSON) 파싱"""
+    env = dict(os.environ)
+    # 측정 중 실제 Gemini API를 호출하지 않도록 테스트 모드로 실행
+    env.setdefault('GEMINI_API_KEY', 'demo_key_for_testing')
+    env['PYTHONWARNINGS'] = 'ignore'
+    env.update(extra_env or {})
+    result = subprocess.run(
+        [sys.executable, '-c', code, *args],
+        cwd=APP_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(values):
+    """평균/최소/최대"""
+    return {
+        'mean': statistics.mean(values),
+        'min': min(values),
+        'max': max(values)
+    }
+
+
+def bench_startup(args):
+    """app_clean.py import 시간 및 RSS 측정"""
+    runs = [run_child(STARTUP_CHILD_CODE) for _ in range(args.runs)]
+
+    import_time = summarize([run['import_seconds'] * 1000 for run in runs])
+    first_use_time = summarize([run['first_use_seconds'] * 1000 for run in runs])
+    import_rss = summarize([run['import_rss_kb'] / 1024 for run in runs])
+    full_rss = summarize([run['full_rss_kb'] / 1024 for run in runs])
+
+    lines = [
+        f"===== startup ({args.runs}회) =====",
+        f"import 시간          평균 {import_time['mean']:7.1f} ms  (최소 {import_time['min']:.1f} / 최대 {import_time['max']:.1f})",
+        f"import 후 RSS        평균 {import_rss['mean']:7.1f} MB",
+        f"첫 사용 로드 시간    평균 {first_use_time['mean']:7.1f} ms  (ReportLab + 폰트 + google.generativeai)",
+        f"모두 로드 후 RSS     평균 {full_rss['mean']:7.1f} MB",
+        f"지연 로드로 줄어든 워커 RSS: {full_rss['mean'] - import_rss['mean']:.1f} MB",
+        "",
+        "단계별 비용 (마지막 측정):"
+    ]
+    for entry in runs[-1]['profile']:
+        lines.append(f"  {entry['step']:<45} {entry['seconds'] * 1000:8.1f} ms  {entry['rss_delta_kb'] / 1024:+7.1f} MB")
+
+    target_met = import_time['mean'] < 1000
+    lines.append("")
+    lines.append(f"목표(import 1초 미만): {'달성' if target_met else '미달'}")
+    return lines
+
+
+def bench_stages(args):
+    """단계별 모델 프로필 사용 전/후의 단계별 응답 시간과 토큰 비교"""
+    api_key = os.getenv('GEMINI_API_KEY')
+    if not api_key or api_key == 'demo_key_for_testing':
+        return ["stages 측정에는 실제 GEMINI_API_KEY가 필요합니다."]
+
+    child_args = (json.dumps(STAGE_SAMPLES, ensure_ascii=False), str(args.runs))
+    # 헤지 요청은 호출 수를 바꾸므로 두 측정 모두 끔
+    common_env = {'GEMINI_HEDGING_ENABLED': '0'}
+    results = {
+        'baseline': run_child(STAGES_CHILD_CODE, {**common_env, 'GEMINI_STAGE_PROFILES_ENABLED': '0'}, child_args),
+        'profiles': run_child(STAGES_CHILD_CODE, {**common_env, 'GEMINI_STAGE_PROFILES_ENABLED': '1'}, child_args)
+    }
+
+    def per_call(metrics, name, stage):
+        calls = metrics.get(f'llm_calls_{stage}', 0)
+        return metrics.get(f'{name}_{stage}', 0) / calls if calls else 0.0
+
+    lines = [
+        f"===== stages ({len(STAGE_SAMPLES)}개 입력 x {args.runs}회) =====",
+        f"{'단계':<10}{'구분':<10}{'호출':>6}{'평균 응답(ms)':>16}{'입력 토큰':>12}{'출력 토큰':>12}"
+    ]
+    for stage in BENCH_STAGES:
+        for label, metrics in results.items():
+            lines.append(
+                f"{stage:<10}{label:<10}{metrics.get(f'llm_calls_{stage}', 0):>6}"
+                f"{per_call(metrics, 'llm_latency_ms', stage):>16.0f}"
+                f"{per_call(metrics, 'llm_input_tokens', stage):>12.0f}"
+                f"{per_call(metrics, 'llm_output_tokens', stage):>12.0f}"
+            )
+        baseline_latency = per_call(results['baseline'], 'llm_latency_ms', stage)
+        profile_latency = per_call(results['profiles'], 'llm_latency_ms', stage)
+        if baseline_latency:
+            lines.append(f"{'':<10}응답 시간 절감: {(1 - profile_latency / baseline_latency) * 100:.1f}%")
+    return lines
+
+
+def bench_tokens(args):
+    """고정 지시문을 system_instruction으로 분리하기 전/후의 요청당 입력 토큰 추정"""
+    os.environ.setdefault('GEMINI_API_KEY', 'demo_key_for_testing')
+    sys.path.insert(0, APP_DIR)
+    import app_clean
+
+    requests_by_stage = {'refine': [], 'draft': []}
+    for location, target, problem_type, affected_people, solution in STAGE_SAMPLES:
+        requests_by_stage['refine'].append(
+            app_clean.build_refine_request(location, target, problem_type, affected_people, solution)
+        )
+        # 초안 요청은 정제 결과 대신 원본 입력으로 길이만 추정
+        requests_by_stage['draft'].append(app_clean.build_draft_request(
+            location, target, f"{location}의 {target}에 대한 문제가 있습니다.", solution,
+            problem_type, affected_people, '시민이 이용하는 공공시설'
+        ))
+
+    lines = [
+        f"===== tokens ({len(STAGE_SAMPLES)}개 입력 평균, 추정치) =====",
+        f"{'단계':<8}{'고정 지시문':>12}{'요청 본문':>12}{'분리 전 입력':>14}{'캐시 사용 시':>14}"
+    ]
+    for stage, bodies in requests_by_stage.items():
+        instruction_tokens = app_clean.estimate_tokens(app_clean.get_stage_system_instruction(stage).text)
+        body_tokens = statistics.mean(app_clean.estimate_tokens(body) for body in bodies)
+        lines.append(
+            f"{stage:<8}{instruction_tokens:>12}{body_tokens:>12.0f}"
+            f"{instruction_tokens + body_tokens:>14.0f}{body_tokens:>14.0f}"
+        )
+    lines.append("")
+    lines.append("* system_instruction만 사용하면 요청 본문은 줄지만 고정 지시문도 입력 토큰으로 과금됩니다.")
+    lines.append("  컨텍스트 캐시(GEMINI_CONTEXT_CACHE_ENABLED=1)를 지원하는 모델에서는 고정 지시문이 캐시 토큰으로 처리됩니다.")
+    return lines
+
+
+def bench_normalizer(args):
+    """규칙 기반 정제의 처리 시간과 AI 정제 생략 비율"""
+    os.environ.setdefault('GEMINI_API_KEY', 'demo_key_for_testing')
+    sys.path.insert(0, APP_DIR)
+    import time
+    import app_clean
+
+    fields = ['core_location', 'core_target', 'problem_type', 'affected_people', 'solution_idea']
+    if args.input:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            samples = [[record.get(field, '') for field in fields] for record in map(json.loads, f) if record]
+    else:
+        samples = NORMALIZER_SAMPLES
+
+    skipped = 0
+    elapsed = []
+    for sample in samples:
+        start = time.perf_counter()
+        _, confidence = app_clean.rule_based_refine(*sample)
+        elapsed.append((time.perf_counter() - start) * 1_000_000)
+        if confidence >= app_clean.RULE_NORMALIZER_SKIP_THRESHOLD:
+            skipped += 1
+
+    timing = summarize(elapsed)
+    return [
+        f"===== normalizer ({len(samples)}개 입력) =====",
+        f"처리 시간        평균 {timing['mean']:7.1f} us  (최소 {timing['min']:.1f} / 최대 {timing['max']:.1f})",
+        f"AI 정제 생략     {skipped}/{len(samples)}건 ({skipped / len(samples) * 100:.1f}%)  "
+        f"(기준 신뢰도 {app_clean.RULE_NORMALIZER_SKIP_THRESHOLD})"
+    ]
+
+
+def bench_lanes(args):
+    """대량 작업 중 시민 요청 응답 시간 (우선순위 등급 적용 전/후, 모의 호출)"""
+    os.environ.setdefault('GEMINI_API_KEY', 'demo_key_for_testing')
+    sys.path.insert(0, APP_DIR)
+    import time
+    import random
+    import threading
+    import app_clean
+
+    service_seconds = args.service_ms / 1000.0
+
+    def run(scenario):
+        lanes = app_clean.PriorityLanes('bench_lanes', args.capacity, app_clean.priority_lanes_config)
+        bulk_lane = 'bulk' if scenario == 'lanes' else 'interactive'
+        remaining = [args.bulk_items if scenario != 'baseline' else 0]
+        remaining_lock = threading.Lock()
+        latencies = []
+
+        def bulk_worker():
+            while True:
+                with remaining_lock:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                with lanes.slot(bulk_lane, timeout=600):
+                    time.sleep(service_seconds)
+
+        def citizen_request():
+            start = time.perf_counter()
+            with lanes.slot('interactive', timeout=600):
+                time.sleep(service_seconds)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        bulk_threads = [threading.Thread(target=bulk_worker) for _ in range(args.bulk_threads)]
+        for thread in bulk_threads:
+            thread.start()
+        time.sleep(0.2)
+
+        random.seed(0)
+        citizen_threads = []
+        for _ in range(args.requests):
+            thread = threading.Thread(target=citizen_request)
+            thread.start()
+            citizen_threads.append(thread)
+            time.sleep(random.expovariate(1.0 / args.interval_ms) / 1000.0)
+        for thread in citizen_threads + bulk_threads:
+            thread.join()
+
+        latencies.sort()
+        return {
+            'p50': latencies[len(latencies) // 2],
+            'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        }
+
+    lines = [
+        f"===== lanes (동시 호출 {args.capacity}, 호출 {args.service_ms}ms, 대량 작업 {args.bulk_items}건, "
+        f"시민 요청 {args.requests}건) ====="
+    ]
+    labels = {'baseline': '대량 작업 없음', 'fifo': '단일 대기열', 'lanes': '우선순위 등급'}
+    for scenario in ('baseline', 'fifo', 'lanes'):
+        result = run(scenario)
+        lines.append(f"{labels[scenario]:<12} 시민 요청 p50 {result['p50']:7.1f} ms   p95 {result['p95']:7.1f} ms")
+    return lines
+
+
+def main():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--output', help='결과를 저장할 파일 (예: bench_output.txt)')
+
+    parser = argparse.ArgumentParser(description='AI시민제안 비서 성능 측정')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    startup_parser = subparsers.add_parser('startup', parents=[common], help='import 시간 및 워커 RSS 측정')
+    startup_parser.add_argument('--runs', type=int, default=5)
+    startup_parser.set_defaults(handler=bench_startup)
+
+    stages_parser = subparsers.add_parser('stages', parents=[common], help='단계별 응답 시간 및 토큰 측정')
+    stages_parser.add_argument('--runs', type=int, default=3)
+    stages_parser.set_defaults(handler=bench_stages)
+
+    tokens_parser = subparsers.add_parser('tokens', parents=[common], help='요청당 입력 토큰 추정')
+    tokens_parser.set_defaults(handler=bench_tokens)
+
+    normalizer_parser = subparsers.add_parser('normalizer', parents=[common], help='규칙 기반 정제 처리 시간 및 AI 생략 비율')
+    normalizer_parser.add_argument('--input', help='실제 입력 JSONL 파일')
+    normalizer_parser.set_defaults(handler=bench_normalizer)
+
+    lanes_parser = subparsers.add_parser('lanes', parents=[common], help='대량 작업 중 시민 요청 응답 시간 (우선순위 등급)')
+    lanes_parser.add_argument('--capacity', type=int, default=8)
+    lanes_parser.add_argument('--service-ms', type=float, default=10)
+    lanes_parser.add_argument('--bulk-items', type=int, default=1000)
+    lanes_parser.add_argument('--bulk-threads', type=int, default=32)
+    lanes_parser.add_argument('--requests', type=int, default=100)
+    lanes_parser.add_argument('--interval-ms', type=float, default=10)
+    lanes_parser.set_defaults(handler=bench_lanes)
+
+    args = parser.parse_args()
+
+    lines = args.handler(args)
+    report = '\n'.join(lines)
+    print(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report + '\n')
+
+
+if __name__ == '__main__':
+    main()
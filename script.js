@@ -1,8 +1,12 @@
 // AI시민제안 비서 - 김포도시공사 (정형화된 질문 세트)
 
+// 백엔드 서버 주소
+const API_BASE_URL = 'https://ai-citizen-proposal.onrender.com';
+
 // DOM 요소들
 const structuredProposalForm = document.getElementById('structuredProposalForm');
 const coreLocationInput = document.getElementById('core_location');
+const facilitySuggestionList = document.getElementById('facility-suggestions');
 const coreTargetInput = document.getElementById('core_target');
 const solutionIdeaInput = document.getElementById('solution_idea');
 const proposerNameInput = document.getElementById('proposer_name');
@@ -19,6 +23,83 @@ const resultProblem = document.getElementById('result-problem');
 const resultSolution = document.getElementById('result-solution');
 const resultEffect = document.getElementById('result-effect');
 const downloadPdfBtn = document.getElementById('download-pdf-btn');
+const draftStatus = document.getElementById('draft-status');
+const regenerateSectionButtons = document.querySelectorAll('.regenerate-section-btn');
+const resultFields = {
+    title: resultTitle,
+    problem: resultProblem,
+    solution: resultSolution,
+    effect: resultEffect
+};
+
+// 섹션별 다시 쓰기에 사용하는 서버 측 제안서 ID (AI 제안서가 준비되면 설정)
+let currentProposalId = null;
+
+// 탭을 닫을 때 서버에 취소를 알릴 진행 중인 작업 (AI 제안서 작업 ID, PDF 요청 ID)
+let pendingDraftId = null;
+let pendingPdfRequestId = null;
+
+function newRequestId() {
+    if (window.crypto && typeof window.crypto.randomUUID === 'function') {
+        return window.crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
+// 요청 한도를 세션별로 적용하기 위한 탭 단위 세션 ID (X-Session-Id 헤더로 전송)
+const SESSION_ID_STORAGE_KEY = 'proposalSessionId';
+
+function getSessionId() {
+    let sessionId = sessionStorage.getItem(SESSION_ID_STORAGE_KEY);
+    if (!sessionId) {
+        sessionId = newRequestId();
+        sessionStorage.setItem(SESSION_ID_STORAGE_KEY, sessionId);
+    }
+    return sessionId;
+}
+
+// 응답을 받지 못하면(모바일 네트워크 끊김 등) 같은 Idempotency-Key로 다시 보냄
+// 서버는 같은 키의 요청을 한 번만 처리하고 보관한 응답을 그대로 돌려줌
+const POST_RETRY_DELAYS_MS = [1000, 3000];
+
+async function postWithRetry(url, body, { idempotencyKey = newRequestId(), headers = {} } = {}) {
+    for (let attempt = 0; ; attempt++) {
+        try {
+            const response = await fetch(url, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Idempotency-Key': idempotencyKey,
+                    'X-Session-Id': getSessionId(),
+                    ...headers
+                },
+                body: JSON.stringify(body)
+            });
+            // 같은 요청을 아직 처리 중이면 잠시 후 결과를 다시 요청
+            if (response.status === 409 && attempt < POST_RETRY_DELAYS_MS.length) {
+                await new Promise(resolve => setTimeout(resolve, POST_RETRY_DELAYS_MS[attempt]));
+                continue;
+            }
+            return response;
+        } catch (error) {
+            if (attempt >= POST_RETRY_DELAYS_MS.length) {
+                throw error;
+            }
+            await new Promise(resolve => setTimeout(resolve, POST_RETRY_DELAYS_MS[attempt]));
+        }
+    }
+}
+
+// 페이지를 떠나면 진행 중인 AI 제안서/PDF 생성을 취소 (응답을 기다리지 않는 sendBeacon 사용)
+window.addEventListener('pagehide', () => {
+    if (!navigator.sendBeacon) return;
+    if (pendingDraftId) {
+        navigator.sendBeacon(`${API_BASE_URL}/jobs/${pendingDraftId}/cancel`);
+    }
+    if (pendingPdfRequestId) {
+        navigator.sendBeacon(`${API_BASE_URL}/requests/${pendingPdfRequestId}/cancel`);
+    }
+});
 
 // 체크박스 이벤트 처리
 document.addEventListener('DOMContentLoaded', function() {
@@ -57,6 +138,72 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
+// 장소 자동완성 (입력이 멈춘 뒤에만 요청, 같은 검색어는 브라우저에서 재사용)
+const SUGGEST_DEBOUNCE_MS = 150;
+const SUGGEST_CACHE_MAX_SIZE = 100;
+const suggestionCache = new Map();
+let suggestTimer = null;
+let suggestController = null;
+
+async function fetchFacilitySuggestions(query) {
+    if (suggestionCache.has(query)) {
+        return suggestionCache.get(query);
+    }
+    
+    // 이전 요청이 아직 진행 중이면 취소
+    if (suggestController) {
+        suggestController.abort();
+    }
+    suggestController = new AbortController();
+    
+    const response = await fetch(`${API_BASE_URL}/facilities/suggest?q=${encodeURIComponent(query)}`, {
+        signal: suggestController.signal
+    });
+    const data = await response.json();
+    const suggestions = data.suggestions || [];
+    
+    if (suggestionCache.size >= SUGGEST_CACHE_MAX_SIZE) {
+        suggestionCache.delete(suggestionCache.keys().next().value);
+    }
+    suggestionCache.set(query, suggestions);
+    return suggestions;
+}
+
+function renderFacilitySuggestions(suggestions) {
+    if (!facilitySuggestionList) return;
+    
+    facilitySuggestionList.innerHTML = '';
+    suggestions.forEach(suggestion => {
+        const option = document.createElement('option');
+        option.value = suggestion.facility;
+        if (suggestion.label !== suggestion.facility) {
+            option.label = suggestion.label;
+        }
+        facilitySuggestionList.appendChild(option);
+    });
+}
+
+if (coreLocationInput && facilitySuggestionList) {
+    coreLocationInput.addEventListener('input', () => {
+        clearTimeout(suggestTimer);
+        const query = coreLocationInput.value.trim();
+        if (!query) {
+            renderFacilitySuggestions([]);
+            return;
+        }
+        
+        suggestTimer = setTimeout(async () => {
+            try {
+                renderFacilitySuggestions(await fetchFacilitySuggestions(query));
+            } catch (error) {
+                if (error.name !== 'AbortError') {
+                    console.error('자동완성 오류:', error);
+                }
+            }
+        }, SUGGEST_DEBOUNCE_MS);
+    });
+}
+
 // 폼 제출 이벤트
 structuredProposalForm.addEventListener('submit', async (e) => {
     e.preventDefault();
@@ -88,34 +235,28 @@ structuredProposalForm.addEventListener('submit', async (e) => {
             affectedPeopleTypes.filter(t => t !== '기타').concat(affectedPeopleOther).join(', ') : 
             affectedPeopleTypes.join(', ')) : '';
     
+    const inputs = {
+        core_location: coreLocation,
+        core_target: coreTarget,
+        problem_type: problemType,
+        affected_people: affectedPeople,
+        solution_idea: solutionIdea
+    };
+    
     try {
         setLoading(true);
+        currentProposalId = null;
         
-        const response = await fetch('https://ai-citizen-proposal.onrender.com/generate-structured-proposal', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                core_location: coreLocation,
-                core_target: coreTarget,
-                problem_type: problemType,
-                affected_people: affectedPeople,
-                solution_idea: solutionIdea
-            })
-        });
+        // 서버가 즉시 돌려주는 로컬 초안을 먼저 보여주고, AI 제안서는 백그라운드에서 기다림
+        const response = await postWithRetry(`${API_BASE_URL}/proposal-drafts`, inputs);
         
         const data = await response.json();
         
         if (data.success) {
-            displayStructuredResults(data.proposal);
-            saveInputsToLocalStorage({
-                core_location: coreLocation,
-                core_target: coreTarget,
-                problem_type: problemType,
-                affected_people: affectedPeople,
-                solution_idea: solutionIdea
-            });
+            displayStructuredResults(data.draft);
+            saveInputsToLocalStorage(inputs);
+            setLoading(false);
+            await waitForProposal(data.draft_id, data.draft);
         } else {
             alert('제안서 생성에 실패했습니다: ' + (data.error || '알 수 없는 오류'));
         }
@@ -124,9 +265,119 @@ structuredProposalForm.addEventListener('submit', async (e) => {
         alert('서버와의 통신 중 오류가 발생했습니다.');
     } finally {
         setLoading(false);
+        setDraftStatus('');
     }
 });
 
+// AI 제안서 완성 대기 (초안 표시 후 폴링)
+const DRAFT_POLL_INTERVAL_MS = 1000;
+const DRAFT_POLL_MAX_ATTEMPTS = 90;
+
+function getDisplayedProposal() {
+    return {
+        title: resultTitle.value,
+        problem: resultProblem.value,
+        solution: resultSolution.value,
+        effect: resultEffect.value
+    };
+}
+
+function isDraftUntouched(draft) {
+    const current = getDisplayedProposal();
+    return ['title', 'problem', 'solution', 'effect'].every(
+        key => current[key] === (draft[key] || '')
+    );
+}
+
+function setDraftStatus(message) {
+    if (!draftStatus) return;
+    draftStatus.textContent = message;
+    draftStatus.style.display = message ? 'block' : 'none';
+}
+
+async function waitForProposal(draftId, draft) {
+    setDraftStatus('빠른 초안을 먼저 보여드렸습니다. AI가 제안서를 다듬는 중입니다...');
+    pendingDraftId = draftId;
+    try {
+        await pollProposal(draftId, draft);
+    } finally {
+        pendingDraftId = null;
+    }
+}
+
+async function pollProposal(draftId, draft) {
+    for (let attempt = 0; attempt < DRAFT_POLL_MAX_ATTEMPTS; attempt++) {
+        await new Promise(resolve => setTimeout(resolve, DRAFT_POLL_INTERVAL_MS));
+        
+        let data;
+        try {
+            const response = await fetch(`${API_BASE_URL}/proposal-drafts/${draftId}`);
+            data = await response.json();
+        } catch (error) {
+            console.error('Draft poll error:', error);
+            continue;
+        }
+        
+        if (data.status === 'ready' && data.proposal) {
+            currentProposalId = data.proposal_id || null;
+            if (isDraftUntouched(draft)) {
+                displayStructuredResults(data.proposal);
+            } else {
+                // 사용자가 초안을 이미 고친 경우 수정 내용을 덮어쓰지 않음
+                alert('AI 제안서가 완성되었지만, 직접 수정하신 내용을 유지합니다.');
+            }
+            return;
+        }
+        if (data.status === 'cancelled') {
+            return;
+        }
+        if (data.status === 'failed' || !data.success) {
+            alert('AI 제안서 생성에 실패하여 빠른 초안을 유지합니다: ' + (data.error || '알 수 없는 오류'));
+            return;
+        }
+    }
+}
+
+// 섹션 하나만 다시 쓰기 (나머지 섹션은 화면의 현재 내용을 그대로 유지)
+async function regenerateSection(section, button) {
+    if (!currentProposalId) {
+        alert('AI 제안서가 완성된 후에 다시 쓸 수 있습니다.');
+        return;
+    }
+    
+    const originalText = button.textContent;
+    button.disabled = true;
+    button.textContent = '작성 중...';
+    
+    try {
+        const response = await postWithRetry(
+            `${API_BASE_URL}/proposals/${currentProposalId}/sections/${section}/regenerate`,
+            { sections: getDisplayedProposal() }
+        );
+        
+        const data = await response.json();
+        
+        if (data.success) {
+            resultFields[section].value = data.text;
+        } else {
+            if (response.status === 404) {
+                currentProposalId = null;
+            }
+            alert('다시 쓰기에 실패했습니다: ' + (data.error || '알 수 없는 오류'));
+        }
+    } catch (error) {
+        console.error('Error:', error);
+        alert('서버와의 통신 중 오류가 발생했습니다.');
+    } finally {
+        button.disabled = false;
+        button.textContent = originalText;
+    }
+}
+
+regenerateSectionButtons.forEach(button => {
+    button.addEventListener('click', () => regenerateSection(button.dataset.section, button));
+});
+
 // 정형화된 결과 표시
 function displayStructuredResults(proposal) {
     resultTitle.value = proposal.title || '';
@@ -212,13 +463,14 @@ async function downloadPdfFile() {
         proposer_name: proposerName
     };
     
+    const requestId = newRequestId();
+    pendingPdfRequestId = requestId;
+    
     try {
-        const response = await fetch('https://ai-citizen-proposal.onrender.com/download-pdf', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify(proposalData)
+        // 취소용 요청 ID를 멱등 키로도 사용 (다시 보낸 요청도 같은 PDF 생성으로 처리)
+        const response = await postWithRetry(`${API_BASE_URL}/download-pdf`, proposalData, {
+            idempotencyKey: requestId,
+            headers: { 'X-Request-Id': requestId }
         });
         
         if (response.ok) {
@@ -238,6 +490,8 @@ async function downloadPdfFile() {
     } catch (error) {
         console.error('Error:', error);
         alert('PDF 다운로드 중 오류가 발생했습니다.');
+    } finally {
+        pendingPdfRequestId = null;
     }
 }
 
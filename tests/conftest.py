@@ -0,0 +1,27 @@
+"""
+app_clean 테스트 공통 설정
+
+app_clean은 import 시점에 환경 변수를 읽으므로, 실제 API 키나 저장소 파일을 건드리지 않도록
+import 전에 테스트용 값을 지정합니다.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+TEST_DATA_DIR = tempfile.mkdtemp(prefix='gimpo-proposal-tests-')
+os.environ['GEMINI_API_KEY'] = 'demo_key_for_testing'
+os.environ.setdefault('FACILITY_SNAPSHOT_PATH', os.path.join(TEST_DATA_DIR, 'facility_snapshot.json'))
+os.environ.setdefault('JOB_STORE_PATH', os.path.join(TEST_DATA_DIR, 'jobs.sqlite3'))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app_clean  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    if not app_clean.facility_database:
+        app_clean.refresh_facility_database()
+    return app_clean
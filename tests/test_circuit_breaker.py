@@ -0,0 +1,47 @@
+"""Gemini 장애 차단기 (closed → open → half_open → closed)"""
+import time
+
+
+def test_opens_after_consecutive_failures(app_module):
+    breaker = app_module.CircuitBreaker(failure_threshold=2, recovery_seconds=60)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state()['state'] == 'open'
+    assert not breaker.allow_request()
+    assert breaker.is_open()
+
+
+def test_success_resets_failure_count(app_module):
+    breaker = app_module.CircuitBreaker(failure_threshold=2, recovery_seconds=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state()['state'] == 'closed'
+
+
+def test_half_open_allows_one_trial(app_module):
+    breaker = app_module.CircuitBreaker(failure_threshold=1, recovery_seconds=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.state()['state'] == 'half_open'
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    # 장애와 무관하게 끝난 시험 호출은 슬롯만 반환
+    breaker.release_trial()
+    assert breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state()['state'] == 'closed'
+    assert breaker.allow_request() and breaker.allow_request()
+
+
+def test_failed_trial_reopens(app_module):
+    breaker = app_module.CircuitBreaker(failure_threshold=1, recovery_seconds=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state()['state'] == 'open'
+    assert not breaker.allow_request()
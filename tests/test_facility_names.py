@@ -0,0 +1,23 @@
+"""시설물명 해석 (정규화, 포함 일치, 자모 편집 거리)"""
+import pytest
+
+
+@pytest.mark.parametrize('query, facility', [
+    ('도서관', '도서관'),
+    ('도서관에서', '도서관'),
+    ('도서관 앞', '도서관'),
+    ('태산패밀리파크 놀이터', '태산패밀리파크'),
+    ('김포시 시민회관', '시민회관'),
+    ('시민회광', '시민회관'),
+    ('태산페밀리파크', '태산패밀리파크'),
+])
+def test_resolves_facility_names(app_module, query, facility):
+    resolved, confidence = app_module.resolve_facility_name(query)
+    assert resolved == facility
+    assert confidence >= app_module.FACILITY_MATCH_THRESHOLD
+
+
+@pytest.mark.parametrize('query', ['어린이도서관', '학교 체육관'])
+def test_other_places_containing_a_facility_name_are_not_matched(app_module, query):
+    _, confidence = app_module.resolve_facility_name(query)
+    assert confidence < app_module.FACILITY_MATCH_THRESHOLD
@@ -0,0 +1,99 @@
+"""Idempotency-Key 처리 (같은 응답 재전송, 처리 중 409, 다른 요청 422)"""
+import threading
+
+import pytest
+from flask import Flask, jsonify, request
+
+
+@pytest.fixture(params=['memory', 'redis'])
+def store(request, app_module):
+    if request.param == 'memory':
+        return app_module.InMemoryIdempotencyStore()
+    fakeredis = pytest.importorskip('fakeredis')
+    return app_module.RedisIdempotencyStore(fakeredis.FakeRedis(), key_prefix='test-idempotency:')
+
+
+@pytest.fixture
+def harness(app_module, store, monkeypatch):
+    """멱등 처리 데코레이터만 씌운 작은 앱 (처리 횟수와 진행 제어용 이벤트 포함)"""
+    monkeypatch.setattr(app_module, 'idempotency_store', store)
+    monkeypatch.setattr(app_module, 'IDEMPOTENCY_ENABLED', True)
+    monkeypatch.setattr(app_module, 'IDEMPOTENCY_WAIT_SECONDS', 0.2)
+    monkeypatch.setattr(app_module, 'IDEMPOTENCY_POLL_INTERVAL', 0.01)
+
+    app = Flask('idempotency_test')
+    state = {'calls': 0, 'started': threading.Event(), 'release': threading.Event(), 'status': 200}
+    state['release'].set()
+
+    @app.route('/orders', methods=['POST'])
+    @app_module.idempotent
+    def create_order():
+        state['calls'] += 1
+        state['started'].set()
+        state['release'].wait(5)
+        return jsonify({'order': state['calls'], 'body': request.get_json()}), state['status']
+
+    return app.test_client(), state
+
+
+def post(client, key, body, session='s1'):
+    return client.post('/orders', json=body, headers={'Idempotency-Key': key, 'X-Session-Id': session})
+
+
+def test_replays_stored_response(harness):
+    client, state = harness
+    first = post(client, 'k1', {'item': 1})
+    second = post(client, 'k1', {'item': 1})
+
+    assert state['calls'] == 1
+    assert second.status_code == first.status_code == 200
+    assert second.get_json() == first.get_json()
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert 'Idempotent-Replayed' not in first.headers
+
+
+def test_key_is_scoped_to_session(harness):
+    client, state = harness
+    post(client, 'k1', {'item': 1}, session='s1')
+    other = post(client, 'k1', {'item': 1}, session='s2')
+    assert state['calls'] == 2
+    assert 'Idempotent-Replayed' not in other.headers
+
+
+def test_different_body_with_same_key_is_rejected(harness):
+    client, state = harness
+    post(client, 'k1', {'item': 1})
+    mismatch = post(client, 'k1', {'item': 2})
+    assert mismatch.status_code == 422
+    assert state['calls'] == 1
+
+
+def test_request_in_progress_returns_conflict(harness):
+    client, state = harness
+    state['release'].clear()
+    results = {}
+    first = threading.Thread(target=lambda: results.setdefault('first', post(client, 'k1', {'item': 1})))
+    first.start()
+    try:
+        assert state['started'].wait(5)
+        conflict = post(client, 'k1', {'item': 1})
+        assert conflict.status_code == 409
+        assert conflict.headers['Retry-After'] == '1'
+    finally:
+        state['release'].set()
+        first.join(5)
+
+    assert results['first'].status_code == 200
+    assert post(client, 'k1', {'item': 1}).headers['Idempotent-Replayed'] == 'true'
+    assert state['calls'] == 1
+
+
+def test_server_error_is_not_stored(harness):
+    client, state = harness
+    state['status'] = 503
+    assert post(client, 'k1', {'item': 1}).status_code == 503
+    state['status'] = 200
+    retry = post(client, 'k1', {'item': 1})
+    assert retry.status_code == 200
+    assert 'Idempotent-Replayed' not in retry.headers
+    assert state['calls'] == 2
@@ -0,0 +1,60 @@
+"""우선순위 등급별 가중 공정 큐 (차례 순서, 등급별 상한, 기아 방지)"""
+import pytest
+
+
+def lane_config(weight, max_share=1.0, aging_seconds=None):
+    return {'weight': weight, 'max_share': max_share, 'aging_seconds': aging_seconds, 'max_wait': None, 'max_queued': 100}
+
+
+def drain(lanes):
+    """대기열이 빌 때까지 하나씩 꺼내 처리한 순서"""
+    order = []
+    while lanes.queued_count():
+        item, lane = lanes.get()
+        order.append(item)
+        lanes.release(lane)
+    return order
+
+
+def test_dispatch_follows_lane_weights(app_module):
+    lanes = app_module.PriorityLanes('test_lanes', 1, {'interactive': lane_config(8), 'bulk': lane_config(1)})
+    lanes.put('bulk', 'b0')  # 빈 자리를 바로 차지
+    for index in range(1, 4):
+        lanes.put('bulk', f'b{index}')
+    for index in range(1, 11):
+        lanes.put('interactive', f'i{index}')
+
+    order = drain(lanes)
+    assert order[0] == 'b0'
+    # 8:1 비중이므로 다음 10개 중 대량 작업은 2개 이하
+    assert sum(item.startswith('b') for item in order[1:11]) <= 2
+    # 낮은 등급도 결국 처리되고, 같은 등급 안에서는 들어온 순서 유지
+    assert [item for item in order if item.startswith('b')] == ['b0', 'b1', 'b2', 'b3']
+    assert [item for item in order if item.startswith('i')] == [f'i{index}' for index in range(1, 11)]
+
+
+def test_lane_cap_leaves_room_for_other_lanes(app_module):
+    lanes = app_module.PriorityLanes('test_lanes', 4, {'interactive': lane_config(8), 'bulk': lane_config(1, max_share=0.25)})
+    for index in range(3):
+        lanes.put('bulk', f'b{index}')
+    # 상한(4 x 0.25 = 1)이 있어 대량 작업은 하나만 실행
+    assert lanes.state()['lanes']['bulk']['running'] == 1
+    lanes.put('interactive', 'i0')
+    assert lanes.state()['lanes']['interactive']['running'] == 1
+
+
+def test_aged_lane_is_served_first(app_module):
+    lanes = app_module.PriorityLanes('test_lanes', 1, {'interactive': lane_config(8), 'bulk': lane_config(1, aging_seconds=0)})
+    lanes.put('interactive', 'i0')
+    lanes.put('interactive', 'i1')
+    lanes.put('bulk', 'b0')
+    assert drain(lanes) == ['i0', 'b0', 'i1']
+
+
+def test_acquire_times_out_when_lane_is_full(app_module):
+    lanes = app_module.PriorityLanes('test_lanes', 1, {'interactive': lane_config(8)})
+    lane = lanes.acquire('interactive')
+    with pytest.raises(app_module.PriorityWaitTooLong):
+        lanes.acquire('interactive', timeout=0.05)
+    lanes.release(lane)
+    lanes.release(lanes.acquire('interactive', timeout=0.05))
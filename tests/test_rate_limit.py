@@ -0,0 +1,71 @@
+"""클라이언트별 요청 한도 (메모리/Redis 토큰 버킷, Redis 장애 시 메모리 대체)"""
+import pytest
+
+SCOPES = {
+    'session': {'capacity': 10, 'refill_per_minute': 6},
+    'ip': {'capacity': 40, 'refill_per_minute': 24},
+}
+COSTS = {'generate': 5, 'render': 3}
+IDENTITIES = {'session': 'session-1', 'ip': '203.0.113.7'}
+
+
+def make_limiter(app_module, backend):
+    return app_module.ClientRateLimiter(backend, SCOPES, COSTS)
+
+
+@pytest.fixture
+def redis_backend(app_module):
+    fakeredis = pytest.importorskip('fakeredis')
+    pytest.importorskip('lupa')  # fakeredis의 Lua 스크립트 실행에 필요
+    client = fakeredis.FakeRedis()
+    return app_module.RedisRateLimitBackend(client, key_prefix='test-ratelimit:')
+
+
+def test_memory_bucket_rejects_with_retry_after(app_module):
+    limiter = make_limiter(app_module, app_module.InMemoryRateLimitBackend())
+    limiter.check('generate', IDENTITIES)
+    limiter.check('generate', IDENTITIES)
+    with pytest.raises(app_module.RateLimitExceeded) as error:
+        limiter.check('generate', IDENTITIES)
+    assert error.value.scope == 'session'
+    assert error.value.expected_wait == pytest.approx(50, abs=1)
+
+
+def test_redis_bucket_shares_limit_between_limiters(app_module, redis_backend):
+    first = make_limiter(app_module, redis_backend)
+    second = make_limiter(app_module, app_module.RedisRateLimitBackend(redis_backend.client, key_prefix='test-ratelimit:'))
+    first.check('generate', IDENTITIES)
+    second.check('generate', IDENTITIES)
+    with pytest.raises(app_module.RateLimitExceeded) as error:
+        first.check('generate', IDENTITIES)
+    assert error.value.scope == 'session'
+    assert error.value.expected_wait == pytest.approx(50, abs=1)
+    # 가득 찰 시간이 지나면 만료되는 버킷
+    assert 0 < redis_backend.client.ttl('test-ratelimit:session:session-1') <= 101
+
+
+def test_redis_bucket_charges_per_unit(app_module, redis_backend):
+    limiter = make_limiter(app_module, redis_backend)
+    assert limiter.max_units('generate', IDENTITIES) == 2
+    with pytest.raises(app_module.RateLimitExceeded):
+        limiter.check('generate', IDENTITIES, units=3)
+    limiter.check('generate', IDENTITIES, units=2)
+
+
+def test_backend_errors_fall_back_to_memory(app_module):
+    class BrokenBackend:
+        name = 'broken'
+
+        def consume(self, key, cost, capacity, refill_per_second):
+            raise ConnectionError('redis down')
+
+        def state(self):
+            return {'backend': self.name}
+
+    limiter = make_limiter(app_module, BrokenBackend())
+    errors_before = app_module.get_metrics_snapshot().get('rate_limit_backend_errors', 0)
+    limiter.check('generate', IDENTITIES)
+    limiter.check('generate', IDENTITIES)
+    with pytest.raises(app_module.RateLimitExceeded):
+        limiter.check('generate', IDENTITIES)
+    assert app_module.get_metrics_snapshot()['rate_limit_backend_errors'] > errors_before
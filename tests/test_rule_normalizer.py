@@ -0,0 +1,25 @@
+"""규칙 기반 구어체 정규화 (AI 정제 생략 여부)"""
+
+
+def test_confident_rewrite_keeps_subject(app_module):
+    refined, confidence = app_module.rule_based_refine('태산패밀리파크', '벤치가 낡았어요', '', '', '벤치 교체')
+    assert confidence >= app_module.RULE_NORMALIZER_SKIP_THRESHOLD
+    assert refined['refined_target'] == '벤치'
+    assert refined['refined_problem_description'] == '태산패밀리파크의 벤치가 노후화되었습니다.'
+    assert refined['refined_solution'] == '벤치 교체를 제안합니다.'
+
+
+def test_dark_rule_does_not_repeat_subject(app_module):
+    refined, _ = app_module.rule_based_refine('사우체육공원', '조명이 어두워요', '', '', '조명 설치')
+    assert refined['refined_problem_description'] == '사우체육공원의 조명이 어둡습니다.'
+
+
+def test_repeated_location_falls_through_to_llm(app_module):
+    _, confidence = app_module.rule_based_refine('사우체육공원 화장실', '화장실이 더러워요', '', '', '청소 해주세요')
+    assert confidence < app_module.RULE_NORMALIZER_SKIP_THRESHOLD
+
+
+def test_target_without_subject_is_not_a_verb_phrase(app_module):
+    refined, confidence = app_module.rule_based_refine('장기동', '설치 필요함', '', '', '신호등 설치')
+    assert confidence < app_module.RULE_NORMALIZER_SKIP_THRESHOLD
+    assert refined['refined_target'] == '설치'